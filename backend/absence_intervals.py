@@ -0,0 +1,176 @@
+"""Absences as sorted, merged date ranges.
+
+``TeamMember.days`` is keyed by ISO date, so questions about a stretch of days - is the
+member absent on D, when does this absence end, who is away between A and B - probe the
+map one day at a time. These classes turn a member's absence days into merged ranges
+once and answer those questions with a binary search. Days are tested against the
+tenant's absence mask at the stored day type bits, see ``DayType.get_masks``.
+
+A team's index is built on first use and kept per team version. Every write to a team
+goes through ``Team.save`` or ``bump_team_versions``, both of which move the version, so
+an index is never served for data it was not built from.
+"""
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date
+from itertools import accumulate
+from typing import Iterable, Mapping, NamedTuple
+
+from .compact_days import CompactDays, DayTypeBits
+
+ABSENCE_INDEX_CACHE_SIZE = 256
+
+
+class AbsenceIntervals:
+    """One member's absence days as merged, inclusive ranges of date ordinals."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, ranges: Iterable[tuple[int, int]] = ()):
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        for start, end in sorted(ranges):
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @classmethod
+    def from_days(cls, days: Mapping, bits: DayTypeBits, absence: int) -> "AbsenceIntervals":
+        return cls.from_compact(CompactDays.from_days(days, bits), absence)
+
+    @classmethod
+    def from_compact(cls, days: CompactDays, mask: int) -> "AbsenceIntervals":
+        return cls(days.runs(mask))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _index_of(self, ordinal: int) -> int | None:
+        index = bisect_right(self.starts, ordinal) - 1
+        return index if index >= 0 and ordinal <= self.ends[index] else None
+
+    def contains(self, day: date) -> bool:
+        return self._index_of(day.toordinal()) is not None
+
+    def interval_at(self, day: date) -> tuple[date, date] | None:
+        """The absence covering ``day`` as (first day, last day), or None."""
+        index = self._index_of(day.toordinal())
+        if index is None:
+            return None
+        return date.fromordinal(self.starts[index]), date.fromordinal(self.ends[index])
+
+    def starts_on(self, day: date) -> bool:
+        """True if an absence begins on ``day``, i.e. ``day`` is absent and the day before is not."""
+        index = self._index_of(day.toordinal())
+        return index is not None and self.starts[index] == day.toordinal()
+
+    def overlaps(self, start: date, end: date) -> bool:
+        """True if any absent day falls within ``start``..``end`` inclusive."""
+        index = bisect_right(self.starts, end.toordinal()) - 1
+        return index >= 0 and self.ends[index] >= start.toordinal()
+
+    def spans_between(self, start: int, end: int) -> Iterable[tuple[int, int]]:
+        """The intervals overlapping ordinals ``start``..``end``, clipped to them."""
+        index = max(bisect_right(self.starts, start) - 1, 0)
+        while index < len(self.starts) and self.starts[index] <= end:
+            if self.ends[index] >= start:
+                yield max(self.starts[index], start), min(self.ends[index], end)
+            index += 1
+
+
+def sweep(spans: Iterable[tuple[int, int]], start: int, end: int) -> list[int]:
+    """For each ordinal ``start``..``end``, how many of the inclusive ``spans`` cover it.
+
+    A sweep line over +1/-1 boundary events, so the cost is one step per span plus one
+    per day, however long the spans are.
+    """
+    events = [0] * (end - start + 2)
+    for span_start, span_end in spans:
+        span_start, span_end = max(span_start, start), min(span_end, end)
+        if span_start <= span_end:
+            events[span_start - start] += 1
+            events[span_end - start + 1] -= 1
+    return list(accumulate(events[:-1]))
+
+
+class DayCoverage(NamedTuple):
+    date: date
+    members: int
+    absent: int
+
+    @property
+    def available(self) -> int:
+        return self.members - self.absent
+
+
+class TeamAbsenceIndex:
+    """The :class:`AbsenceIntervals` of every member of a team, by member uid."""
+
+    def __init__(self, intervals_by_member: dict[str, AbsenceIntervals]):
+        self.intervals_by_member = intervals_by_member
+
+    @classmethod
+    def build(cls, members, bits: DayTypeBits, absence: int) -> "TeamAbsenceIndex":
+        return cls({str(member.uid): AbsenceIntervals.from_days(member.days, bits, absence) for member in members})
+
+    def for_member(self, member) -> AbsenceIntervals:
+        return self.intervals_by_member.get(str(member.uid)) or AbsenceIntervals()
+
+    def is_absent(self, member, day: date) -> bool:
+        return self.for_member(member).contains(day)
+
+    def absent_between(self, start: date, end: date) -> list[str]:
+        """Uids of the members absent on at least one day of ``start``..``end``."""
+        return [uid for uid, intervals in self.intervals_by_member.items() if intervals.overlaps(start, end)]
+
+    def coverage(self, start: date, end: date, employment: Mapping[str, tuple[date, date]]) -> list[DayCoverage]:
+        """Members and absent members for each day of ``start``..``end``.
+
+        ``employment`` maps the uids of the members to count to the first and last day
+        they count on; absences outside that span are ignored.
+        """
+        first, last = start.toordinal(), end.toordinal()
+        spans = {uid: (max(span_start.toordinal(), first), min(span_end.toordinal(), last))
+                 for uid, (span_start, span_end) in employment.items()}
+        absences = (absence for uid, (span_start, span_end) in spans.items() if span_start <= span_end
+                    for absence in self.intervals_by_member.get(uid, AbsenceIntervals()).spans_between(
+                        span_start, span_end))
+        members, absent = sweep(spans.values(), first, last), sweep(absences, first, last)
+        return [DayCoverage(date.fromordinal(first + offset), members[offset], absent[offset])
+                for offset in range(last - first + 1)]
+
+
+_index_cache: OrderedDict = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def get_team_absence_index(team, masks) -> TeamAbsenceIndex:
+    """The absence index of all of ``team``'s members, built once per team version.
+
+    Callers pass the team they already hold, fully loaded and not yet modified in
+    memory, so the index costs no query, and the tenant's ``DayType.get_masks``. The
+    absence mask is part of the key because whether a day type is an absence can
+    change; that also bumps every team's version, but the mask keeps the key honest.
+    """
+    if team.id is None:  # never saved, so it has no version to key on
+        return TeamAbsenceIndex.build(team.team_members, masks.bits, masks.absence)
+    key = (str(team.id), team.version, masks.absence)
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+    index = TeamAbsenceIndex.build(team.team_members, masks.bits, masks.absence)
+    with _index_cache_lock:
+        _index_cache[key] = index
+        if len(_index_cache) > ABSENCE_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def clear_absence_index_cache():
+    with _index_cache_lock:
+        _index_cache.clear()
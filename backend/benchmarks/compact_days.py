@@ -0,0 +1,85 @@
+"""Measure the memory held by members' days, hydrated and as :class:`CompactDays`.
+
+    MONGO_MOCK=1 python -m backend.benchmarks.compact_days --members 5000
+
+Creates a synthetic tenant in whatever database the usual MONGO_* variables point to
+(use a throwaway one), then loads its teams the way the API does and packs the same
+days into compact arrays. For each, reports the heap it retains according to
+tracemalloc and the growth of the process's resident set.
+"""
+import argparse
+import datetime
+import gc
+import os
+import time
+import tracemalloc
+
+from ..compact_days import CompactDays
+from ..model import DayType, Team, User
+from .synthetic import create_synthetic_tenant
+
+
+def resident_bytes() -> int:
+    """Current resident set size, from /proc; 0 where that is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def measure(load) -> tuple[object, float, int, int]:
+    """Run ``load`` and return its result, seconds taken, heap retained and RSS growth."""
+    gc.collect()
+    rss_before = resident_bytes()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - started
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, retained, resident_bytes() - rss_before
+
+
+def load_hydrated(tenant) -> list:
+    return list(Team.objects(tenant=tenant))
+
+
+def load_compact(tenant) -> dict:
+    """Every member's days by uid, packed straight from the raw documents."""
+    bits = DayType.get_masks(tenant).bits
+    return {str(member.get("uid")): CompactDays.from_days(member.get("days"), bits)
+            for team in Team.objects(tenant=tenant).only("team_members.uid", "team_members.days").as_pymongo()
+            for member in team.get("team_members", [])}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--team-size", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365, help="length of the booked period")
+    args = parser.parse_args(argv)
+
+    tenant = create_synthetic_tenant(members=args.members, team_size=args.team_size, subscribers_per_team=1,
+                                     start=datetime.date.today() - datetime.timedelta(days=args.days // 2),
+                                     days=args.days)
+    try:
+        compact, *compact_stats = measure(lambda: load_compact(tenant))
+        booked = sum(len(days) for days in compact.values())
+        del compact
+        teams, *hydrated_stats = measure(lambda: load_hydrated(tenant))
+        del teams
+        print(f"{args.members} members, {booked} booked days")
+        for name, (seconds, retained, rss) in (("hydrated", hydrated_stats), ("compact", compact_stats)):
+            print(f"{name:<9} {seconds:.3f}s, heap {retained / 2 ** 20:.1f} MiB "
+                  f"({retained / max(booked, 1):.0f} B/day), rss +{rss / 2 ** 20:.1f} MiB")
+    finally:
+        Team.objects(tenant=tenant).delete()
+        DayType.objects(tenant=tenant).delete()
+        User.objects(tenants=tenant).delete()
+        tenant.delete()
+
+
+if __name__ == "__main__":
+    main()
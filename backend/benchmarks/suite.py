@@ -0,0 +1,210 @@
+"""Time the hot endpoints and every scheduled job against a synthetic tenant.
+
+    MONGO_MOCK=1 AUTHENTICATION_SECRET_KEY=dev python -m backend.benchmarks.suite --output baseline.json
+    MONGO_MOCK=1 AUTHENTICATION_SECRET_KEY=dev python -m backend.benchmarks.suite --baseline baseline.json
+
+Runs against whatever database the usual MONGO_* variables point to: mongomock with
+MONGO_MOCK=1, or e.g. a local mongod with MONGO_URI=mongodb://localhost:27017 and
+MONGO_DB_NAME=vacal_bench. Use a throwaway database; the tenant is removed afterwards.
+
+Each case runs ``--repeat`` times and its median is compared with the baseline's. The
+results are written as JSON to ``--output`` (stdout by default), in the same format as
+the baseline, so a run can become the next baseline. The exit status is 1 when a case
+got slower than the baseline by more than ``--tolerance``. Timings only compare on the
+same machine and database, so no baseline is kept in the repository: record one before
+a change and compare after it.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, NamedTuple
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from ..dependencies import get_current_active_user_check_tenant
+from ..email_service import EmailMessage
+from ..main import app
+from ..model import DayAudit, DayType, JobLock, OutboxMessage, Team, User, use_mock
+from ..routers import teams as teams_router
+from ..scheduled.absence_starts import send_absence_email_updates, send_upcoming_absence_email_updates
+from ..scheduled.activate_trials import activate_trials
+from ..scheduled.apply_due_separations import apply_due_separations
+from ..scheduled.birthdays import send_birthday_email_updates
+from ..scheduled.day_audit_notifications import send_recent_calendar_change_notifications
+from ..scheduled.outbox import dispatch_outbox, enqueue_emails
+from ..scheduled.tenant_digests import DIGEST_LOCAL_HOUR, send_tenant_digests
+from ..scheduled.update_max_team_members_numbers import run_update_max_team_members_numbers
+from .synthetic import create_synthetic_tenant
+
+DEFAULT_TOLERANCE = 0.25
+OUTBOX_MESSAGES = 200
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable[[], object]
+    # Runs before every repetition, untimed, e.g. to clear a cache the case should miss.
+    setup: Callable[[], object] | None = None
+
+
+def time_case(case: Case, repeat: int) -> dict:
+    durations = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        started = time.perf_counter()
+        case.run()
+        durations.append(time.perf_counter() - started)
+    return {"runs": repeat, "min": min(durations), "median": statistics.median(durations), "max": max(durations)}
+
+
+def expect_ok(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: "
+                           f"{response.status_code} {response.text[:200]}")
+    return response
+
+
+def build_cases(tenant, user) -> list[Case]:
+    client = TestClient(app)
+    headers = {"Tenant-ID": tenant.identifier}
+    team = Team.objects(tenant=tenant).order_by("name").first()
+    member = team.members()[0]
+    vacation_id = str(DayType.objects.get(tenant=tenant, identifier="vacation").id)
+    today = datetime.date.today()
+    booked_day = str(today + datetime.timedelta(days=400))  # outside the generated bookings
+    toggles = iter(range(sys.maxsize))
+
+    def update_days():
+        day_types = [vacation_id] if next(toggles) % 2 == 0 else []
+        expect_ok(client.put(f"/teams/{team.id}/members/{member.uid}/days", headers=headers,
+                             json={booked_day: {"day_types": day_types, "comment": ""}}))
+
+    def clear_feed_caches():
+        teams_router.get_cached_team_feed.cache_clear()
+        teams_router.get_cached_team_events.cache_clear()
+
+    def reset_outbox():
+        # Besides whatever the digest cases enqueued, so the case also runs on its own.
+        enqueue_emails((f"benchmark:{tenant.id}:{index}", EmailMessage("Benchmark", "", f"bench{index}@example.com"))
+                       for index in range(OUTBOX_MESSAGES))
+        OutboxMessage.objects(idempotency_key__contains=str(tenant.id)).update(
+            set__status="pending", set__attempts=0, set__available_at=datetime.datetime.now(datetime.timezone.utc),
+            unset__sent_at=True)
+
+    def clear_locks():
+        JobLock.drop_collection()
+
+    def in_two_hours():
+        # The change notifications cover the hour before the last full hour.
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=2)
+
+    digest_time = datetime.datetime.combine(today, datetime.time(DIGEST_LOCAL_HOUR, 5), datetime.timezone.utc)
+    report_range = {"start_date": str(today.replace(month=1, day=1)), "end_date": str(today.replace(month=12, day=31))}
+    return [
+        Case("list_teams", lambda: expect_ok(client.get("/teams", headers=headers))),
+        Case("update_days", update_days),
+        Case("export_absence_report", lambda: expect_ok(client.get(
+            "/teams/export-absences", headers=headers, params=report_range | {"format": "csv"}))),
+        Case("export_absence_report_xlsx", lambda: expect_ok(client.get(
+            "/teams/export-absences", headers=headers, params=report_range))),
+        Case("get_calendar_feed", lambda: expect_ok(client.get(
+            f"/teams/calendar/{team.id}", params={"user_api_key": user.auth_details.api_key})), clear_feed_caches),
+        Case("send_absence_email_updates", lambda: send_absence_email_updates(tenant)),
+        Case("send_upcoming_absence_email_updates", lambda: send_upcoming_absence_email_updates(tenant)),
+        Case("send_birthday_email_updates", lambda: send_birthday_email_updates(tenant)),
+        Case("send_recent_calendar_change_notifications",
+             lambda: send_recent_calendar_change_notifications(in_two_hours())),
+        Case("send_tenant_digests", lambda: send_tenant_digests(digest_time), clear_locks),
+        Case("dispatch_outbox", lambda: dispatch_outbox(limit=10_000), reset_outbox),
+        Case("apply_due_separations", apply_due_separations),
+        Case("run_update_max_team_members_numbers", run_update_max_team_members_numbers),
+        Case("activate_trials", activate_trials),
+    ]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print each case next to its baseline and return the names of the regressed ones."""
+    if baseline.get("params") != results["params"] or baseline.get("backend") != results["backend"]:
+        print("warning: the baseline was recorded with other parameters or another database",
+              file=sys.stderr)
+    regressions = []
+    for name, result in results["cases"].items():
+        expected = baseline.get("cases", {}).get(name)
+        if not expected:
+            print(f"{name:<42} {result['median'] * 1000:9.1f} ms  (no baseline)", file=sys.stderr)
+            continue
+        ratio = result["median"] / expected["median"] if expected["median"] else float("inf")
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<42} {result['median'] * 1000:9.1f} ms  baseline {expected['median'] * 1000:9.1f} ms  "
+              f"x{ratio:.2f}{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--team-size", type=int, default=25)
+    parser.add_argument("--years", type=int, default=2, help="years of bookings, ending half a year from today")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="names of the cases to run, default all")
+    parser.add_argument("--output", help="file to write the JSON results to, default stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown of a median against the baseline, default 0.25 (25%%)")
+    args = parser.parse_args(argv)
+
+    days = args.years * 365
+    params = {"teams": args.teams, "team_size": args.team_size, "years": args.years, "repeat": args.repeat}
+    started = time.perf_counter()
+    tenant = create_synthetic_tenant(members=args.teams * args.team_size, team_size=args.team_size,
+                                     start=datetime.date.today() - datetime.timedelta(days=days - 182), days=days)
+    print(f"synthetic tenant created in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    user = User.objects(tenants=tenant).first()
+    user.modify(set__role="manager")
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
+    try:
+        # Endpoints print timings of their own; stdout is kept for the results.
+        with patch("backend.scheduled.outbox.send_email"), contextlib.redirect_stdout(sys.stderr):
+            cases = [case for case in build_cases(tenant, user) if not args.only or case.name in args.only]
+            results = {
+                "backend": "mongomock" if use_mock else "mongodb",
+                "python": platform.python_version(),
+                "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "params": params,
+                "cases": {case.name: time_case(case, args.repeat) for case in cases},
+            }
+    finally:
+        app.dependency_overrides.pop(get_current_active_user_check_tenant, None)
+        OutboxMessage.objects(idempotency_key__contains=str(tenant.id)).delete()
+        DayAudit.objects(tenant=tenant).delete()
+        Team.objects_with_deleted(tenant=tenant).delete()
+        DayType.objects(tenant=tenant).delete()
+        User.objects(tenants=tenant).delete()
+        tenant.delete()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Synthetic tenants for benchmarks.
+
+The generator is seeded, so two runs against the same database backend produce the
+same teams, members and days.
+"""
+import datetime
+import random
+import uuid
+
+from ..model import AuthDetails, DayEntry, DayType, Team, TeamMember, Tenant, User
+from ..notification_types import list_notification_type_ids
+
+COUNTRIES = ["Sweden", "Germany", "United States", "Finland", "Poland"]
+
+
+def create_synthetic_tenant(members: int = 2000, team_size: int = 25, subscribers_per_team: int = 3,
+                            start: datetime.date | None = None, days: int = 120,
+                            absence_ratio: float = 0.08, seed: int = 42) -> Tenant:
+    """Create a tenant with ``members`` spread over teams of ``team_size``.
+
+    Every member gets absences on roughly ``absence_ratio`` of the ``days`` following
+    ``start``, in runs of one to ten days, like real vacations and sick leaves, and a
+    birthday.
+    """
+    rng = random.Random(seed)
+    start = start or datetime.date.today() - datetime.timedelta(days=days // 2)
+    tenant = Tenant(name=f"Benchmark {uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    absence_types = list(DayType.objects(tenant=tenant, is_absence=True))
+
+    users = [User(tenants=[tenant], name=f"Subscriber {index}", email=f"bench-{uuid.uuid4()}@example.com",
+                  auth_details=AuthDetails(username=str(uuid.uuid4()))).save()
+             for index in range(max(subscribers_per_team, 1))]
+
+    teams = []
+    for team_index in range(0, members, team_size):
+        team_members = []
+        for member_index in range(team_index, min(team_index + team_size, members)):
+            member_days = {}
+            day = 0
+            while day < days:
+                if rng.random() < absence_ratio / 5:
+                    day_type = rng.choice(absence_types)
+                    for offset in range(rng.randint(1, 10)):
+                        member_days[str(start + datetime.timedelta(days=day + offset))] = DayEntry(
+                            day_types=[day_type])
+                    day += 10
+                day += 1
+            birthday = start + datetime.timedelta(days=rng.randrange(365))
+            team_members.append(TeamMember(name=f"Member {member_index}", email=f"member{member_index}@example.com",
+                                           country=rng.choice(COUNTRIES), days=member_days,
+                                           birthday=birthday.strftime("%m-%d")))
+        preferences = {str(user.id): list_notification_type_ids()
+                       for user in rng.sample(users, subscribers_per_team)}
+        teams.append(Team(tenant=tenant, name=f"Team {team_index // team_size}", team_members=team_members,
+                          notification_preferences=preferences))
+    Team.objects.insert(teams, load_bulk=False)
+    return tenant
@@ -0,0 +1,80 @@
+"""Benchmark the upcoming absence notification job.
+
+    MONGO_MOCK=1 python -m backend.benchmarks.upcoming_absences --members 2000
+
+Creates a synthetic tenant in whatever database the usual MONGO_* variables point to
+(use a throwaway one), loads its teams once and times how long each implementation
+takes to work out who gets which absences, and how many queries it issues on the way.
+The per-member implementation the job used to have is kept here as the baseline.
+"""
+import argparse
+import datetime
+import time
+from collections import defaultdict
+from unittest.mock import patch
+
+from ..model import DayType, Team, User
+from ..notification_types import ABSENCE_UPCOMING_NOTIFICATION
+from ..scheduled import absence_starts
+from .synthetic import create_synthetic_tenant
+
+
+def legacy_collect_upcoming_absences(teams, today) -> dict:
+    """The job before the single-pass rewrite: O(members^2) per team, with a day type
+    query per member and a subscriber query per absent member."""
+    absence_info_by_subscriber = defaultdict(lambda: defaultdict(list))
+    for team in teams:
+        absence_day_types = absence_starts.get_absence_day_type_ids(team.tenant.id)
+        for member in team.members():
+            if (not absence_starts.is_working_day(member, today) or
+                    absence_starts.is_absent(member, str(today), absence_day_types)):
+                continue
+            next_working_day = absence_starts.get_next_working_day(member, today)
+            absences_next_day = absence_starts.find_absence_periods(team, next_working_day)
+            filtered = absence_starts.only_for_team_member(member, absences_next_day)
+            if filtered:
+                for email in team.get_subscriber_emails(ABSENCE_UPCOMING_NOTIFICATION):
+                    absence_info_by_subscriber[email][team.name].extend(filtered)
+    return absence_info_by_subscriber
+
+
+def measure(collect, teams, today) -> tuple[float, int, dict]:
+    """Run ``collect`` and return seconds taken, queries issued and its result."""
+    with patch.object(DayType, "objects", wraps=DayType.objects) as day_types, \
+            patch.object(User, "objects", wraps=User.objects) as users:
+        started = time.perf_counter()
+        result = collect(teams, today)
+        seconds = time.perf_counter() - started
+    return seconds, day_types.call_count + users.call_count, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--team-size", type=int, default=200)
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="the day the job runs on, default today")
+    args = parser.parse_args(argv)
+
+    tenant = create_synthetic_tenant(members=args.members, team_size=args.team_size,
+                                     start=args.date - datetime.timedelta(days=30), days=60)
+    try:
+        started = time.perf_counter()
+        teams = list(Team.objects(tenant=tenant).no_dereference())
+        print(f"load {len(teams)} teams: {time.perf_counter() - started:.3f}s")
+        results = {}
+        for name, collect in (("single pass", absence_starts.collect_upcoming_absences),
+                              ("legacy", legacy_collect_upcoming_absences)):
+            seconds, queries, results[name] = measure(collect, teams, args.date)
+            print(f"{name:<12} {seconds:.3f}s, {queries} queries, {len(results[name])} recipients")
+        if results["single pass"] != results["legacy"]:
+            print("warning: the implementations disagree")
+    finally:
+        Team.objects(tenant=tenant).delete()
+        DayType.objects(tenant=tenant).delete()
+        User.objects(tenants=tenant).delete()
+        tenant.delete()
+
+
+if __name__ == "__main__":
+    main()
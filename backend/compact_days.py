@@ -0,0 +1,152 @@
+"""A member's days packed into flat arrays, for code that reads them but never writes.
+
+A hydrated ``TeamMember.days`` holds a ``DayEntry`` document per booked day, each with a
+list of day type references - several hundred bytes a day. Read paths that only ask
+which days carry which day types can use :class:`CompactDays` instead: the sorted date
+ordinals in one ``array('i')``, a parallel ``array('Q')`` of day type bitmasks, and the
+few comments in a dict keyed by ordinal - about twelve bytes a day.
+
+Bits are assigned by a :class:`DayTypeBits`: either the tenant's stored bit positions,
+see ``DayType.get_masks``, or bits the caller builds for the day types it asks about.
+Days with none of the bits are left out.
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Iterable, Iterator, Mapping
+
+
+def day_type_key(day_type) -> str | None:
+    """The id of a day type as stored, referenced, dereferenced or serialised, as a string."""
+    if day_type is None:
+        return None
+    if isinstance(day_type, dict):
+        day_type = day_type.get("_id") or day_type.get("id")
+        return str(day_type) if day_type is not None else None
+    return str(getattr(day_type, "id", day_type))
+
+
+class DayTypeBits:
+    """Assigns bits of a mask to day types.
+
+    Each bit stands for a set of day types, usually just one, and a day type can carry
+    several bits - e.g. its own and a shared "is an absence" bit.
+    """
+
+    def __init__(self, day_type_ids: Iterable = ()):
+        self._masks: dict[str, int] = {}
+        self._next_bit = 1
+        for day_type_id in day_type_ids:
+            self.add([day_type_id])
+
+    @classmethod
+    def from_positions(cls, positions: Mapping) -> "DayTypeBits":
+        """Bits at given positions, e.g. the ones stored on a tenant's day types."""
+        bits = cls()
+        for day_type_id, position in positions.items():
+            bits._masks[day_type_key(day_type_id)] = 1 << position
+        bits._next_bit = 1 << (max(positions.values(), default=-1) + 1)
+        return bits
+
+    def add(self, day_types: Iterable) -> int:
+        """A new bit standing for all of ``day_types``."""
+        bit, self._next_bit = self._next_bit, self._next_bit << 1
+        for day_type in day_types:
+            key = day_type_key(day_type)
+            self._masks[key] = self._masks.get(key, 0) | bit
+        return bit
+
+    def mask(self, day_types: Iterable) -> int:
+        """The bits carried by any of ``day_types``."""
+        mask = 0
+        for day_type in day_types:
+            mask |= self._masks.get(day_type_key(day_type), 0)
+        return mask
+
+
+def _entry_fields(entry) -> tuple[Iterable, str | None]:
+    if isinstance(entry, dict):  # a raw document, e.g. from as_pymongo()
+        return entry.get("day_types") or (), entry.get("comment")
+    return entry.day_types or (), entry.comment
+
+
+class CompactDays:
+    """Booked days as parallel arrays of date ordinals and day type masks."""
+
+    __slots__ = ("ordinals", "masks", "comments")
+
+    def __init__(self, ordinals: array, masks: array | list[int], comments: dict[int, str]):
+        self.ordinals = ordinals
+        self.masks = masks
+        self.comments = comments
+
+    @classmethod
+    def from_days(cls, days: Mapping | None, bits: DayTypeBits) -> "CompactDays":
+        """Pack ``days``, keyed by ISO date, keeping the days with at least one day type in ``bits``.
+
+        Entries may be ``DayEntry`` documents, their DTOs or raw dicts.
+        """
+        packed = []
+        comments = {}
+        for date_str, entry in (days or {}).items():
+            day_types, comment = _entry_fields(entry)
+            mask = bits.mask(day_types)
+            if not mask:
+                continue
+            ordinal = date.fromisoformat(date_str).toordinal()
+            packed.append((ordinal, mask))
+            if comment:
+                comments[ordinal] = comment
+        packed.sort()
+        masks = [mask for _, mask in packed]
+        try:
+            masks = array("Q", masks)
+        except OverflowError:  # a tenant with more than 64 day types; rare enough to keep a list
+            pass
+        return cls(array("i", (ordinal for ordinal, _ in packed)), masks, comments)
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def _slice(self, start: date | None, end: date | None) -> range:
+        first = bisect_left(self.ordinals, start.toordinal()) if start else 0
+        last = bisect_right(self.ordinals, end.toordinal()) if end else len(self.ordinals)
+        return range(first, last)
+
+    def days_with(self, mask: int, start: date | None = None, end: date | None = None) -> Iterator[date]:
+        """The days carrying any day type of ``mask``, between ``start`` and ``end`` inclusive."""
+        for index in self._slice(start, end):
+            if self.masks[index] & mask:
+                yield date.fromordinal(self.ordinals[index])
+
+    def count(self, mask: int, start: date | None = None, end: date | None = None) -> int:
+        """How many days between ``start`` and ``end`` carry any day type of ``mask``."""
+        return sum(1 for index in self._slice(start, end) if self.masks[index] & mask)
+
+    def runs(self, mask: int) -> Iterator[tuple[int, int]]:
+        """Consecutive days carrying ``mask`` as inclusive (first, last) ordinal pairs."""
+        first = last = None
+        for ordinal, day_mask in zip(self.ordinals, self.masks):
+            if not day_mask & mask:
+                continue
+            if last is not None and ordinal == last + 1:
+                last = ordinal
+                continue
+            if first is not None:
+                yield first, last
+            first = last = ordinal
+        if first is not None:
+            yield first, last
+
+    def comment(self, day: date) -> str | None:
+        return self.comments.get(day.toordinal())
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the ordinals and masks; the comments are shared strings."""
+        if isinstance(self.masks, array):
+            mask_bytes = self.masks.itemsize * len(self.masks)
+        else:
+            mask_bytes = sum(map(sys.getsizeof, self.masks))
+        return self.ordinals.itemsize * len(self.ordinals) + mask_bytes
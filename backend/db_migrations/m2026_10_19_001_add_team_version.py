@@ -0,0 +1,10 @@
+from .db_utils import db
+
+team_collection = db["team"]
+
+result = team_collection.update_many(
+    {"version": {"$exists": False}},
+    {"$set": {"version": 0}},
+)
+
+print(f"Initialised version for {result.modified_count} teams.")
@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+
+from .db_utils import db
+
+team_collection = db["team"]
+
+# The real modification time of existing teams is unknown; the migration time is the
+# earliest moment a calendar client can safely be told nothing changed since.
+result = team_collection.update_many(
+    {"updated_at": {"$exists": False}},
+    {"$set": {"updated_at": datetime.now(timezone.utc)}},
+)
+
+print(f"Initialised updated_at for {result.modified_count} teams.")
@@ -0,0 +1,11 @@
+from .db_utils import db
+
+tenant_collection = db["tenant"]
+
+# Digests used to go out at 06:00 server time, which is UTC in the published image.
+result = tenant_collection.update_many(
+    {"timezone": {"$exists": False}},
+    {"$set": {"timezone": "UTC"}},
+)
+
+print(f"Initialised timezone for {result.modified_count} tenants.")
@@ -0,0 +1,22 @@
+from .db_utils import db
+
+day_type_collection = db["day_type"]
+tenant_collection = db["tenant"]
+
+# Bits go to each tenant's day types in creation order, after any already assigned.
+assigned = 0
+for tenant_id in day_type_collection.distinct("tenant"):
+    day_types = list(day_type_collection.find({"tenant": tenant_id}, {"bit": 1}).sort("_id", 1))
+    taken = {day_type["bit"] for day_type in day_types if day_type.get("bit") is not None}
+    free_bits = (bit for bit in range(len(day_types) + len(taken)) if bit not in taken)
+    for day_type in day_types:
+        if day_type.get("bit") is None:
+            day_type_collection.update_one({"_id": day_type["_id"]}, {"$set": {"bit": next(free_bits)}})
+            assigned += 1
+
+result = tenant_collection.update_many(
+    {"day_types_version": {"$exists": False}},
+    {"$set": {"day_types_version": 0}},
+)
+
+print(f"Assigned {assigned} day type bits; initialised day types version for {result.modified_count} tenants.")
@@ -1,38 +1,238 @@
+import json
+import logging
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Iterable, NamedTuple
 
 import boto3
-from botocore.exceptions import NoCredentialsError
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError, NoCredentialsError
+from prometheus_client import Counter
 
+log = logging.getLogger(__name__)
 
-def send_email_ses(subject, body, to_addresses: list | tuple):
+# Concurrent SES requests per delivery run; also the size of the client's connection pool.
+EMAIL_SENDER_WORKERS = int(os.getenv("EMAIL_SENDER_WORKERS", "8"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "4"))
+EMAIL_RETRY_BASE_DELAY_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_DELAY_SECONDS", "0.5"))
+# SES accepts at most 50 destinations per SendBulkTemplatedEmail call.
+SES_BULK_BATCH_SIZE = 50
+RETRYABLE_ERROR_CODES = {"Throttling", "ThrottlingException", "TooManyRequestsException",
+                         "ServiceUnavailable", "InternalFailure", "RequestTimeout"}
+
+emails_sent = Counter("vacal_emails_total", "Emails handed to the mail provider by outcome.", ["outcome"])
+email_retries = Counter("vacal_email_retries_total", "Mail provider calls retried after a transient error.")
+
+
+class EmailMessage(NamedTuple):
+    subject: str
+    body: str
+    to_address: str
+    # Lets the caller match results to its own records, e.g. an outbox message id.
+    reference: str | None = None
+
+
+class EmailDeliveryStats:
+    """What one delivery run did; logged at the end of the run."""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, sent: int = 0, failed: int = 0, retries: int = 0, requests: int = 0):
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+            self.retries += retries
+            self.requests += requests
+        if sent:
+            emails_sent.labels("sent").inc(sent)
+        if failed:
+            emails_sent.labels("failed").inc(failed)
+
+    @property
+    def per_second(self) -> float:
+        return self.sent / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return (f"EmailDeliveryStats(sent={self.sent}, failed={self.failed}, retries={self.retries}, "
+                f"requests={self.requests}, seconds={self.seconds:.3f}, per_second={self.per_second:.1f})")
+
+
+@lru_cache(maxsize=1)
+def get_ses_client():
+    """One SES client per process. Clients, unlike sessions, are thread-safe, and reusing
+    one keeps its HTTPS connections open across emails.
+
+    ``SES_ENDPOINT_URL`` points the client at another endpoint, e.g. a local fake SES.
+    """
+    return boto3.client(
+        "ses",
+        endpoint_url=os.environ.get("SES_ENDPOINT_URL") or None,
+        config=Config(max_pool_connections=max(EMAIL_SENDER_WORKERS, 10)),
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, BotocoreConnectionError):
+        return True
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+
+
+def call_with_retries(call: Callable, stats: EmailDeliveryStats | None = None, sleep: Callable = time.sleep):
+    """Run ``call``, retrying throttling and transient errors with jittered exponential backoff."""
+    for attempt in range(1, EMAIL_MAX_ATTEMPTS + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == EMAIL_MAX_ATTEMPTS or not is_retryable(e):
+                raise
+            email_retries.inc()
+            if stats:
+                stats.record(retries=1)
+            sleep(EMAIL_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+
+def get_source_email() -> str:
     source_email = os.environ.get("SES_SOURCE_EMAIL")
     if not source_email:
         raise ValueError("No source email address configured.")
-    client = boto3.client('ses')
-    response = client.send_email(
+    return source_email
+
+
+def send_email_ses(subject, body, to_addresses: list | tuple, client=None):
+    source_email = get_source_email()
+    client = client or get_ses_client()
+    response = call_with_retries(lambda: client.send_email(
         Source=source_email,
-        Destination={'ToAddresses': to_addresses},
+        Destination={'ToAddresses': list(to_addresses)},
         Message={
             'Subject': {'Data': subject},
             'Body': {'Text': {'Data': body}}
         }
-    )
+    ))
     return response
 
 
+def has_ses_credentials() -> bool:
+    # Token-based authentication (EKS IRSA), or KEY_ID and KEY credentials in environment
+    return bool(os.environ.get("AWS_WEB_IDENTITY_TOKEN_FILE") or
+                (os.environ.get("AWS_ACCESS_KEY_ID") and os.environ.get("AWS_SECRET_ACCESS_KEY")))
+
+
 def send_email(subject, body, to_addresses: list | tuple | str):
     if type(to_addresses) is str:
         to_addresses = [to_addresses]
-    # Check for token-based authentication (EKS IRSA)
-    if os.environ.get("AWS_WEB_IDENTITY_TOKEN_FILE"):
-        return send_email_ses(subject, body, to_addresses)
-    # Check for KEY_ID and KEY credentials in environment
-    elif os.environ.get("AWS_ACCESS_KEY_ID") and os.environ.get("AWS_SECRET_ACCESS_KEY"):
+    if has_ses_credentials():
         return send_email_ses(subject, body, to_addresses)
     else:
         raise NoCredentialsError()
 
 
+class BulkDestinationError(Exception):
+    """SES accepted a bulk call but not one of its destinations."""
+
+
+def send_bulk_templated(messages: list[EmailMessage], template_name: str, client=None,
+                        stats: EmailDeliveryStats | None = None) -> dict[EmailMessage, BulkDestinationError]:
+    """Send up to :data:`SES_BULK_BATCH_SIZE` messages in one SendBulkTemplatedEmail call.
+
+    The SES template is expected to consist of the two placeholders ``{{subject}}`` and
+    ``{{body}}``, which makes any plain text email expressible as one destination.
+    Returns the messages SES rejected.
+    """
+    stats = stats or EmailDeliveryStats()
+    client = client or get_ses_client()
+    response = call_with_retries(lambda: client.send_bulk_templated_email(
+        Source=get_source_email(),
+        Template=template_name,
+        DefaultTemplateData=json.dumps({"subject": "", "body": ""}),
+        Destinations=[{
+            "Destination": {"ToAddresses": [message.to_address]},
+            "ReplacementTemplateData": json.dumps({"subject": message.subject, "body": message.body}),
+        } for message in messages],
+    ), stats)
+    statuses = response.get("Status", [])
+    failures = {}
+    for message, status in zip(messages, statuses):
+        if status.get("Status") != "Success":
+            log.error("Bulk email to %s failed: %s %s", message.to_address, status.get("Status"), status.get("Error"))
+            failures[message] = BulkDestinationError(f"{status.get('Status')}: {status.get('Error')}")
+    stats.record(sent=len(messages) - len(failures), failed=len(failures), requests=1)
+    return failures
+
+
+def send_emails(messages: Iterable[EmailMessage], send: Callable | None = None, client=None,
+                max_workers: int | None = None,
+                on_result: Callable[[EmailMessage, Exception | None], None] | None = None) -> EmailDeliveryStats:
+    """Deliver ``messages`` concurrently and return what happened.
+
+    A failing message is logged and counted, never stops the others. ``on_result`` is
+    called from the sending threads with each message and its error, or None; an error it
+    raises is logged and does not stop the others either. With
+    ``SES_BULK_TEMPLATE_NAME`` set, messages go out in SendBulkTemplatedEmail batches;
+    otherwise each one is sent with ``send``. Jobs pass their own reference to
+    :func:`send_email` so tests patching it see every message; bulk sending only
+    replaces the real ``send_email``.
+    """
+    messages = list(messages)
+    stats = EmailDeliveryStats()
+    if not messages:
+        return stats
+    send = send or send_email
+    template_name = os.environ.get("SES_BULK_TEMPLATE_NAME")
+    started = time.perf_counter()
+
+    def report(message, error):
+        if on_result:
+            try:
+                on_result(message, error)
+            except Exception as e:
+                log.error("Recording the result of email to %s failed", message.to_address, exc_info=e)
+
+    if template_name and send is send_email:
+        if not has_ses_credentials() and client is None:
+            raise NoCredentialsError()
+        batches = [messages[i:i + SES_BULK_BATCH_SIZE] for i in range(0, len(messages), SES_BULK_BATCH_SIZE)]
+
+        def deliver(batch):
+            try:
+                failures = send_bulk_templated(batch, template_name, client, stats)
+            except Exception as e:
+                log.error("Bulk email batch of %d failed", len(batch), exc_info=e)
+                stats.record(failed=len(batch), requests=1)
+                failures = {message: e for message in batch}
+            for message in batch:
+                report(message, failures.get(message))
+        tasks = batches
+    else:
+        def deliver(message):
+            error = None
+            try:
+                send(message.subject, message.body, message.to_address)
+                stats.record(sent=1, requests=1)
+            except Exception as e:
+                log.error("Email to %s failed", message.to_address, exc_info=e)
+                stats.record(failed=1, requests=1)
+                error = e
+            report(message, error)
+        tasks = messages
+
+    with ThreadPoolExecutor(max_workers=min(max_workers or EMAIL_SENDER_WORKERS, len(tasks))) as executor:
+        list(executor.map(deliver, tasks))
+    stats.seconds = time.perf_counter() - started
+    log.info("Email delivery finished: %s", stats)
+    return stats
+
+
 if __name__ == "__main__":
     import dotenv
     dotenv.load_dotenv()
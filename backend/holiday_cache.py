@@ -0,0 +1,130 @@
+"""Country holidays stored in Mongo, so they are computed once for the whole deployment.
+
+``holidays.country_holidays`` runs the library's rule engine in Python for every country
+and year it is asked about, and its result only lives as long as the process. Here each
+(country, year, library version) is computed at most once, saved as a
+:class:`~backend.model.HolidayCalendar`, and read back by every other process.
+:func:`load_holiday_cache` reads all stored calendars with one query at startup, so a
+fresh process answers holiday questions without computing or querying anything.
+"""
+import logging
+import threading
+from datetime import date
+from typing import Iterable
+
+import holidays
+from mongoengine import NotUniqueError
+
+from .model import HolidayCalendar
+
+log = logging.getLogger(__name__)
+
+LIBRARY_VERSION = holidays.__version__
+DEFAULT_WEEKEND = frozenset({5, 6})
+
+
+class CachedHolidays(dict):
+    """Holiday names by date, with the parts of ``holidays.HolidayBase`` callers rely on.
+
+    Like ``HolidayBase``, one made for a ``country`` adds the calendar of any other year
+    the first time a date of that year is looked up.
+    """
+
+    def __init__(self, days=(), weekend: Iterable[int] = DEFAULT_WEEKEND, weekend_workdays: Iterable[date] = (),
+                 country: str | None = None, years: Iterable[int] = ()):
+        super().__init__(days)
+        self.weekend = frozenset(weekend)
+        self.weekend_workdays = frozenset(weekend_workdays)
+        self.country = country
+        self.years = set(years)
+
+    def _expand(self, day) -> None:
+        if self.country is not None and isinstance(day, date) and day.year not in self.years:
+            self._add(day.year, get_holiday_calendars(self.country, [day.year]))
+
+    def _add(self, year: int, calendar: "CachedHolidays") -> None:
+        self.update(calendar)
+        self.weekend = self.weekend | calendar.weekend
+        self.weekend_workdays = self.weekend_workdays | calendar.weekend_workdays
+        self.years.add(year)
+
+    def __contains__(self, day) -> bool:
+        self._expand(day)
+        return super().__contains__(day)
+
+    def __getitem__(self, day):
+        self._expand(day)
+        return super().__getitem__(day)
+
+    def get(self, day, default=None):
+        self._expand(day)
+        return super().get(day, default)
+
+    def is_working_day(self, day: date) -> bool:
+        """Same rule as ``HolidayBase.is_working_day``: weekends are off unless worked, holidays are off."""
+        return day in self.weekend_workdays if day.weekday() in self.weekend else day not in self
+
+
+_calendars: dict[tuple[str, int], CachedHolidays] = {}
+_calendars_lock = threading.Lock()
+
+
+def _from_document(calendar: HolidayCalendar) -> CachedHolidays:
+    return CachedHolidays({date.fromisoformat(day): name for day, name in calendar.holidays.items()},
+                          calendar.weekend, map(date.fromisoformat, calendar.weekend_workdays))
+
+
+def _compute(country: str, year: int) -> HolidayCalendar:
+    try:
+        computed = holidays.country_holidays(country, years=year)
+    except NotImplementedError as e:  # there are no holidays for some countries, but it's fine
+        log.warning(e, exc_info=e)
+        return HolidayCalendar(country=country, year=year, library_version=LIBRARY_VERSION,
+                               weekend=sorted(DEFAULT_WEEKEND))
+    return HolidayCalendar(country=country, year=year, library_version=LIBRARY_VERSION,
+                           holidays={day.isoformat(): name for day, name in computed.items()},
+                           weekend=sorted(computed.weekend),
+                           weekend_workdays=sorted(day.isoformat() for day in computed.weekend_workdays))
+
+
+def load_holiday_cache() -> int:
+    """Read every stored calendar of the installed library version into memory."""
+    loaded = {(calendar.country, calendar.year): _from_document(calendar)
+              for calendar in HolidayCalendar.objects(library_version=LIBRARY_VERSION)}
+    with _calendars_lock:
+        _calendars.update(loaded)
+    log.info("Loaded %d holiday calendars", len(loaded))
+    return len(loaded)
+
+
+def clear_holiday_cache():
+    """Forget the calendars held in memory; the stored ones are kept."""
+    with _calendars_lock:
+        _calendars.clear()
+
+
+def get_holiday_calendars(country: str, years: Iterable[int]) -> CachedHolidays:
+    """The holidays of ``country`` over ``years``: from memory, else from Mongo, else computed and stored."""
+    years = sorted(set(years))
+    with _calendars_lock:
+        found = {year: _calendars[(country, year)] for year in years if (country, year) in _calendars}
+    missing = [year for year in years if year not in found]
+    if missing:
+        stored = {calendar.year: calendar for calendar in HolidayCalendar.objects(
+            library_version=LIBRARY_VERSION, country=country, year__in=missing)}
+        for year in missing:
+            calendar = stored.get(year)
+            if calendar is None:
+                calendar = _compute(country, year)
+                try:
+                    calendar.save(force_insert=True)
+                except NotUniqueError:
+                    pass  # another process stored the same calendar first
+            found[year] = _from_document(calendar)
+        with _calendars_lock:
+            _calendars.update({(country, year): found[year] for year in missing})
+    # A new object each time: the caller's copy expands, the cached calendars do not.
+    result = CachedHolidays(weekend=found[years[0]].weekend, country=country)
+    for year in years:
+        result._add(year, found[year])
+    return result
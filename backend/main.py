@@ -27,14 +27,10 @@ from .dependencies import (
     get_current_user_allow_expired,
     create_refresh_token,
 )
+from .holiday_cache import load_holiday_cache
 from .model import User, Tenant
 from .routers import users, daytypes, management, teams
-from .scheduled.activate_trials import activate_trials
-from .scheduled.apply_due_separations import apply_due_separations
-from .scheduled.birthdays import send_birthday_email_updates
-from .scheduled.update_max_team_members_numbers import run_update_max_team_members_numbers
-from .scheduled.absence_starts import send_absence_email_updates, send_upcoming_absence_email_updates
-from .scheduled.day_audit_notifications import send_recent_calendar_change_notifications
+from .scheduled.jobs import add_scheduled_jobs
 
 origins = [
     "http://localhost",
@@ -52,24 +48,20 @@ TELEGRAM_BOT_USERNAME = os.getenv("TELEGRAM_BOT_USERNAME", "")
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 
 MULTITENANCY_ENABLED = os.getenv("MULTITENANCY_ENABLED", False)
+# Set to False when scheduled jobs run in their own process (python -m backend.worker).
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "True").lower() not in ("false", "0", "no")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(send_recent_calendar_change_notifications, 'cron', minute=0)
-    # Runs before the notification jobs so a member who left yesterday is already
-    # archived by the time the digests are built.
-    scheduler.add_job(apply_due_separations, 'cron', hour=0, minute=10)
-    scheduler.add_job(send_absence_email_updates, 'cron', hour=6, minute=0)
-    scheduler.add_job(send_upcoming_absence_email_updates, 'cron', hour=6, minute=1)
-    scheduler.add_job(send_birthday_email_updates, 'cron', hour=6, minute=5)
-    if MULTITENANCY_ENABLED:
-        scheduler.add_job(run_update_max_team_members_numbers, 'cron', hour=1, minute=5)
-        scheduler.add_job(activate_trials, 'cron', hour=2, minute=5)
-    scheduler.start()
+    load_holiday_cache()
+    scheduler = None
+    if SCHEDULER_ENABLED:
+        scheduler = add_scheduled_jobs(BackgroundScheduler(), bool(MULTITENANCY_ENABLED))
+        scheduler.start()
     yield
-    scheduler.shutdown()
+    if scheduler:
+        scheduler.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
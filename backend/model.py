@@ -6,7 +6,9 @@ import secrets
 import uuid
 from datetime import date, datetime, timezone, timedelta
 from enum import Enum
-from typing import Iterable
+from functools import lru_cache
+from typing import Iterable, Mapping, NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import mongoengine
 import mongomock
@@ -16,7 +18,8 @@ from bson import ObjectId
 from bson.errors import InvalidId
 from mongoengine import StringField, ListField, connect, Document, EmbeddedDocument, \
     EmbeddedDocumentListField, UUIDField, EmailField, ReferenceField, MapField, EmbeddedDocumentField, BooleanField, \
-    LongField, DateTimeField, IntField, DateField, DecimalField, QuerySet
+    LongField, DateTimeField, IntField, DateField, DecimalField, QuerySet, BinaryField, FloatField
+from mongoengine.errors import NotUniqueError, SaveConditionError
 from mongoengine.queryset.manager import queryset_manager
 from pwdlib import PasswordHash
 from pwdlib.hashers.argon2 import Argon2Hasher
@@ -24,6 +27,7 @@ from pwdlib.hashers.bcrypt import BcryptHasher
 from pymongo import MongoClient
 import pyotp
 
+from .compact_days import DayTypeBits
 from .mongodb_migration_engine import run_migrations
 from .utils import get_today
 
@@ -89,14 +93,34 @@ def add_a_month(source_date):
     return source_date + relativedelta(months=1)
 
 
+DEFAULT_TENANT_TIMEZONE = "UTC"
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def _validate_timezone(name):
+    if not is_valid_timezone(name):
+        raise mongoengine.ValidationError(f"Unknown timezone {name}")
+
+
 class Tenant(Document):
     name = StringField(required=True, unique=True)
     identifier = StringField(required=True, unique=True)
+    # IANA name; daily digests go out in the tenant's local morning.
+    timezone = StringField(required=True, default=DEFAULT_TENANT_TIMEZONE, validation=_validate_timezone)
     creation_date = DateTimeField(required=True, default=lambda: datetime.now(timezone.utc))
     status = StringField(required=True, choices=['trial', 'active', 'blocked', 'free'], default='trial')
     trial_until = DateTimeField(required=True, default=lambda: add_a_month(datetime.now(timezone.utc)))
     current_period = DateTimeField(required=True, default=lambda: datetime.now(timezone.utc))
     max_team_members_in_periods = MapField(IntField())
+    # Moved by every day type change; see DayType.get_masks.
+    day_types_version = IntField(required=True, default=0)
 
     meta = {
         "indexes": [
@@ -137,6 +161,9 @@ class Tenant(Document):
         self.status = 'free'
         self.save()
 
+    def zone(self) -> ZoneInfo:
+        return ZoneInfo(self.timezone or DEFAULT_TENANT_TIMEZONE)
+
     def update_max_team_members_in_the_period(self):
         now = datetime.now(timezone.utc)
         self.current_period = self.current_period.replace(tzinfo=timezone.utc)
@@ -197,6 +224,20 @@ class User(Document):
         "index_background": True
     }
 
+    # Bumped on every save and delete in this process. In-memory caches of user lookups
+    # include it in their key, so a disabled, deleted or re-keyed user is seen at once.
+    cache_generation = 0
+
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        User.cache_generation += 1
+        return result
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        User.cache_generation += 1
+        return result
+
     def __str__(self):
         tenant_names = ', '.join(tenant.name for tenant in self.tenants)
         return f"User(name='{self.name}', email='{self.email}', tenants=[{tenant_names}], disabled={self.disabled})"
@@ -421,30 +462,60 @@ def generate_random_hex_color():
     return "#{:06x}".format(random.randint(0, 0xFFFFFF))
 
 
+DAY_TYPE_SAVE_ATTEMPTS = 5
+
+
 class DayType(Document):
     tenant = ReferenceField(Tenant, required=True, reverse_delete_rule=mongoengine.CASCADE)
     name = StringField(required=True, unique_with="tenant")
     identifier = StringField(required=True, unique_with="tenant")
     color = StringField(default=generate_random_hex_color)
     is_absence = BooleanField(default=False)
+    # This day type's bit in the tenant's day type masks. Assigned on first save, never
+    # changed, and freed only when the day type is deleted, which it cannot be while in use.
+    bit = IntField(min_value=0)
 
     meta = {
         "indexes": [
-            ("tenant", "identifier")
+            ("tenant", "identifier"),
+            # A concurrent create that picked the same bit fails here; save() retries it.
+            {"fields": ["tenant", "bit"], "unique": True, "partialFilterExpression": {"bit": {"$exists": True}}},
         ],
         "index_background": True
     }
 
     SYSTEM_DAY_TYPE_IDENTIFIERS = ['vacation', 'compensatory_leave', 'override', 'birthday']
 
+    def save(self, *args, **kwargs):
+        if self.bit is not None:
+            return super().save(*args, **kwargs)
+        bit = DayType.free_bit(self.tenant)
+        for attempt in range(DAY_TYPE_SAVE_ATTEMPTS):
+            self.bit = bit
+            try:
+                return super().save(*args, **kwargs)
+            except NotUniqueError:
+                # Retry only when another day type of the tenant took the bit since it was
+                # read; a bit that is still free means the conflict was elsewhere, e.g. the name.
+                bit = DayType.free_bit(self.tenant)
+                if bit == self.bit or attempt == DAY_TYPE_SAVE_ATTEMPTS - 1:
+                    self.bit = None
+                    raise
+
+    @classmethod
+    def free_bit(cls, tenant) -> int:
+        """The lowest bit position no day type of ``tenant`` holds."""
+        taken = set(cls.objects(tenant=tenant, bit__ne=None).scalar("bit"))
+        return next(bit for bit in range(len(taken) + 1) if bit not in taken)
+
     @classmethod
     def init_day_types(cls, tenant):
         if cls.objects(tenant=tenant).count() == 0:
             initial_day_types = [
-                cls(tenant=tenant, name='Vacation', identifier='vacation', color="#FF6666", is_absence=True),
-                cls(tenant=tenant, name='Compensatory leave', identifier='compensatory_leave', color="#CC99FF", is_absence=True),
-                cls(tenant=tenant, name='Holiday override', identifier='override', color="#EEEEEE", is_absence=False),
-                cls(tenant=tenant, name='Birthday', identifier='birthday', color="#FFC0CB", is_absence=False),
+                cls(tenant=tenant, name='Vacation', identifier='vacation', color="#FF6666", is_absence=True, bit=0),
+                cls(tenant=tenant, name='Compensatory leave', identifier='compensatory_leave', color="#CC99FF", is_absence=True, bit=1),
+                cls(tenant=tenant, name='Holiday override', identifier='override', color="#EEEEEE", is_absence=False, bit=2),
+                cls(tenant=tenant, name='Birthday', identifier='birthday', color="#FFC0CB", is_absence=False, bit=3),
             ]
             cls.objects.insert(initial_day_types, load_bulk=False)
 
@@ -452,9 +523,64 @@ class DayType(Document):
     def get_vacation_day_type_id(cls, tenant):
         return str(cls.objects(tenant=tenant, identifier='vacation').first().id)
 
+    @classmethod
+    def get_absence_day_type_ids(cls, tenant) -> set:
+        return set(cls.objects(tenant=tenant, is_absence=True).scalar("id"))
+
     @classmethod
     def get_birthday_day_type_id(cls, tenant):
-        return str(cls.objects(tenant=tenant, identifier='birthday').first().id)
+        """Cached per tenant: system day types can be neither deleted nor re-identified."""
+        return _get_birthday_day_type_id(str(getattr(tenant, "id", tenant)))
+
+    @classmethod
+    def get_masks(cls, tenant) -> "DayTypeMasks":
+        """The tenant's day type bits and masks, cached per tenant and day types version.
+
+        Pass the Tenant document when there is one; for a bare reference the version
+        costs a query.
+        """
+        if isinstance(tenant, Tenant):
+            return _get_day_type_masks(str(tenant.id), tenant.day_types_version)
+        tenant_id = getattr(tenant, "id", tenant)
+        stored = Tenant.objects(id=tenant_id).only("day_types_version").as_pymongo().get()
+        return _get_day_type_masks(str(tenant_id), stored.get("day_types_version", 0))
+
+
+@lru_cache(maxsize=1024)
+def _get_birthday_day_type_id(tenant_id: str) -> str:
+    day_type_id = DayType.objects(tenant=ObjectId(tenant_id), identifier='birthday').scalar('id').first()
+    if day_type_id is None:  # not cached, so day types initialised later are found
+        raise DayType.DoesNotExist(f"No birthday day type for tenant {tenant_id}")
+    return str(day_type_id)
+
+
+class DayTypeMasks(NamedTuple):
+    """A tenant's day types as bits at their stored positions, and the masks read paths test."""
+    bits: DayTypeBits
+    absence: int
+    vacation: int
+
+
+@lru_cache(maxsize=1024)
+def _get_day_type_masks(tenant_id: str, day_types_version: int) -> DayTypeMasks:
+    day_types = list(DayType.objects(tenant=ObjectId(tenant_id)).only("id", "name", "identifier", "is_absence", "bit"))
+    bits = DayTypeBits.from_positions({day_type.id: day_type.bit for day_type in day_types if day_type.bit is not None})
+    for day_type in day_types:
+        if day_type.bit is None:  # saved before bits existed and not migrated yet
+            bits.add([day_type.id])
+    vacation = [day_type.id for day_type in day_types if day_type.identifier == "vacation"]
+    return DayTypeMasks(bits,
+                        absence=bits.mask(day_type.id for day_type in day_types if day_type.is_absence),
+                        vacation=bits.mask(vacation))
+
+
+def bump_day_types_version(tenant) -> None:
+    """Call after creating, changing or deleting one of ``tenant``'s day types.
+
+    The version is part of the day type masks' cache key, so every process, the
+    scheduler worker included, rebuilds them on its next read of the tenant.
+    """
+    tenant.modify(inc__day_types_version=1)
 
 
 class DayEntry(EmbeddedDocument):
@@ -549,6 +675,9 @@ class TeamMember(EmbeddedDocument):
         return not getattr(self, "is_deleted", False) and self.is_archived(today)
 
 
+TEAM_SAVE_ATTEMPTS = 5
+
+
 class Team(Document):
     tenant = ReferenceField(Tenant, required=True, reverse_delete_rule=mongoengine.CASCADE)
     name = StringField(required=True, unique_with="tenant")
@@ -563,11 +692,20 @@ class Team(Document):
     is_deleted = BooleanField(default=False)
     deleted_at = DateTimeField(default=None)
     deleted_by = ReferenceField('User', reverse_delete_rule=mongoengine.NULLIFY, default=None)
+    # Moves on every save, so anything derived from the team's content (report job
+    # results) can be cached under it. Bulk queryset updates that change what a report
+    # or feed shows must $inc it too; see bump_team_versions.
+    version = IntField(default=0)
+    updated_at = DateTimeField(default=None)
 
     meta = {
         "indexes": [
             "tenant",
             ("tenant", "team_members.email"),
+            # The nightly separation sweep looks up members by these two.
+            ("team_members.last_working_day", "team_members.is_deleted"),
+            # The birthday digest looks up today's celebrants by MM-DD.
+            "team_members.birthday",
         ],
         "index_background": True,
         "queryset_class": SoftDeleteQuerySet,
@@ -577,6 +715,28 @@ class Team(Document):
     def objects(doc_cls, queryset):
         return queryset.alive()
 
+    def save(self, *args, **kwargs):
+        """Save and move the version by one, also when another save of the team overlaps.
+
+        An update is conditional on the version this copy was loaded with; when another
+        save got there first, the stored version is read again and the save retried.
+        """
+        self.updated_at = datetime.now(timezone.utc)
+        if self._created or self.pk is None:
+            self.version = (self.version or 0) + 1
+            return super().save(*args, **kwargs)
+        expected = self.version or 0
+        for attempt in range(TEAM_SAVE_ATTEMPTS):
+            self.version = expected + 1
+            # Teams saved before versions were backfilled have no version field yet.
+            condition = {"version__in": [0, None]} if expected == 0 else {"version": expected}
+            try:
+                return super().save(*args, save_condition=condition, **kwargs)
+            except SaveConditionError:
+                if attempt == TEAM_SAVE_ATTEMPTS - 1:
+                    raise
+                expected = Team.objects_with_deleted(id=self.pk).scalar("version").first() or 0
+
     @queryset_manager
     def objects_with_deleted(doc_cls, queryset):
         return queryset
@@ -613,11 +773,19 @@ class Team(Document):
     def subscriber_ids(self) -> list[str]:
         return list((self.notification_preferences or {}).keys())
 
-    def list_subscribers(self) -> list[User]:
+    def list_subscribers(self, users_by_id: Mapping[str, User] | None = None) -> list[User]:
+        """Resolve the subscribers, in subscription order.
+
+        ``users_by_id`` are users already loaded by the caller, e.g. a notification job
+        that fetched the subscribers of every team in one query; no query is run then.
+        """
         subscriber_ids = self.subscriber_ids()
         if not subscriber_ids:
             return []
 
+        if users_by_id is not None:
+            return self._order_subscribers(subscriber_ids, users_by_id)
+
         object_ids: list[ObjectId] = []
         for raw_id in subscriber_ids:
             try:
@@ -631,8 +799,9 @@ class Team(Document):
             return []
 
         users = User.objects(id__in=object_ids)
-        users_by_id = {str(user.id): user for user in users}
+        return self._order_subscribers(subscriber_ids, {str(user.id): user for user in users})
 
+    def _order_subscribers(self, subscriber_ids: list[str], users_by_id: Mapping[str, User]) -> list[User]:
         ordered_subscribers: list[User] = []
         for raw_id in subscriber_ids:
             user = users_by_id.get(raw_id)
@@ -652,16 +821,18 @@ class Team(Document):
         self,
         notification_type: str | None = None,
         exclude_user_ids: Iterable[str] | None = None,
+        users_by_id: Mapping[str, User] | None = None,
     ) -> list[str]:
         """Return subscriber emails filtered by an optional notification type.
 
         The lookup keeps backwards compatibility by treating missing preferences as a
-        subscription to every notification type.
+        subscription to every notification type. ``users_by_id`` is passed on to
+        :meth:`list_subscribers`.
         """
         seen = set()
         resolved_emails: list[str] = []
         excluded_ids = {str(user_id) for user_id in (exclude_user_ids or []) if user_id}
-        for subscriber in self.list_subscribers():
+        for subscriber in self.list_subscribers(users_by_id):
             subscriber_id = str(getattr(subscriber, "id", ""))
             if excluded_ids and subscriber_id in excluded_ids:
                 continue
@@ -687,6 +858,15 @@ class Team(Document):
             cls.objects.insert(initial_teams, load_bulk=False)
 
 
+def bump_team_versions(tenant) -> None:
+    """Move the version of every team in the tenant.
+
+    For tenant-wide changes that alter what the teams render as without touching the
+    team documents themselves, such as a day type being renamed.
+    """
+    Team.objects_with_deleted(tenant=tenant).update(inc__version=1, set__updated_at=datetime.now(timezone.utc))
+
+
 def get_unique_countries(tenant):
     # Deliberately matches on the stored is_deleted flag rather than the derived
     # lifecycle state: derived-active is always a subset of stored-alive, so this can
@@ -719,6 +899,145 @@ class DayAudit(Document):
     meta = {
         "indexes": [
             ("tenant", "team", "member_uid", "date"),
+            "timestamp",
+        ],
+        "index_background": True,
+    }
+
+
+REPORT_JOB_RETENTION_DAYS = 7
+
+
+class ReportJob(Document):
+    """An absence report rendered in the background and kept for download.
+
+    Finished jobs double as the result cache: a request whose ``cache_key`` matches a
+    done job is answered with it instead of rendering again. The key covers the tenant,
+    range, team selection, format and the versions of the teams in scope, so any write
+    to those teams makes the cached file unreachable rather than stale. The result is
+    kept inline, which caps a report at the 16 MB document limit.
+
+    Pending jobs are a queue: the scheduled report job worker claims them one by one,
+    and a running job whose claim expires lost its worker and is claimed again.
+    """
+    tenant = ReferenceField(Tenant, required=True, reverse_delete_rule=mongoengine.CASCADE)
+    requested_by = ReferenceField(User, reverse_delete_rule=mongoengine.NULLIFY, default=None)
+    cache_key = StringField(required=True)
+    start_date = DateField(required=True)
+    end_date = DateField(required=True)
+    team_ids = ListField(StringField())
+    report_format = StringField(required=True)
+    status = StringField(required=True, choices=["pending", "running", "done", "failed"], default="pending")
+    progress = IntField(default=0)  # percent
+    attempts = IntField(default=0)
+    # Renewed with every progress write while the job runs.
+    claimed_until = DateTimeField(default=None)
+    error = StringField(default=None)
+    result = BinaryField(default=None)
+    created_at = DateTimeField(required=True, default=lambda: datetime.now(timezone.utc))
+    finished_at = DateTimeField(default=None)
+
+    meta = {
+        "indexes": [
+            ("tenant", "cache_key"),
+            ("status", "created_at"),
+            {"fields": ["created_at"], "expireAfterSeconds": REPORT_JOB_RETENTION_DAYS * 24 * 3600},
+        ],
+        "index_background": True,
+    }
+
+
+OUTBOX_RETENTION_DAYS = 30
+
+
+class OutboxMessage(Document):
+    """An email waiting to be sent, or sent, by the outbox dispatcher.
+
+    Jobs enqueue instead of sending. ``idempotency_key`` is unique, so the same digest
+    enqueued twice - by a job rerun after a restart, or by every API worker running the
+    same job - is stored and sent once. Sent messages expire after
+    :data:`OUTBOX_RETENTION_DAYS`; the key blocks re-sending for that long.
+    """
+    idempotency_key = StringField(required=True, unique=True)
+    subject = StringField(required=True)
+    body = StringField(required=True)
+    to_address = StringField(required=True)
+    status = StringField(required=True, choices=["pending", "sending", "sent", "failed"], default="pending")
+    attempts = IntField(default=0)
+    last_error = StringField(default=None)
+    created_at = DateTimeField(required=True, default=lambda: datetime.now(timezone.utc))
+    # Not dispatched before this time: set for retries and for claims in progress.
+    available_at = DateTimeField(required=True, default=lambda: datetime.now(timezone.utc))
+    sent_at = DateTimeField(default=None)
+
+    meta = {
+        "indexes": [
+            ("status", "available_at"),
+            {"fields": ["sent_at"], "expireAfterSeconds": OUTBOX_RETENTION_DAYS * 24 * 3600},
+        ],
+        "index_background": True,
+    }
+
+
+SCHEDULER_RUN_RETENTION_DAYS = 90
+
+
+class JobLock(Document):
+    """A lease on one scheduled job, so a run happens on one process cluster-wide.
+
+    Every API process schedules the same jobs; the one that inserts the lock, or takes
+    over an expired one, runs the job and the others skip it. The lease is not released
+    when the run ends - it outlives the run so a process whose clock is a little behind
+    cannot run the same slot again. Expired locks are removed by the TTL index.
+    """
+    name = StringField(primary_key=True)
+    owner = StringField(required=True)
+    acquired_at = DateTimeField(required=True)
+    expires_at = DateTimeField(required=True)
+
+    meta = {
+        "indexes": [
+            {"fields": ["expires_at"], "expireAfterSeconds": 0},
+        ],
+        "index_background": True,
+    }
+
+
+class SchedulerRun(Document):
+    """One run of a scheduled job: who ran it, how long it took and how it ended."""
+    job = StringField(required=True)
+    owner = StringField(required=True)
+    started_at = DateTimeField(required=True)
+    duration_seconds = FloatField(required=True)
+    outcome = StringField(required=True, choices=["succeeded", "failed"])
+    error = StringField(default=None)
+
+    meta = {
+        "indexes": [
+            ("job", "-started_at"),
+            {"fields": ["started_at"], "expireAfterSeconds": SCHEDULER_RUN_RETENTION_DAYS * 24 * 3600},
+        ],
+        "index_background": True,
+    }
+
+
+class HolidayCalendar(Document):
+    """One country's holidays for one year, as computed by one version of the holidays library.
+
+    Building a calendar runs the library's rules in Python; storing the result lets every
+    process load it instead. The library version is part of the key, so an upgrade that
+    corrects a rule is picked up without clearing the collection.
+    """
+    country = StringField(required=True)  # ISO 3166 alpha-2
+    year = IntField(required=True)
+    library_version = StringField(required=True)
+    holidays = MapField(StringField())  # ISO date -> holiday name
+    weekend = ListField(IntField())  # weekday numbers, Monday is 0
+    weekend_workdays = ListField(StringField())  # ISO dates of weekend days that are worked
+
+    meta = {
+        "indexes": [
+            {"fields": ["library_version", "country", "year"], "unique": True},
         ],
         "index_background": True,
     }
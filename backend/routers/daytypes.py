@@ -7,7 +7,7 @@ from pydantic import BaseModel, Field
 
 from ..dependencies import get_current_active_user_check_tenant, get_tenant, mongo_to_pydantic
 from ..dependencies import tenant_var
-from ..model import Team, DayType, User, Tenant
+from ..model import Team, DayType, User, Tenant, bump_day_types_version, bump_team_versions
 
 router = APIRouter(prefix="/daytypes", tags=["Day Type Operations"])
 
@@ -54,6 +54,8 @@ async def create_day_type(day_type_dto: DayTypeWriteDTO,
     day_type_data = day_type_dto.model_dump()
     day_type_data.update({"tenant": tenant})
     DayType(**day_type_data).save()
+    bump_day_types_version(tenant)
+    bump_team_versions(tenant)  # a new day type adds a report column
     return {"message": "DayType created successfully"}
 
 
@@ -77,6 +79,8 @@ async def update_day_type(day_type_id: str, day_type_dto: DayTypeWriteDTO,
     day_type.is_absence = day_type_dto.is_absence
     day_type.save()
     DayTypeReadDTO.from_mongo_reference_field.cache_clear()
+    bump_day_types_version(tenant)
+    bump_team_versions(tenant)
     return {"message": "DayType updated successfully"}
 
 
@@ -110,5 +114,7 @@ async def delete_day_type(day_type_id: str,
 
     day_type.delete()
     DayTypeReadDTO.from_mongo_reference_field.cache_clear()
+    bump_day_types_version(tenant)
+    bump_team_versions(tenant)
     return {"message": "DayType deleted successfully"}
 
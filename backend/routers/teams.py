@@ -1,29 +1,42 @@
 from __future__ import annotations
 
 import asyncio
+import csv
 import datetime
+import email.utils
+import hashlib
+import io
+import itertools
+import json
 import logging
 import math
+import os
+import pickle
+import tempfile
 import time
 import uuid
 from collections import defaultdict
 from decimal import Decimal
+from enum import Enum
 from functools import lru_cache, partial
-from io import BytesIO
-from typing import List, Dict, Annotated, Self, Generator, Optional, Tuple
+from typing import IO, List, Dict, Annotated, NamedTuple, Self, Generator, Iterable, Iterator, Optional, Tuple
 
 import pycountry
 from bson import ObjectId
-from fastapi import APIRouter, status, Body, Depends, Query, HTTPException
+from fastapi import APIRouter, status, Body, Depends, Query, HTTPException, Request
 from fastapi.responses import StreamingResponse, Response
 from icalendar import Calendar, Event
+from mongoengine import Q
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
+from prometheus_client import Counter, Histogram
 from pycountry.db import Country
 from pydantic import BaseModel, Field, computed_field, EmailStr, PrivateAttr, field_serializer
 from pydantic.functional_validators import field_validator, model_validator
 from starlette.concurrency import run_in_threadpool
 
+from ..absence_intervals import get_team_absence_index
+from ..compact_days import CompactDays
 from ..dependencies import get_current_active_user_check_tenant, get_tenant, mongo_to_pydantic, tenant_var
 from ..model import (
     Team,
@@ -37,6 +50,7 @@ from ..model import (
     Tenant,
     DayEntry,
     DayAudit,
+    ReportJob,
     SeparationType,
 )
 from ..notification_types import (
@@ -49,6 +63,12 @@ from ..routers.users import UserWithoutTenantsDTO
 from ..utils import get_country_holidays
 from ..utils import get_today
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency, only needed for the Parquet export
+    pyarrow = None
+
 log = logging.getLogger(__name__)
 router = APIRouter(prefix="/teams", tags=["Teams"])
 
@@ -130,20 +150,16 @@ class TeamMemberReadDTO(TeamMemberWriteDTO):
         used = defaultdict(int)
         planned = defaultdict(int)
         charged = defaultdict(int)
-        # Look the day type up by identifier, not name: renaming the system Vacation day
-        # type is allowed (see daytypes.update_day_type) and a name lookup would then
+        # The vacation mask is found by identifier, not name: renaming the system Vacation
+        # day type is allowed (see daytypes.update_day_type) and a name lookup would then
         # miss, taking the whole /teams response down with it.
-        vacation_doc = DayType.objects(tenant=tenant_var.get(), identifier="vacation").first()
-        if vacation_doc is None:
+        masks = DayType.get_masks(tenant_var.get())
+        if not masks.vacation:
             self._vacation_split_cache = ({}, {}, {})
             return self._vacation_split_cache
-        vacation_day_type = mongo_to_pydantic(vacation_doc, DayTypeReadDTO)
 
         today = get_today()
-        for date_str, day_entry in self.days.items():
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-            if vacation_day_type not in day_entry.day_types:
-                continue
+        for date in CompactDays.from_days(self.days, masks.bits).days_with(masks.vacation):
             if date <= today:
                 used[date.year] += 1
             else:
@@ -222,14 +238,18 @@ class TeamMemberReadDTO(TeamMemberWriteDTO):
 
     @model_validator(mode='after')
     def include_birthday(self) -> Self:
+        if not self.birthday:
+            return self
+        # Both lookups are cached, so serialising a team costs no day type queries.
+        birthday_day_type = DayTypeReadDTO.from_mongo_reference_field(
+            DayType.get_birthday_day_type_id(tenant_var.get())
+        )
+
         def add_birthday(year):
             birthday_date = f"{year}-{self.birthday}"
             if birthday_date not in self.days:
                 self.days[birthday_date] = DayEntryDTO()
             day_entry = self.days[birthday_date]
-            birthday_day_type = DayTypeReadDTO.from_mongo_reference_field(
-                DayType.get_birthday_day_type_id(tenant_var.get())
-            )
 
             def extract_day_type_id(day_type):
                 if isinstance(day_type, DayTypeReadDTO):
@@ -253,10 +273,9 @@ class TeamMemberReadDTO(TeamMemberWriteDTO):
             if birthday_day_type.id not in existing_ids:
                 day_entry.day_types.append(birthday_day_type)
 
-        if self.birthday:
-            current_year = datetime.datetime.now().year
-            add_birthday(current_year)
-            add_birthday(current_year + 1)
+        current_year = datetime.datetime.now().year
+        add_birthday(current_year)
+        add_birthday(current_year + 1)
 
         return self
 
@@ -880,6 +899,61 @@ async def list_team_subscribers(
     return subscribers
 
 
+# Longest range /teams/{team_id}/coverage answers in one request.
+COVERAGE_MAX_DAYS = 366
+
+
+class DayCoverageDTO(BaseModel):
+    date: datetime.date
+    members: int
+    absent: int
+    available: int
+
+
+class TeamCoverageDTO(BaseModel):
+    team_id: str
+    days: List[DayCoverageDTO]
+
+
+def employment_span(member: TeamMember) -> tuple[datetime.date, datetime.date]:
+    """First and last day a member counts towards the team's headcount."""
+    first = member.employee_start_date or datetime.date.min
+    if member.last_working_day:
+        last = member.last_working_day
+    elif member.is_deleted:
+        # Archived without a recorded last day: counted until the day before archiving.
+        last = member.deleted_at.date() - datetime.timedelta(days=1) if member.deleted_at else datetime.date.min
+    else:
+        last = datetime.date.max
+    return first, last
+
+
+@router.get("/{team_id}/coverage", response_model=TeamCoverageDTO)
+async def get_team_coverage(
+        team_id: str,
+        current_user: Annotated[User, Depends(get_current_active_user_check_tenant)],
+        tenant: Annotated[Tenant, Depends(get_tenant)],
+        from_date: Annotated[datetime.date, Query(alias="from")],
+        to_date: Annotated[datetime.date, Query(alias="to")],
+):
+    """Per day in ``from``..``to``: how many members the team has, and how many are absent."""
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days >= COVERAGE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The range can span at most {COVERAGE_MAX_DAYS} days")
+    team = Team.objects(tenant=tenant, id=team_id).first()
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+
+    absence_index = get_team_absence_index(team, DayType.get_masks(tenant))
+    coverage = absence_index.coverage(from_date, to_date, {str(member.uid): employment_span(member)
+                                                           for member in team.team_members})
+    return TeamCoverageDTO(team_id=str(team.id), days=[
+        DayCoverageDTO(date=day.date, members=day.members, absent=day.absent, available=day.available)
+        for day in coverage
+    ])
+
+
 @router.get("/{team_id}/notification-preferences", response_model=List[TeamSubscriptionPreferenceDTO])
 async def get_team_notification_preferences(
         team_id: str,
@@ -981,64 +1055,420 @@ def get_working_days(start_date, end_date, country_holidays):
     return working_days
 
 
-def auto_adjust_column_width(ws):
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column
-        for cell in col:
+class ColumnWidthTracker:
+    """Running maximum of the rendered cell length per column.
+
+    A write-only worksheet emits ``<cols>`` before the first row, so the widths have to
+    be known up front. Tracking them while the rows are generated replaces the old pass
+    over every cell of a fully built in-memory sheet.
+    """
+
+    def __init__(self):
+        self.widths: list[int] = []
+
+    def track(self, row: Iterable) -> None:
+        for index, value in enumerate(row):
+            if index == len(self.widths):
+                self.widths.append(0)
+            if value is not None:
+                self.widths[index] = max(self.widths[index], len(str(value)))
+
+    def apply(self, ws) -> None:
+        for index, width in enumerate(self.widths, start=1):
+            ws.column_dimensions[get_column_letter(index)].width = width
+
+
+class ReportFormat(str, Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+REPORT_MEDIA_TYPES = {
+    ReportFormat.XLSX: XLSX_MEDIA_TYPE,
+    ReportFormat.CSV: "text/csv",
+    ReportFormat.PARQUET: PARQUET_MEDIA_TYPE,
+}
+# Rows per Parquet row group: bounds the columnar buffer held before each flush.
+PARQUET_ROW_GROUP_SIZE = 10_000
+# Number of leading text columns (team, member, country); the rest are day counts.
+REPORT_TEXT_COLUMNS = 3
+# Files up to this size stay in memory, larger ones roll over to a temporary file.
+REPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+REPORT_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def write_absence_report_xlsx(headers: List[str], rows: Iterable[list], target: IO[bytes]) -> None:
+    """Write the absence report into ``target`` in constant memory.
+
+    The rows are consumed once: each one is pickled into a temporary spool while the
+    column widths are tracked, then replayed into a write-only workbook. Neither step
+    keeps more than one row in memory, whatever the size of the tenant or the range.
+    """
+    widths = ColumnWidthTracker()
+    widths.track(headers)
+    with tempfile.TemporaryFile() as spool:
+        for row in rows:
+            widths.track(row)
+            pickle.dump(row, spool, protocol=pickle.HIGHEST_PROTOCOL)
+        spool.seek(0)
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Day Type Report")
+        widths.apply(ws)
+        ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}1"
+        ws.append(headers)
+        while True:
             try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except Exception:
-                pass
-        ws.column_dimensions[get_column_letter(column)].width = max_length
+                ws.append(pickle.load(spool))
+            except EOFError:
+                break
+        wb.save(target)
+
+
+def iter_absence_report_csv(headers: List[str], rows: Iterable[list]) -> Iterator[bytes]:
+    """Encode the absence report as CSV, one row per yielded chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in itertools.chain([headers], rows):
+        writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def write_absence_report_parquet(headers: List[str], rows: Iterable[list], target: IO[bytes]) -> None:
+    """Write the absence report into ``target`` as Parquet.
+
+    Rows are transposed into columns one row group at a time, so memory is bounded by
+    ``PARQUET_ROW_GROUP_SIZE`` rather than by the size of the report.
+    """
+    schema = pyarrow.schema(
+        [pyarrow.field(name, pyarrow.string()) for name in headers[:REPORT_TEXT_COLUMNS]] +
+        [pyarrow.field(name, pyarrow.int64()) for name in headers[REPORT_TEXT_COLUMNS:]]
+    )
+    with pyarrow.parquet.ParquetWriter(target, schema) as writer:
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, PARQUET_ROW_GROUP_SIZE)):
+            columns = [list(column) for column in zip(*batch)]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+
+
+def iter_file_chunks(file: IO[bytes], chunk_size: int = REPORT_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream an open binary file from the start and close it once exhausted."""
+    try:
+        file.seek(0)
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+def get_report_headers(tenant) -> tuple[List[str], List[str]]:
+    """Return the report headers and the day type names that make up their tail."""
+    day_type_names = sorted(DayType.objects(tenant=tenant).distinct("name"))
+    headers = ["Team", "Team Member Name", "Country", "Absence Days", "Working Days", "Days Worked",
+               "Hours Worked"] + day_type_names
+    return headers, day_type_names
 
 
 @router.get("/export-absences")
 async def export_absence_report(current_user: Annotated[User, Depends(get_current_active_user_check_tenant)],
                                 tenant: Annotated[Tenant, Depends(get_tenant)],
                                 start_date: datetime.date = Query(...), end_date: datetime.date = Query(...),
-                                team_ids: List[str] | None = Query(None)):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Day Type Report"
+                                team_ids: List[str] | None = Query(None),
+                                report_format: ReportFormat = Query(ReportFormat.XLSX, alias="format")):
+    if report_format is ReportFormat.PARQUET and pyarrow is None:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail="Parquet export requires the optional pyarrow package")
+
+    headers, day_type_names = await run_in_threadpool(get_report_headers, tenant)
+    body_rows = iter_report_body_rows(tenant, start_date, end_date, day_type_names, team_ids)
+    filename = f"absences_{start_date}_{end_date}.{report_format.value}"
+    content_disposition = {"Content-Disposition": f"attachment; filename={filename}"}
+
+    if report_format is ReportFormat.CSV:
+        # Starlette iterates a sync generator in its threadpool, off the event loop.
+        return StreamingResponse(iter_absence_report_csv(headers, body_rows), media_type="text/csv",
+                                 headers=content_disposition)
+
+    report_file = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE)
+    await run_in_threadpool(write_absence_report, report_format, headers, body_rows, report_file)
+    return StreamingResponse(iter_file_chunks(report_file), media_type=REPORT_MEDIA_TYPES[report_format],
+                             headers=content_disposition)
+
+
+# Results are stored inline on the job document, which Mongo caps at 16 MB.
+REPORT_JOB_MAX_RESULT_SIZE = 15 * 1024 * 1024
+# A running job whose claim was not renewed for this long lost its worker, e.g. to a
+# restart, and is claimed again; after REPORT_JOB_MAX_ATTEMPTS claims it fails.
+REPORT_JOB_CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+REPORT_JOB_MAX_ATTEMPTS = 2
+REPORT_JOB_PROGRESS_STEP = 5  # percent between progress writes
+
+
+class ReportJobDTO(BaseModel):
+    id: str
+    status: str
+    progress: int
+    report_format: ReportFormat
+    start_date: datetime.date
+    end_date: datetime.date
+    team_ids: List[str] = []
+    error: str | None = None
+    created_at: datetime.datetime
+    finished_at: datetime.datetime | None = None
+
+
+def report_job_to_dto(job: ReportJob) -> ReportJobDTO:
+    return ReportJobDTO(
+        id=str(job.id),
+        status=job.status,
+        progress=job.progress,
+        report_format=ReportFormat(job.report_format),
+        start_date=job.start_date,
+        end_date=job.end_date,
+        team_ids=list(job.team_ids),
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
 
-    day_type_names = sorted(DayType.objects(tenant=tenant).distinct("name"))
 
-    headers = ["Team", "Team Member Name", "Country", "Absence Days", "Working Days", "Days Worked",
-               "Hours Worked"] + day_type_names
-    ws.append(headers)
-
-    body_rows = await get_report_body_rows(tenant, start_date, end_date, day_type_names, team_ids)
-    for r in body_rows:
-        ws.append(r)
-
-    last_column_letter = get_column_letter(len(headers))
-    ws.auto_filter.ref = f"A1:{last_column_letter}1"
-    auto_adjust_column_width(ws)
-
-    b_io = BytesIO()
-    wb.save(b_io)
-    b_io.seek(0)
-
-    return StreamingResponse(
-        b_io,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=absences_{start_date}_{end_date}.xlsx"
-        },
-    )
+def _report_teams(tenant, team_ids: List[str] | None):
+    """The teams a report covers; ids that are not ObjectIds match nothing, as in the pipeline."""
+    teams_qs = Team.objects(tenant=tenant)
+    if not team_ids:
+        return teams_qs
+    return teams_qs.filter(id__in=[team_id for team_id in team_ids if ObjectId.is_valid(team_id)])
+
+
+def report_cache_key(tenant, start_date: datetime.date, end_date: datetime.date,
+                     team_ids: List[str] | None, report_format: ReportFormat) -> str:
+    """Key a rendered report by its parameters and the data version of its teams.
 
+    The data version is the (id, version) of every team in scope: Team.version moves on
+    every save and day type changes bump it tenant-wide, so a key computed after any
+    relevant write differs from every key computed before it.
+    """
+    versions = sorted((str(team.id), team.version) for team in _report_teams(tenant, team_ids).only("id", "version"))
+    payload = json.dumps([str(tenant.id), start_date.isoformat(), end_date.isoformat(), sorted(team_ids or []),
+                          report_format.value, versions])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def write_absence_report(report_format: ReportFormat, headers: List[str], rows: Iterable[list],
+                         target: IO[bytes]) -> None:
+    if report_format is ReportFormat.CSV:
+        for chunk in iter_absence_report_csv(headers, rows):
+            target.write(chunk)
+    elif report_format is ReportFormat.PARQUET:
+        write_absence_report_parquet(headers, rows, target)
+    else:
+        write_absence_report_xlsx(headers, rows, target)
+
+
+def _track_report_job_progress(job: ReportJob, rows: Iterable[list], total: int) -> Iterator[list]:
+    """Pass rows through, writing the job's progress, and renewing its claim, every few percent."""
+    reported = 0
+    for done, row in enumerate(rows, start=1):
+        yield row
+        progress = min(99, done * 100 // total) if total else 99
+        if progress >= reported + REPORT_JOB_PROGRESS_STEP:
+            job.update(set__progress=progress, set__claimed_until=datetime.datetime.now(
+                datetime.timezone.utc) + REPORT_JOB_CLAIM_TIMEOUT)
+            reported = progress
+
+
+def claim_report_job(now: datetime.datetime) -> ReportJob | None:
+    """Atomically take the oldest pending job, or a running one whose worker is gone."""
+    lost = Q(status="running") & (Q(claimed_until__lte=now) | Q(claimed_until=None))
+    return ReportJob.objects(Q(status="pending") | lost).exclude("result").order_by("created_at").modify(
+        set__status="running", set__claimed_until=now + REPORT_JOB_CLAIM_TIMEOUT, inc__attempts=1, new=True)
+
+
+def run_report_job(job: ReportJob) -> None:
+    """Render a claimed report job and store the file on it."""
+    if job.attempts > REPORT_JOB_MAX_ATTEMPTS:
+        log.error("Report job %s was claimed %d times without finishing", job.id, job.attempts - 1)
+        job.update(set__status="failed", set__error="The report could not be generated.",
+                   set__finished_at=datetime.datetime.now(datetime.timezone.utc))
+        return
+    try:
+        tenant = job.tenant
+        team_ids = list(job.team_ids) or None
+        headers, day_type_names = get_report_headers(tenant)
+        # The member count is an upper bound on the rows, good enough for a progress bar.
+        total = sum(len(team.team_members) for team in _report_teams(tenant, team_ids).only("team_members.uid"))
+        rows = iter_report_body_rows(tenant, job.start_date, job.end_date, day_type_names, team_ids)
+        with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE) as report_file:
+            write_absence_report(ReportFormat(job.report_format), headers,
+                                 _track_report_job_progress(job, rows, total), report_file)
+            size = report_file.tell()
+            if size > REPORT_JOB_MAX_RESULT_SIZE:
+                job.update(set__status="failed", set__finished_at=datetime.datetime.now(datetime.timezone.utc),
+                           set__error="The report is too large; narrow the date range or the team selection.")
+                return
+            report_file.seek(0)
+            result = report_file.read()
+        job.update(set__status="done", set__progress=100, set__result=result,
+                   set__finished_at=datetime.datetime.now(datetime.timezone.utc))
+    except Exception:
+        log.exception("Report job %s failed", job.id)
+        job.update(set__status="failed", set__error="The report could not be generated.",
+                   set__finished_at=datetime.datetime.now(datetime.timezone.utc))
+
+
+def submit_report_job(tenant, user, start_date: datetime.date, end_date: datetime.date,
+                      team_ids: List[str] | None, report_format: ReportFormat) -> ReportJob:
+    """Return a finished or in-flight job for the same report, or queue a new one."""
+    cache_key = report_cache_key(tenant, start_date, end_date, team_ids, report_format)
+    jobs = ReportJob.objects(tenant=tenant, cache_key=cache_key).exclude("result").order_by("-created_at")
+    # A running job that lost its worker is claimed again or failed, so it is in flight too.
+    existing = jobs.filter(status="done").first() or jobs.filter(status__in=["pending", "running"]).first()
+    if existing:
+        return existing
+    return ReportJob(tenant=tenant, requested_by=user, cache_key=cache_key, start_date=start_date,
+                     end_date=end_date, team_ids=team_ids or [], report_format=report_format.value).save()
+
+
+def get_report_job(tenant, job_id: str, with_result: bool = False) -> ReportJob:
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Report job not found")
+    jobs = ReportJob.objects(tenant=tenant, id=job_id)
+    job = (jobs if with_result else jobs.exclude("result")).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@router.post("/export-absences/jobs", response_model=ReportJobDTO)
+async def submit_absence_report_job(current_user: Annotated[User, Depends(get_current_active_user_check_tenant)],
+                                    tenant: Annotated[Tenant, Depends(get_tenant)],
+                                    start_date: datetime.date = Query(...), end_date: datetime.date = Query(...),
+                                    team_ids: List[str] | None = Query(None),
+                                    report_format: ReportFormat = Query(ReportFormat.XLSX, alias="format")):
+    if report_format is ReportFormat.PARQUET and pyarrow is None:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail="Parquet export requires the optional pyarrow package")
+    job = await run_in_threadpool(submit_report_job, tenant, current_user, start_date, end_date, team_ids,
+                                  report_format)
+    return report_job_to_dto(job)
+
+
+@router.get("/export-absences/jobs/{job_id}", response_model=ReportJobDTO)
+async def get_absence_report_job(job_id: str,
+                                 current_user: Annotated[User, Depends(get_current_active_user_check_tenant)],
+                                 tenant: Annotated[Tenant, Depends(get_tenant)]):
+    return report_job_to_dto(get_report_job(tenant, job_id))
+
+
+@router.get("/export-absences/jobs/{job_id}/download")
+async def download_absence_report_job(job_id: str,
+                                      current_user: Annotated[User, Depends(get_current_active_user_check_tenant)],
+                                      tenant: Annotated[Tenant, Depends(get_tenant)]):
+    job = await run_in_threadpool(get_report_job, tenant, job_id, True)
+    if job.status != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Report is not ready")
+    report_format = ReportFormat(job.report_format)
+    filename = f"absences_{job.start_date}_{job.end_date}.{report_format.value}"
+    return Response(job.result, media_type=REPORT_MEDIA_TYPES[report_format],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+def is_non_working_day(date: datetime.date, country_holidays) -> bool:
+    return is_weekend(date) or date in country_holidays
+
+
+def coalesce_member_days(member: TeamMember, window: tuple[datetime.date, datetime.date] | None = None,
+                         bridge_non_working_days: bool = False) -> list[tuple]:
+    """Merge a member's consecutive days of the same type into ``(start, end, day_type, comments)``.
+
+    ``end`` is exclusive, as DTEND of an all-day event. With ``bridge_non_working_days`` a
+    gap made only of weekends and the member's country holidays does not end a range, so a
+    vacation from Friday to the next Friday is one event. Distinct comments are kept in order.
+
+    Ranges are built from all of the member's days and those overlapping ``window`` are
+    kept whole, so a range crossing the window's start keeps its start, and with it the
+    event's UID, while a relative window moves day by day.
+    """
+    days_by_type = defaultdict(list)
+    day_types = {}
+    for date_str in sorted(member.days.keys()):
+        date = datetime.date.fromisoformat(date_str)
+        day_entry = member.days[date_str]
+        for day_type in day_entry.day_types:
+            day_types[day_type.id] = day_type
+            days_by_type[day_type.id].append((date, day_entry.comment))
+
+    country_holidays = {}
+    if bridge_non_working_days and member.country:
+        country_holidays = get_country_holidays(member.country, get_today().year)
+
+    def continues(previous: datetime.date, date: datetime.date) -> bool:
+        gap = previous + datetime.timedelta(days=1)
+        while gap < date:
+            if not bridge_non_working_days or not is_non_working_day(gap, country_holidays):
+                return False
+            gap += datetime.timedelta(days=1)
+        return True
 
-def build_team_calendar(team: Team) -> Calendar:
+    ranges = []
+    for day_type_id, entries in days_by_type.items():
+        start, comments = entries[0][0], []
+        previous = start
+        for date, comment in entries:
+            if date != start and not continues(previous, date):
+                ranges.append((start, previous + datetime.timedelta(days=1), day_types[day_type_id], comments))
+                start, comments = date, []
+            if comment and comment not in comments:
+                comments.append(comment)
+            previous = date
+        ranges.append((start, previous + datetime.timedelta(days=1), day_types[day_type_id], comments))
+    if window:
+        ranges = [r for r in ranges if r[0] <= window[1] and r[1] > window[0]]
+    return sorted(ranges, key=lambda r: (r[0], r[2].name))
+
+
+def new_calendar(name: str) -> Calendar:
     cal = Calendar()
     cal.add("prodid", "-//Vacal//Team Calendar//EN")
     cal.add("version", "2.0")
-    cal.add("X-WR-CALNAME", f"{team.name} - {team.tenant.name} - Vacal")
+    cal.add("X-WR-CALNAME", name)
+    return cal
+
+
+def team_calendar_name(team: Team, tenant: Tenant) -> str:
+    return f"{team.name} - {tenant.name} - Vacal"
+
+
+def iter_team_events(team: Team, window: tuple[datetime.date, datetime.date] | None = None,
+                     coalesce: bool = False, bridge_non_working_days: bool = False) -> Iterator[tuple[ObjectId, Event]]:
+    """Yield ``(day_type_id, event)`` for the team's feed.
+
+    By default there is one event per member, day and day type. With ``coalesce`` runs of
+    consecutive days of one type become a single ranged event; its UID is that of the
+    run's first day, so a one-day absence keeps the same UID in both modes.
+    """
     for member in sorted(team.members(), key=lambda m: m.name):
+        if coalesce:
+            for start, end, day_type, comments in coalesce_member_days(member, window, bridge_non_working_days):
+                event = Event()
+                event.add("summary", f"{member.name} - {day_type.name}")
+                event.add("dtstart", start)
+                event.add("dtend", end)
+                if comments:
+                    event.add("description", "\n".join(comments))
+                event.add("uid", f"{team.id}-{member.uid}-{start.isoformat()}-{day_type.id}")
+                yield day_type.id, event
+            continue
         for date_str in sorted(member.days.keys()):
             day_entry = member.days[date_str]
             date = datetime.date.fromisoformat(date_str)
+            if window and not window[0] <= date <= window[1]:
+                continue
             for day_type in day_entry.day_types:
                 event = Event()
                 event.add("summary", f"{member.name} - {day_type.name}")
@@ -1047,69 +1477,401 @@ def build_team_calendar(team: Team) -> Calendar:
                 if day_entry.comment:
                     event.add("description", day_entry.comment)
                 event.add("uid", f"{team.id}-{member.uid}-{date_str}-{day_type.id}")
-                cal.add_component(event)
+                yield day_type.id, event
+
+
+def build_team_calendar(team: Team, window: tuple[datetime.date, datetime.date] | None = None,
+                        coalesce: bool = False, bridge_non_working_days: bool = False) -> Calendar:
+    cal = new_calendar(team_calendar_name(team, team.tenant))
+    for _, event in iter_team_events(team, window, coalesce, bridge_non_working_days):
+        cal.add_component(event)
     return cal
 
 
-@router.get("/calendar/{team_id}")
-async def get_calendar_feed(team_id: str, user_api_key: str | None = Query(None)):
-    if not team_id or not user_api_key:
-        raise HTTPException(status_code=404, detail="Calendar not found")
-    team = Team.objects(id=team_id).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Calendar not found")
-    user = User.objects(auth_details__api_key=user_api_key).first()
+CALENDAR_FEED_CACHE_SIZE = int(os.getenv("CALENDAR_FEED_CACHE_SIZE", "256"))
+CALENDAR_PRINCIPAL_CACHE_SIZE = int(os.getenv("CALENDAR_PRINCIPAL_CACHE_SIZE", "4096"))
+# Other processes only learn about a revoked key when the entry expires.
+CALENDAR_PRINCIPAL_TTL_SECONDS = int(os.getenv("CALENDAR_PRINCIPAL_TTL_SECONDS", "60"))
+# Feeds per API key and minute in each process; 0 disables the limit.
+CALENDAR_FEED_RATE_LIMIT = int(os.getenv("CALENDAR_FEED_RATE_LIMIT", "0"))
+CALENDAR_FEED_RATE_WINDOW_SECONDS = 60
+
+calendar_feed_requests = Counter(
+    "vacal_calendar_feed_requests_total", "Calendar feed requests by outcome.", ["outcome"])
+calendar_feed_builds = Histogram(
+    "vacal_calendar_feed_build_seconds", "Time spent rendering a calendar feed on a cache miss.")
+
+
+class CalendarPrincipal(NamedTuple):
+    user_id: str
+    tenant_ids: frozenset[str]
+
+
+@lru_cache(maxsize=CALENDAR_PRINCIPAL_CACHE_SIZE)
+def get_calendar_principal(api_key: str, generation: int, ttl_bucket: int) -> CalendarPrincipal | None:
+    """Resolve a calendar API key to the user's id and tenants, or None if it grants nothing.
+
+    Unknown keys are cached as well, so guessing keys does not reach the database on
+    every request. ``generation`` is :attr:`User.cache_generation` and ``ttl_bucket`` the
+    current TTL period; neither is read, both only expire entries.
+    """
+    user = User.objects(auth_details__api_key=api_key).no_dereference().only("id", "tenants", "disabled").first()
     if not user or user.disabled:
-        raise HTTPException(status_code=404, detail="Calendar not found")
-    if team.tenant not in user.tenants:
-        raise HTTPException(status_code=404, detail="Calendar not found")
-    cal = build_team_calendar(team)
-    return Response(cal.to_ical().decode("utf-8"), media_type="text/calendar")
+        return None
+    return CalendarPrincipal(str(user.id), frozenset(str(tenant.id) for tenant in user.tenants))
+
+
+class FixedWindowRateLimiter:
+    """Count requests per client in fixed windows; state is per process.
+
+    A ``limit`` of 0 or less allows everything.
+    """
+
+    def __init__(self, limit: int, window_seconds: int):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._window = None
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    def allow(self, client_id: str, now: float | None = None) -> bool:
+        if self.limit <= 0:
+            return True
+        window = int((time.time() if now is None else now) // self.window_seconds)
+        if window != self._window:
+            self._window = window
+            self._counts.clear()
+        self._counts[client_id] += 1
+        return self._counts[client_id] <= self.limit
+
+    def reset(self):
+        self._window = None
+        self._counts.clear()
+
+
+calendar_feed_rate_limiter = FixedWindowRateLimiter(CALENDAR_FEED_RATE_LIMIT, CALENDAR_FEED_RATE_WINDOW_SECONDS)
+
+
+class CalendarFeed(NamedTuple):
+    payload: bytes
+    etag: str
+
+
+def calendar_window(today: datetime.date, past_days: int | None,
+                    future_days: int | None) -> tuple[datetime.date, datetime.date] | None:
+    if past_days is None and future_days is None:
+        return None
+    return (today - datetime.timedelta(days=past_days) if past_days is not None else datetime.date.min,
+            today + datetime.timedelta(days=future_days) if future_days is not None else datetime.date.max)
+
+
+# (day type id, serialised VEVENT) in feed order
+TeamEvents = tuple[tuple[str, bytes], ...]
+
+
+@lru_cache(maxsize=CALENDAR_FEED_CACHE_SIZE)
+def get_cached_team_events(team_id: str, version: int, today: datetime.date,
+                           past_days: int | None = None, future_days: int | None = None,
+                           coalesce: bool = False, bridge_non_working_days: bool = False) -> TeamEvents | None:
+    """Serialise a team's events once per team version, day and window; None if it is gone.
+
+    Shared by the team feed and the multi-team feed. ``version`` is not read here; it is
+    part of the key so that every save of the team (and every day type change, see
+    bump_team_versions) misses the cache. ``today`` is in the key because which members
+    are still active is derived from the date. The calendar name is left to the callers,
+    as the tenant's name is not covered by the team's version.
+    """
+    team = Team.objects(id=team_id).first()
+    if team is None:  # deleted since the caller read its version
+        return None
+    with calendar_feed_builds.time():
+        return tuple((str(day_type_id), event.to_ical()) for day_type_id, event in iter_team_events(
+            team, calendar_window(today, past_days, future_days), coalesce, bridge_non_working_days))
+
+
+def assemble_calendar(name: str, events: Iterable[bytes]) -> CalendarFeed:
+    """Wrap already serialised VEVENTs into a VCALENDAR, without parsing them again."""
+    closing = b"END:VCALENDAR\r\n"
+    header = new_calendar(name).to_ical()
+    payload = header[:-len(closing)] + b"".join(events) + closing
+    return CalendarFeed(payload, f'"{hashlib.sha256(payload).hexdigest()[:32]}"')
+
+
+@lru_cache(maxsize=CALENDAR_FEED_CACHE_SIZE)
+def get_cached_team_feed(calendar_name: str, team_id: str, version: int, today: datetime.date,
+                         past_days: int | None = None, future_days: int | None = None,
+                         coalesce: bool = False, bridge_non_working_days: bool = False) -> CalendarFeed | None:
+    team_events = get_cached_team_events(team_id, version, today, past_days, future_days,
+                                         coalesce, bridge_non_working_days)
+    if team_events is None:
+        return None
+    return assemble_calendar(calendar_name, (event for _, event in team_events))
+
+
+@lru_cache(maxsize=CALENDAR_FEED_CACHE_SIZE)
+def get_cached_multi_team_feed(calendar_name: str, team_versions: tuple[tuple[str, int], ...],
+                               day_type_ids: frozenset[str] | None, today: datetime.date,
+                               past_days: int | None = None, future_days: int | None = None,
+                               coalesce: bool = False, bridge_non_working_days: bool = False) -> CalendarFeed:
+    """Concatenate the cached events of several teams, keeping only ``day_type_ids`` if given.
+
+    Every team is rendered at most once per version however many subscribers include it;
+    subscribers with the same selection also share the assembled payload. Teams deleted
+    since they were listed are left out.
+    """
+    events = []
+    for team_id, version in team_versions:
+        team_events = get_cached_team_events(team_id, version, today, past_days, future_days,
+                                             coalesce, bridge_non_working_days)
+        events.extend(event for day_type_id, event in team_events or ()
+                      if day_type_ids is None or day_type_id in day_type_ids)
+    return assemble_calendar(calendar_name, events)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime.datetime) -> bool:
+    """Evaluate If-None-Match, or failing that If-Modified-Since, per RFC 9110."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
 
+def calendar_not_found() -> HTTPException:
+    calendar_feed_requests.labels("not_found").inc()
+    return HTTPException(status_code=404, detail="Calendar not found")
+
+
+def authorize_calendar_request(user_api_key: str | None, team_id: str | None = None) -> CalendarPrincipal:
+    """Apply the rate limit and resolve the API key, before anything of a team is read.
+
+    Requests with guessed keys therefore cost one cached lookup. The limit is counted
+    per API key rather than per address: calendar services poll many subscriptions
+    from a few shared addresses, and behind a proxy every request has the proxy's.
+    """
+    if not user_api_key:
+        raise calendar_not_found()
+    if not calendar_feed_rate_limiter.allow(user_api_key):
+        calendar_feed_requests.labels("rate_limited").inc()
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                            headers={"Retry-After": str(CALENDAR_FEED_RATE_WINDOW_SECONDS)})
+    if team_id is not None and not ObjectId.is_valid(team_id):
+        raise calendar_not_found()
+    principal = get_calendar_principal(user_api_key, User.cache_generation,
+                                       int(time.time() // CALENDAR_PRINCIPAL_TTL_SECONDS))
+    if not principal:
+        raise calendar_not_found()
+    return principal
+
+
+def calendar_feed_response(request: Request, feed: CalendarFeed, last_modified: datetime.datetime) -> Response:
+    headers = {"ETag": feed.etag, "Last-Modified": email.utils.format_datetime(last_modified, usegmt=True)}
+    if is_not_modified(request, feed.etag, last_modified):
+        calendar_feed_requests.labels("not_modified").inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    calendar_feed_requests.labels("ok").inc()
+    return Response(feed.payload, media_type="text/calendar", headers=headers)
+
+
+def feed_last_modified(team: Team, today: datetime.date) -> datetime.datetime:
+    """When the feed last changed: the last write, or midnight if that is later.
+
+    Departures and a relative window both move with the date, so the representation
+    can change at midnight without any write to the team.
+    """
+    midnight = datetime.datetime.combine(today, datetime.time.min, tzinfo=datetime.timezone.utc)
+    if team.updated_at is None:
+        return midnight
+    return max(team.updated_at.replace(tzinfo=datetime.timezone.utc), midnight)
+
+
+@router.get("/calendar/{team_id}")
+async def get_calendar_feed(team_id: str, request: Request, user_api_key: str | None = Query(None),
+                            past_days: int | None = Query(None, ge=0),
+                            future_days: int | None = Query(None, ge=0),
+                            coalesce: bool = Query(False),
+                            bridge_non_working_days: bool = Query(False)):
+    principal = authorize_calendar_request(user_api_key, team_id)
+    # Only what the checks and the cache key need: the feed body comes from the cache.
+    team = Team.objects(id=team_id).no_dereference().only("id", "name", "tenant", "version", "updated_at").first()
+    if not team or str(team.tenant.id) not in principal.tenant_ids:
+        raise calendar_not_found()
+    # Read on every request: a renamed tenant does not change the team's version.
+    tenant = Tenant.objects(id=team.tenant.id).only("name").first()
+
+    today = get_today()
+    feed = await run_in_threadpool(get_cached_team_feed, team_calendar_name(team, tenant), str(team.id),
+                                   team.version, today, past_days, future_days,
+                                   coalesce, coalesce and bridge_non_working_days)
+    if feed is None:
+        raise calendar_not_found()
+    return calendar_feed_response(request, feed, feed_last_modified(team, today))
+
+
+@router.get("/calendar")
+async def get_multi_team_calendar_feed(request: Request, user_api_key: str | None = Query(None),
+                                       tenant: str | None = Query(None),
+                                       team_ids: List[str] | None = Query(None),
+                                       day_type_ids: List[str] | None = Query(None),
+                                       subscribed: bool = Query(False),
+                                       past_days: int | None = Query(None, ge=0),
+                                       future_days: int | None = Query(None, ge=0),
+                                       coalesce: bool = Query(False),
+                                       bridge_non_working_days: bool = Query(False)):
+    """One feed for several teams of a tenant: all of them, ``team_ids``, or the teams the
+    user is ``subscribed`` to, optionally limited to ``day_type_ids``."""
+    principal = authorize_calendar_request(user_api_key)
+    if tenant:
+        tenant_doc = Tenant.objects(identifier=tenant).only("id", "name").first()
+    elif len(principal.tenant_ids) == 1:
+        tenant_doc = Tenant.objects(id=next(iter(principal.tenant_ids))).only("id", "name").first()
+    else:
+        raise HTTPException(status_code=400, detail="Select a tenant for the calendar")
+    if not tenant_doc or str(tenant_doc.id) not in principal.tenant_ids:
+        raise calendar_not_found()
+    tenant_id = str(tenant_doc.id)
+
+    teams = Team.objects(tenant=tenant_id).no_dereference().only("id", "version", "updated_at").order_by("name", "id")
+    if team_ids:
+        teams = teams.filter(id__in=[team_id for team_id in team_ids if ObjectId.is_valid(team_id)])
+    if subscribed:
+        teams = teams.filter(**{f"notification_preferences__{principal.user_id}__exists": True})
+    teams = list(teams)
+
+    today = get_today()
+    feed = await run_in_threadpool(
+        get_cached_multi_team_feed, f"{tenant_doc.name} - Vacal", tuple((str(team.id), team.version) for team in teams),
+        frozenset(day_type_ids) if day_type_ids else None, today, past_days, future_days,
+        coalesce, coalesce and bridge_non_working_days)
+    last_modified = max((feed_last_modified(team, today) for team in teams),
+                        default=datetime.datetime.combine(today, datetime.time.min, tzinfo=datetime.timezone.utc))
+    return calendar_feed_response(request, feed, last_modified)
+
+
+def _report_day_count_expression(day_type_ids: List[ObjectId]) -> dict:
+    """Count the in-range day entries carrying any of ``day_type_ids``."""
+    if not day_type_ids:
+        return {"$literal": 0}
+    return {"$size": {"$filter": {
+        "input": "$days",
+        "as": "day_types",
+        "cond": {"$or": [{"$in": [day_type_id, "$$day_types"]} for day_type_id in day_type_ids]},
+    }}}
+
+
+def build_report_pipeline(tenant, start_date: datetime.date, end_date: datetime.date,
+                          day_type_ids: List[ObjectId], absence_day_type_ids: List[ObjectId],
+                          team_ids: List[str] | None = None, today: datetime.date | None = None) -> list:
+    """Aggregation computing one absence report row per member, minus the working days.
+
+    The tests check it against a walk of the hydrated teams. A member is in scope when
+    their last working day is on or after ``start_date``, or when they have none and are
+    not archived; the range is clamped at the last working day; rows are ordered by team
+    name, grouped by team when names repeat, then active members before archived ones,
+    each in stored order. Day entries are keyed by ISO date strings, so the range filter
+    is a plain string comparison.
+    """
+    today = today or get_today()
+    start = datetime.datetime.combine(start_date, datetime.time.min)
+    end = datetime.datetime.combine(end_date, datetime.time.min)
+    last_working_day = "$last_working_day"
+    # A missing field compares below null, so this is true only for a stored date.
+    has_last_working_day = {"$gt": [last_working_day, None]}
+
+    match = {"tenant": tenant.id, "is_deleted": {"$ne": True}}
+    if team_ids:
+        match["_id"] = {"$in": [ObjectId(team_id) for team_id in team_ids if ObjectId.is_valid(team_id)]}
+
+    row_fields = {"team_name": 1, "member_index": 1, "name": 1, "country": 1, "archived": 1,
+                  "effective_end": 1}
+    return [
+        {"$match": match},
+        {"$project": {"name": 1, "team_members": 1}},
+        {"$unwind": {"path": "$team_members", "includeArrayIndex": "member_index"}},
+        {"$project": {
+            "team_name": "$name",
+            "member_index": 1,
+            "name": "$team_members.name",
+            "country": "$team_members.country",
+            "last_working_day": "$team_members.last_working_day",
+            "is_deleted": {"$ifNull": ["$team_members.is_deleted", False]},
+            "days": {"$objectToArray": {"$ifNull": ["$team_members.days", {}]}},
+        }},
+        {"$match": {"$or": [
+            {"last_working_day": {"$gte": start}},
+            {"last_working_day": None, "is_deleted": {"$ne": True}},
+        ]}},
+        {"$addFields": {
+            "archived": {"$or": [
+                "$is_deleted",
+                {"$and": [has_last_working_day,
+                          {"$lt": [last_working_day, datetime.datetime.combine(today, datetime.time.min)]}]},
+            ]},
+            "effective_end": {"$cond": [
+                {"$and": [has_last_working_day, {"$lt": [last_working_day, end]}]},
+                {"$dateToString": {"format": "%Y-%m-%d", "date": last_working_day}},
+                end_date.isoformat(),
+            ]},
+        }},
+        {"$project": row_fields | {"days": {"$map": {
+            "input": {"$filter": {"input": "$days", "as": "day", "cond": {"$and": [
+                {"$gte": ["$$day.k", start_date.isoformat()]},
+                {"$lte": ["$$day.k", "$effective_end"]},
+            ]}}},
+            "as": "day",
+            "in": {"$ifNull": ["$$day.v.day_types", []]},
+        }}}},
+        {"$project": row_fields | {
+            "absence_days": _report_day_count_expression(absence_day_type_ids),
+            **{f"day_type_{index}": _report_day_count_expression([day_type_id])
+               for index, day_type_id in enumerate(day_type_ids)},
+        }},
+        {"$sort": {"team_name": 1, "_id": 1, "archived": 1, "member_index": 1}},
+    ]
+
+
+def iter_report_body_rows(tenant, start_date, end_date, day_type_names,
+                          team_ids: List[str] | None = None) -> Iterator[list]:
+    """Yield the absence report rows, counted inside MongoDB.
+
+    Range filtering and the per-member, per-day-type counting run in the aggregation
+    from :func:`build_report_pipeline`, so only result rows cross the wire. Working days
+    are joined in here from the tenant's holiday calendar, memoised per country and
+    clamped end date since most members share both.
+    """
+    if end_date < start_date:
+        return
+    day_types = DayType.objects(tenant=tenant).only("id", "name", "is_absence")
+    ids_by_name = {day_type.name: day_type.id for day_type in day_types}
+    day_type_ids = [ids_by_name[name] for name in day_type_names if name in ids_by_name]
+    counted_names = [name for name in day_type_names if name in ids_by_name]
+    absence_day_type_ids = [day_type.id for day_type in day_types if day_type.is_absence]
 
-async def get_report_body_rows(tenant, start_date, end_date, day_type_names, team_ids: List[str] | None = None):
-    body_rows = []
     country_holidays = get_holidays(tenant)
     working_hours_in_a_day = 8
-    teams_qs = Team.objects(tenant=tenant).order_by("name")
-    if team_ids:
-        teams_qs = teams_qs.filter(id__in=team_ids)
-    for team in teams_qs:
-        members_in_scope: List[TeamMember] = list(team.members())
-        for archived_member in team.archived_members:
-            last_working_day = getattr(archived_member, "last_working_day", None)
-            if last_working_day and last_working_day >= start_date:
-                members_in_scope.append(archived_member)
-
-        for member in members_in_scope:
-            member_last_day = getattr(member, "last_working_day", None)
-            effective_end_date = min(end_date, member_last_day) if member_last_day else end_date
-            if effective_end_date < start_date:
-                continue
-            day_type_counts = {}
-            member_holidays = country_holidays.get(member.country, [])
-            absence_days_count = 0
-            for date_str, day_entry in member.days.items():
-                date = datetime.date.fromisoformat(date_str)
-                if start_date <= date <= effective_end_date:
-                    is_absence_day = False
-                    for day_type in day_entry.day_types:
-                        if day_type.is_absence:
-                            is_absence_day = True
-                        day_type_name = day_type.name
-                        if day_type_name in day_type_counts:
-                            day_type_counts[day_type_name] += 1
-                        else:
-                            day_type_counts[day_type_name] = 1
-                    if is_absence_day:
-                        absence_days_count += 1
-            working_days = get_working_days(start_date, effective_end_date, member_holidays)
-            body_rows.append(
-                [team.name, member.name, member.country, absence_days_count, working_days,
-                 working_days - absence_days_count,
-                 (working_days - absence_days_count) * working_hours_in_a_day] +
-                [day_type_counts.get(n, 0) for n in day_type_names])
-    return body_rows
+    working_days_cache: Dict[tuple, int] = {}
+    pipeline = build_report_pipeline(tenant, start_date, end_date, day_type_ids, absence_day_type_ids, team_ids)
+    for row in Team.objects.aggregate(pipeline):
+        effective_end_date = datetime.date.fromisoformat(row["effective_end"])
+        cache_key = (row["country"], effective_end_date)
+        if cache_key not in working_days_cache:
+            working_days_cache[cache_key] = get_working_days(
+                start_date, effective_end_date, country_holidays.get(row["country"], []))
+        working_days = working_days_cache[cache_key]
+        absence_days_count = row["absence_days"]
+        day_type_counts = {name: row[f"day_type_{index}"] for index, name in enumerate(counted_names)}
+        yield ([row["team_name"], row["name"], row["country"], absence_days_count, working_days,
+                working_days - absence_days_count,
+                (working_days - absence_days_count) * working_hours_in_a_day] +
+               [day_type_counts.get(n, 0) for n in day_type_names])
 
 
 def validate_date(date_str):
@@ -1140,13 +1902,42 @@ async def update_days(team_id: str, team_member_id: str, days: Dict[str, Dict[st
     if team_member.is_archived():
         raise HTTPException(status_code=400, detail="Team member is archived")
 
+    day_type_ids_by_date = {}
+    for date_str, day_entry_dto in days.items():
+        validate_date(date_str)
+        day_type_ids_by_date[date_str] = list(filter_out_birthdays(tenant, day_entry_dto["day_types"]))
+    requested_ids = {day_type_id for ids in day_type_ids_by_date.values() for day_type_id in ids}
+    day_types_by_id = {str(day_type.id): day_type
+                       for day_type in DayType.objects(tenant=tenant, id__in=list(requested_ids))}
+    day_types_by_date = {
+        date_str: sorted((day_types_by_id[day_type_id] for day_type_id in ids if day_type_id in day_types_by_id),
+                         key=lambda day_type: day_type.name)
+        for date_str, ids in day_type_ids_by_date.items()
+    }
+
+    # Employees may not leave a day with every teammate away. Other members' days do not
+    # change in this request, so one coverage sweep over the edited range checks every
+    # requested absence at once.
+    if current_user.role == "employee":
+        absence_dates = [datetime.date.fromisoformat(date_str) for date_str, day_types in day_types_by_date.items()
+                         if any(day_type.is_absence for day_type in day_types)]
+        teammates = [member for member in team.members() if member.uid != team_member.uid]
+        if absence_dates and teammates:
+            absence_index = get_team_absence_index(team, DayType.get_masks(tenant))
+            everyone = (datetime.date.min, datetime.date.max)
+            coverage = absence_index.coverage(min(absence_dates), max(absence_dates),
+                                              {str(member.uid): everyone for member in teammates})
+            uncovered = {day.date for day in coverage if day.available == 0}
+            if uncovered.intersection(absence_dates):
+                raise HTTPException(
+                    status_code=400,
+                    detail="At least one teammate must remain available for this day.",
+                )
+
     updated_days = {}
-    enforce_absence_limit = current_user.role == "employee"
     audits: List[DayAudit] = []
     for date_str, day_entry_dto in days.items():
-        validate_date(date_str)
-        filtered_ids = list(filter_out_birthdays(tenant, day_entry_dto["day_types"]))
-        day_types = list(DayType.objects(tenant=tenant, id__in=filtered_ids).order_by("name"))
+        day_types = day_types_by_date[date_str]
         old_entry: DayEntry | None = team_member.days.get(date_str)
         new_comment = day_entry_dto.get("comment", '')
 
@@ -1172,32 +1963,6 @@ async def update_days(team_id: str, team_member_id: str, days: Dict[str, Dict[st
         day_entry.comment = new_comment
         updated_days[date_str] = day_entry
 
-        if (
-            enforce_absence_limit
-            and len(team.members()) > 1
-            and any(day_type.is_absence for day_type in day_types)
-        ):
-            all_members_absent = True
-            for member in team.members():
-                if member.uid == team_member.uid:
-                    entry = day_entry
-                else:
-                    entry = member.days.get(date_str)
-
-                if not entry or not entry.day_types:
-                    all_members_absent = False
-                    break
-
-                if not any(getattr(day_type, "is_absence", False) for day_type in entry.day_types):
-                    all_members_absent = False
-                    break
-
-            if all_members_absent:
-                raise HTTPException(
-                    status_code=400,
-                    detail="At least one teammate must remain available for this day.",
-                )
-
         audits.append(DayAudit(
             tenant=tenant,
             team=team,
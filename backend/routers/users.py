@@ -11,9 +11,10 @@ from pydantic import field_validator, BaseModel, Field, computed_field, field_se
 from starlette import status
 
 from ..dependencies import get_current_active_user, get_tenant, mongo_to_pydantic, get_current_active_user_check_tenant, \
-    tenant_var
+    tenant_var, get_current_active_manager_check_tenant
 from ..email_service import send_email
-from ..model import User, AuthDetails, Tenant, DayType, Team, TeamMember, UserInvite, PasswordResetToken, INVITE_EXPIRE_DAYS
+from ..model import User, AuthDetails, Tenant, DayType, Team, TeamMember, UserInvite, PasswordResetToken, INVITE_EXPIRE_DAYS, \
+    DEFAULT_TENANT_TIMEZONE, is_valid_timezone
 
 log = logging.getLogger(__name__)
 cors_origin = os.getenv("CORS_ORIGIN")  # should contain production domain of the frontend
@@ -25,6 +26,7 @@ class TenantDTO(BaseModel):
     id: str = Field(None, alias='_id')
     name: str
     identifier: str
+    timezone: str = DEFAULT_TENANT_TIMEZONE
 
     @classmethod
     def from_mongo_reference_field(cls, tenant_document_reference):
@@ -32,7 +34,8 @@ class TenantDTO(BaseModel):
             tenant_document = Tenant.objects.get(id=tenant_document_reference)
             return cls(_id=str(tenant_document.id),
                        name=tenant_document.name,
-                       identifier=tenant_document.identifier)
+                       identifier=tenant_document.identifier,
+                       timezone=tenant_document.timezone or DEFAULT_TENANT_TIMEZONE)
         return None
 
 
@@ -95,6 +98,17 @@ class TenantCreationModel(BaseModel):
     identifier: str
 
 
+class TenantTimezoneModel(BaseModel):
+    timezone: str
+
+    @field_validator('timezone')
+    @classmethod
+    def known_timezone(cls, v):
+        if not is_valid_timezone(v):
+            raise ValueError("unknown timezone")
+        return v
+
+
 class UserCreationModel(BaseModel):
     tenant: TenantCreationModel | None = None
     name: str
@@ -217,6 +231,16 @@ async def create_tenant_for_user(tenant_creation: TenantCreationModel,
     return {"message": "Tenant created successfully"}
 
 
+@router.put("/tenant/timezone")
+async def update_tenant_timezone(timezone_update: TenantTimezoneModel,
+                                 current_user: Annotated[User, Depends(get_current_active_manager_check_tenant)],
+                                 tenant: Annotated[Tenant, Depends(get_tenant)]):
+    """Set the IANA timezone whose local morning the tenant's daily digests go out in."""
+    tenant.timezone = timezone_update.timezone
+    tenant.save()
+    return {"message": "Timezone updated successfully"}
+
+
 @router.get("")
 async def read_users(current_user: Annotated[User, Depends(get_current_active_user_check_tenant)],
                      tenant: Annotated[Tenant, Depends(get_tenant)]):
@@ -3,32 +3,37 @@ import logging
 import os
 from collections import defaultdict
 
-from ..email_service import send_email
-from ..model import DayType, Team
+from ..absence_intervals import AbsenceIntervals, get_team_absence_index
+from ..email_service import EmailMessage
+from ..model import DayType, DayTypeMasks, Team
 from ..notification_types import (
     ABSENCE_DAILY_NOTIFICATION,
     ABSENCE_UPCOMING_NOTIFICATION,
 )
 from ..utils import get_country_holidays
+from .notification_context import NotificationContext
+from .outbox import enqueue_emails
 
 log = logging.getLogger(__name__)
 
 cors_origin = os.getenv("CORS_ORIGIN")  # should contain production domain of the frontend
 
 
-def find_absence_periods(team, start_date) -> list:
-    absence_day_types = list(DayType.objects(tenant=team.tenant, is_absence=True))
+def get_absence_day_type_ids(tenant) -> set:
+    return DayType.get_absence_day_type_ids(tenant)
 
-    absence_starts = []
 
-    start_date_str = str(start_date)
-    day_before = start_date - datetime.timedelta(days=1)
-    day_before_str = str(day_before)
+def find_absence_periods(team, start_date, masks: DayTypeMasks | None = None) -> list:
+    if masks is None:
+        masks = DayType.get_masks(team.tenant)
+
+    absence_starts = []
+    absence_index = get_team_absence_index(team, masks)
 
     for member in team.members():
-        if (is_absent(member, start_date_str, absence_day_types) and
-                not (is_absent(member, day_before_str, absence_day_types))):
-            end_date = calculate_end_date(member, start_date, absence_day_types)
+        intervals = absence_index.for_member(member)
+        if intervals.starts_on(start_date):
+            end_date = calculate_end_date(member, start_date, masks, intervals)
             absence_starts.append({
                 'name': member.name,
                 'email': member.email,
@@ -39,18 +44,25 @@ def find_absence_periods(team, start_date) -> list:
     return absence_starts
 
 
-def is_absent(member, date_str, absence_day_types):
-    return date_str in member.days and any(dt in member.days[date_str].day_types for dt in absence_day_types)
+def is_absent(member, date_str, absence_day_type_ids):
+    # Day types may be loaded without dereferencing; DBRef and DayType both carry the id.
+    return date_str in member.days and any(dt.id in absence_day_type_ids for dt in member.days[date_str].day_types)
 
 
-def calculate_end_date(member, start_date, absence_day_types):
+def calculate_end_date(member, start_date, masks: DayTypeMasks, intervals: AbsenceIntervals | None = None):
+    """Last day of the absence starting on ``start_date``, stretched over adjoining non-working days."""
+    if intervals is None:
+        intervals = AbsenceIntervals.from_days(member.days, masks.bits, masks.absence)
     next_day = start_date + datetime.timedelta(days=1)
     holidays = get_country_holidays(member.country, start_date.year)
-    while (str(next_day) in member.days and
-           any(dt in member.days[str(next_day)].day_types for dt in absence_day_types)) or \
-            (holidays and not holidays.is_working_day(next_day)):
-        next_day += datetime.timedelta(days=1)
-    return next_day - datetime.timedelta(days=1)
+    while True:
+        absence = intervals.interval_at(next_day)
+        if absence:
+            next_day = absence[1] + datetime.timedelta(days=1)  # skip the rest of that absence at once
+        elif holidays and not holidays.is_working_day(next_day):
+            next_day += datetime.timedelta(days=1)
+        else:
+            return next_day - datetime.timedelta(days=1)
 
 
 def get_next_working_day(member, date):
@@ -87,22 +99,38 @@ def generate_consolidated_email_body(team_absences) -> str:
     return body
 
 
-def send_absence_email_updates() -> None:
+def digest_scope(today: datetime.date, tenant=None) -> str:
+    """Period part of a digest's outbox key; a tenant's own run gets keys of its own."""
+    return f"{today.isoformat()}:{tenant.id}" if tenant else today.isoformat()
+
+
+def send_absence_email_updates(tenant=None, today: datetime.date | None = None) -> None:
+    """Email subscribers the absences starting ``today``, for one tenant or all of them."""
     log.debug("Start scheduled task send_absence_email_updates")
-    today = datetime.date.today()
+    today = today or datetime.date.today()
+    team_filters = {"tenant": tenant} if tenant else {}
 
     absence_info_by_subscriber = defaultdict(list)
-
-    for team in Team.objects():
-        absences = find_absence_periods(team, today)
+    masks_by_tenant = {}
+    context = NotificationContext.load(**team_filters)
+
+    for team in Team.objects(**team_filters).no_dereference():
+        tenant_id = team.tenant.id
+        if tenant_id not in masks_by_tenant:
+            masks_by_tenant[tenant_id] = DayType.get_masks(tenant or tenant_id)
+        absences = find_absence_periods(team, today, masks_by_tenant[tenant_id])
         if absences:
-            for email in team.get_subscriber_emails(ABSENCE_DAILY_NOTIFICATION):
+            for email in context.subscriber_emails(team, ABSENCE_DAILY_NOTIFICATION):
                 absence_info_by_subscriber[email].append((team.name, absences))
 
+    subject = f"Absences Starting Today - {today.strftime('%B %d')}"
+    messages = []
     for email, team_absences in absence_info_by_subscriber.items():
         email_body = generate_consolidated_email_body(team_absences)
         if email_body:
-            send_email(f"Absences Starting Today - {today.strftime('%B %d')}", email_body, email)
+            messages.append((f"{ABSENCE_DAILY_NOTIFICATION}:{digest_scope(today, tenant)}:{email}",
+                             EmailMessage(subject, email_body, email)))
+    enqueue_emails(messages)
 
     log.debug("Stop scheduled task send_absence_email_updates")
 
@@ -112,29 +140,71 @@ def only_for_team_member(member, team_absences) -> list:
                        team_absences))
 
 
-def send_upcoming_absence_email_updates() -> None:
-    log.debug("Start scheduled task send_upcoming_absence_email_updates")
-    today = datetime.date.today()
+def find_upcoming_absences(team, today, masks: DayTypeMasks) -> list:
+    """Absences starting on the next working day of each member who is at work today.
 
+    Single pass over the members: whether today is a working day and which day is the
+    next one depend only on the country, so they are worked out once per country.
+    """
+    working_days_by_country = {}
+    upcoming = []
+    absence_index = get_team_absence_index(team, masks)
+    for member in team.members():
+        if member.country not in working_days_by_country:
+            working_days_by_country[member.country] = (is_working_day(member, today),
+                                                       get_next_working_day(member, today))
+        working_today, next_working_day = working_days_by_country[member.country]
+        intervals = absence_index.for_member(member)
+        if not working_today or intervals.contains(today):
+            continue  # skip sending notifications on weekends, holidays and if it is already absence for the team member
+        if intervals.starts_on(next_working_day):
+            upcoming.append({
+                'name': member.name,
+                'email': member.email,
+                'start': next_working_day,
+                'end': calculate_end_date(member, next_working_day, masks, intervals)
+            })
+    return upcoming
+
+
+def collect_upcoming_absences(teams, today, context: NotificationContext | None = None) -> dict:
+    """Group the upcoming absences of ``teams`` by subscriber email, then by team name.
+
+    Day type masks are read once per tenant; subscribers come from ``context``,
+    loaded for all teams at once when not given.
+    """
     absence_info_by_subscriber = defaultdict(lambda: defaultdict(list))
+    masks_by_tenant = {}
+    context = context or NotificationContext.load()
+
+    for team in teams:
+        tenant_id = team.tenant.id
+        if tenant_id not in masks_by_tenant:
+            masks_by_tenant[tenant_id] = DayType.get_masks(tenant_id)
+        upcoming = find_upcoming_absences(team, today, masks_by_tenant[tenant_id])
+        if upcoming:
+            for email in context.subscriber_emails(team, ABSENCE_UPCOMING_NOTIFICATION):
+                absence_info_by_subscriber[email][team.name].extend(upcoming)
+    return absence_info_by_subscriber
+
+
+def send_upcoming_absence_email_updates(tenant=None, today: datetime.date | None = None) -> None:
+    """Email subscribers the absences starting on the next working day, for one tenant or all."""
+    log.debug("Start scheduled task send_upcoming_absence_email_updates")
+    today = today or datetime.date.today()
+    team_filters = {"tenant": tenant} if tenant else {}
 
-    for team in Team.objects():
-        absence_day_types = list(DayType.objects(tenant=team.tenant, is_absence=True))
-        for member in team.members():
-            if not is_working_day(member, today) or is_absent(member, str(today), absence_day_types):
-                continue  # skip sending notifications on weekends, holidays and if it is already absence for the team member
-            next_working_day = get_next_working_day(member, today)
-            absences_next_day = find_absence_periods(team, next_working_day)
-            if absences_next_day:
-                filtered_absences = only_for_team_member(member, absences_next_day)
-                if filtered_absences:
-                    for email in team.get_subscriber_emails(ABSENCE_UPCOMING_NOTIFICATION):
-                        absence_info_by_subscriber[email][team.name].extend(filtered_absences)
+    absence_info_by_subscriber = collect_upcoming_absences(
+        Team.objects(**team_filters).no_dereference(), today, NotificationContext.load(**team_filters))
 
+    subject = f"Absences Starting Soon - {today.strftime('%B %d')}"
+    messages = []
     for email, teams_absences in absence_info_by_subscriber.items():
         flattened_absences = [(team_name, absences) for team_name, absences in teams_absences.items()]
         email_body = generate_consolidated_email_body(flattened_absences)
         if email_body:
-            send_email(f"Absences Starting Soon - {today.strftime('%B %d')}", email_body, email)
+            messages.append((f"{ABSENCE_UPCOMING_NOTIFICATION}:{digest_scope(today, tenant)}:{email}",
+                             EmailMessage(subject, email_body, email)))
+    enqueue_emails(messages)
 
     log.debug("Stop scheduled task send_upcoming_absence_email_updates")
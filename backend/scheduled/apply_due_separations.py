@@ -1,11 +1,40 @@
 import datetime
 import logging
 
-from ..model import Team, archive_member, clear_leader_references
+from ..model import Team, TeamMember, User, clear_leader_references
 from ..utils import get_today
 
 log = logging.getLogger(__name__)
 
+# What the sweep reads from a candidate team: enough to decide who is due, nothing else.
+_SEPARATION_FIELDS = ("tenant", "team_members.uid", "team_members.last_working_day", "team_members.is_deleted",
+                      "team_members.separation_recorded_by")
+
+
+def _archive_in_place(team: Team, due: list[tuple[int, TeamMember]], existing_user_ids: set,
+                      now: datetime.datetime) -> bool:
+    """Stamp the due members of ``team`` with one targeted update instead of a full save.
+
+    The same stamps as :func:`backend.model.archive_member`, written by array position.
+    The filter pins each position to the member's uid, so if the array changed since it
+    was read the update matches nothing and the next run retries. Members already
+    archived by then do not match either, so a concurrent run cannot restamp them.
+    """
+    query = {"_id": team.id}
+    changes = {"updated_at": now}
+    for index, member in due:
+        path = f"team_members.{index}"
+        query[f"{path}.uid"] = str(member.uid)
+        query[f"{path}.is_deleted"] = {"$ne": True}
+        changes[f"{path}.is_deleted"] = True
+        changes[f"{path}.deleted_at"] = now
+        actor = member.separation_recorded_by
+        # A recording user who has since been deleted is not carried over.
+        if actor is not None and actor.id in existing_user_ids:
+            changes[f"{path}.deleted_by"] = actor.id
+    result = Team._get_collection().update_one(query, {"$set": changes, "$inc": {"version": 1}})
+    return result.modified_count == 1
+
 
 def apply_due_separations(today: datetime.date | None = None) -> int:
     """Persist the archived state of members whose last working day has passed.
@@ -26,16 +55,29 @@ def apply_due_separations(today: datetime.date | None = None) -> int:
 
     archived_total = 0
     cache_is_stale = False
-    # Soft-deleted teams are included so their members' stored state converges too.
-    for team in Team.objects_with_deleted():
+    # Only teams holding a member who is due, found through the
+    # team_members.last_working_day index. Soft-deleted teams are included so their
+    # members' stored state converges too.
+    teams = list(Team.objects_with_deleted(
+        team_members__match={"last_working_day__lt": today, "is_deleted__ne": True},
+    ).no_dereference().only(*_SEPARATION_FIELDS))
+    due_by_team = [
+        (team, [(index, member) for index, member in enumerate(team.team_members)
+                if member.is_separation_due(today)])
+        for team in teams
+    ]
+    actor_ids = {member.separation_recorded_by.id for _, due in due_by_team for _, member in due
+                 if member.separation_recorded_by is not None}
+    existing_user_ids = set(User.objects(id__in=actor_ids).scalar("id")) if actor_ids else set()
+
+    for team, due in due_by_team:
         try:
-            due = [member for member in team.team_members if member.is_separation_due(today)]
             if not due:
                 continue
-            for member in due:
-                archive_member(member, now=now)
-            team.save()
-            clear_leader_references(team.tenant, [str(member.uid) for member in due])
+            if not _archive_in_place(team, due, existing_user_ids, now):
+                log.info("Team %s changed while applying due separations; retrying on the next run", team.id)
+                continue
+            clear_leader_references(team.tenant, [str(member.uid) for _, member in due])
             archived_total += len(due)
             cache_is_stale = True
         except Exception:
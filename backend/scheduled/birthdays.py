@@ -2,17 +2,19 @@ import datetime
 import logging
 import os
 
-from ..email_service import send_email
+from ..email_service import EmailMessage
 from ..model import Team
 from ..notification_types import BIRTHDAY_DAILY_NOTIFICATION
+from .notification_context import NotificationContext
+from .outbox import enqueue_emails
 
 log = logging.getLogger(__name__)
 
 cors_origin = os.getenv("CORS_ORIGIN")  # should contain production domain of the frontend
 
 
-def find_birthdays(team):
-    today = datetime.date.today().strftime('%m-%d')  # Get today's date as MM-DD
+def find_birthdays(team, today: datetime.date | None = None):
+    today = (today or datetime.date.today()).strftime('%m-%d')  # Get today's date as MM-DD
     birthday_notifications = []
 
     # Iterate over team members and check if today is their birthday
@@ -26,8 +28,13 @@ def find_birthdays(team):
     return birthday_notifications
 
 
-def generate_birthday_email_body(team):
-    birthdays_today = find_birthdays(team)
+def teams_with_birthdays(today: datetime.date, **team_filters):
+    """Teams with a member whose birthday is ``today``, through the team_members.birthday index."""
+    return Team.objects(team_members__birthday=today.strftime('%m-%d'), **team_filters)
+
+
+def generate_birthday_email_body(team, today: datetime.date | None = None):
+    birthdays_today = find_birthdays(team, today)
     if not birthdays_today:
         return ""
 
@@ -41,16 +48,21 @@ def generate_birthday_email_body(team):
     return body
 
 
-def send_birthday_email_updates():
+def send_birthday_email_updates(tenant=None, today: datetime.date | None = None):
     log.debug("Start scheduled task send_birthday_email_updates")
-    for team in Team.objects():
-        email_body = generate_birthday_email_body(team)
+    today = today or datetime.date.today()
+    team_filters = {"tenant": tenant} if tenant else {}
+    context = NotificationContext.load(team_members__birthday=today.strftime('%m-%d'), **team_filters)
+    messages = []
+    for team in teams_with_birthdays(today, **team_filters):
+        email_body = generate_birthday_email_body(team, today)
         if not email_body:
             continue  # Skip if there are no birthdays today
-        for email in team.get_subscriber_emails(BIRTHDAY_DAILY_NOTIFICATION):
-            send_email(
-                f"Birthdays Today - {team.name} - {datetime.date.today().strftime('%B %d')}",
+        for email in context.subscriber_emails(team, BIRTHDAY_DAILY_NOTIFICATION):
+            messages.append((f"{BIRTHDAY_DAILY_NOTIFICATION}:{today.isoformat()}:{team.id}:{email}", EmailMessage(
+                f"Birthdays Today - {team.name} - {today.strftime('%B %d')}",
                 email_body,
                 email,
-            )
+            )))
+    enqueue_emails(messages)
     log.debug("Stop scheduled task send_birthday_email_updates")
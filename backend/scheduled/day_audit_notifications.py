@@ -1,17 +1,23 @@
 import datetime
+import itertools
 import logging
 import os
 from collections import defaultdict
 from typing import Dict, Iterable, List, Set, Tuple
 
-from ..email_service import send_email
-from ..model import DayAudit, Team
+from ..email_service import EmailMessage
+from ..model import DayAudit, DayType, Team, User
 from ..notification_types import ABSENCE_RECENT_CHANGES_NOTIFICATION
+from .notification_context import NotificationContext
+from .outbox import enqueue_emails
 
 log = logging.getLogger(__name__)
 
 cors_origin = os.getenv("CORS_ORIGIN")  # should contain production domain of the frontend
 
+# Outbox key prefix of the digest a member gets about changes to their own calendar.
+MEMBER_CALENDAR_CHANGES_KEY = "member_calendar_changes"
+
 
 def _normalize_now(now: datetime.datetime | None) -> datetime.datetime:
     if now is None:
@@ -59,8 +65,7 @@ def _get_actor_id(audit: DayAudit) -> str | None:
     return str(user_id) if user_id else None
 
 
-def _get_actor_name(audit: DayAudit) -> str | None:
-    user = audit.user
+def _get_actor_name(user: User | None) -> str | None:
     if not user:
         return None
     if getattr(user, "name", None):
@@ -73,8 +78,7 @@ def _get_actor_name(audit: DayAudit) -> str | None:
     return None
 
 
-def _get_actor_email(audit: DayAudit) -> str | None:
-    user = getattr(audit, "user", None)
+def _get_actor_email(user: User | None) -> str | None:
     if not user:
         return None
     if getattr(user, "email", None):
@@ -96,48 +100,99 @@ def _get_member_email(member) -> str | None:
     return _normalize_email(email)
 
 
+# Member fields the notifications read; days are projected per referenced date.
+_TEAM_MEMBER_FIELDS = ("uid", "name", "email", "is_deleted", "last_working_day")
+
+
+def _load_team(team_id, dates: Set[datetime.date]) -> Team | None:
+    """Load a team with only what the notifications need: its name, subscriptions and,
+    of the members' days, only those the audits refer to."""
+    fields = ["id", "name", "notification_preferences"]
+    fields += [f"team_members.{field}" for field in _TEAM_MEMBER_FIELDS]
+    fields += [f"team_members.days.{date.isoformat()}" for date in sorted(dates)]
+    return Team.objects_with_deleted(id=team_id).no_dereference().only(*fields).first()
+
+
+def _load_missing(documents: Dict[str, object], model, ids: Iterable[str], *fields: str) -> None:
+    missing = {document_id for document_id in ids if document_id and document_id not in documents}
+    if missing:
+        documents.update({str(document.id): document
+                          for document in model.objects(id__in=list(missing)).only("id", *fields)})
+
+
+def _iter_audits_by_team(audits: Iterable[DayAudit]):
+    """Group audits, which must come sorted by team, without holding more than one team's."""
+    for team_id, team_audits in itertools.groupby(audits, key=lambda audit: audit.team.id if audit.team else None):
+        yield team_id, list(team_audits)
+
+
 def _collect_notifications(
     audits: Iterable[DayAudit],
+    context: NotificationContext | None = None,
 ) -> Tuple[Dict[str, Dict[str, List[dict]]], Dict[str, Dict[str, List[dict]]]]:
+    """Build the subscriber and member digests from ``audits``.
+
+    The audits are expected without dereferenced references and sorted by team (see
+    :func:`send_recent_calendar_change_notifications`). Each team is loaded once, day
+    types and actors are fetched in one query per team for those not seen yet, and
+    subscriber emails are worked out once per team and actor.
+    """
     subscriber_notifications = defaultdict(lambda: defaultdict(list))
     member_notifications = defaultdict(lambda: defaultdict(list))
-    for audit in audits:
-        added_day_types = _get_added_day_types(audit)
-        if not added_day_types:
+    day_types: Dict[str, DayType] = {}
+    users: Dict[str, User] = {}
+    for team_id, team_audits in _iter_audits_by_team(audits):
+        if team_id is None:
             continue
-        team = audit.team
+        team = _load_team(team_id, {audit.date for audit in team_audits})
         if team is None:
             continue
-        member = team.get_member(audit.member_uid)
-        if member is None:
-            continue
-        current_day_type_ids = _get_current_day_type_ids(member, audit.date)
-        relevant_day_types = [
-            day_type for day_type in added_day_types if str(day_type.id) in current_day_type_ids
-        ]
-        if not relevant_day_types:
-            continue
-        entry = {
-            "member_name": member.name,
-            "date": audit.date,
-            "day_types": [day_type.name for day_type in relevant_day_types],
-            "added_by": _get_actor_name(audit),
-            "comment": (audit.new_comment or "").strip(),
-        }
-        actor_id = _get_actor_id(audit)
-        exclude_ids = [actor_id] if actor_id else None
-        for email in team.get_subscriber_emails(
-            ABSENCE_RECENT_CHANGES_NOTIFICATION,
-            exclude_user_ids=exclude_ids,
-        ):
-            subscriber_notifications[email][team.name].append(entry)
-
-        member_email = _get_member_email(member)
-        actor_email = _normalize_email(_get_actor_email(audit))
-        if member_email and member_email != actor_email:
-            # Keep a copy per member to avoid sharing dict references across collections
-            entry_copy = dict(entry)
-            member_notifications[member_email][team.name].append(entry_copy)
+        team_context = context or NotificationContext.for_teams([team])
+        members_by_uid = {str(member.uid): member for member in team.members()}
+        _load_missing(day_types, DayType, (str(ref.id) for audit in team_audits
+                                           for ref in audit.new_day_types if ref), "name")
+        _load_missing(users, User, (_get_actor_id(audit) for audit in team_audits),
+                      "name", "email", "auth_details.username", "auth_details.google_email")
+        subscriber_emails: Dict[str | None, List[str]] = {}
+
+        for audit in team_audits:
+            added_day_types = [day_types[str(ref.id)] for ref in _get_added_day_types(audit)
+                               if str(ref.id) in day_types]
+            if not added_day_types:
+                continue
+            member = members_by_uid.get(audit.member_uid)
+            if member is None:
+                continue
+            current_day_type_ids = _get_current_day_type_ids(member, audit.date)
+            relevant_day_types = [
+                day_type for day_type in added_day_types if str(day_type.id) in current_day_type_ids
+            ]
+            if not relevant_day_types:
+                continue
+            actor_id = _get_actor_id(audit)
+            actor = users.get(actor_id) if actor_id else None
+            entry = {
+                "member_name": member.name,
+                "date": audit.date,
+                "day_types": [day_type.name for day_type in relevant_day_types],
+                "added_by": _get_actor_name(actor),
+                "comment": (audit.new_comment or "").strip(),
+            }
+            if actor_id not in subscriber_emails:
+                subscriber_emails[actor_id] = team_context.subscriber_emails(
+                    team,
+                    ABSENCE_RECENT_CHANGES_NOTIFICATION,
+                    exclude_user_ids=[actor_id] if actor_id else None,
+                )
+            for email in subscriber_emails[actor_id]:
+                subscriber_notifications[email][team.name].append(entry)
+
+            member_email = _get_member_email(member)
+            actor_email = _normalize_email(_get_actor_email(actor))
+            if member_email and member_email != actor_email:
+                # Keep a copy per member to avoid sharing dict references across collections
+                entry_copy = dict(entry)
+                member_notifications[member_email][team.name].append(entry_copy)
     return subscriber_notifications, member_notifications
 
 
@@ -232,24 +287,31 @@ def send_recent_calendar_change_notifications(now: datetime.datetime | None = No
     audits = DayAudit.objects(
         timestamp__gte=window_start,
         timestamp__lt=window_end,
-    ).select_related()
+    )
+    context = NotificationContext.load(id__in=audits.no_dereference().distinct("team"))
+    # Streamed in team order without caching, so memory holds one team's audits at a time.
+    audits = audits.no_dereference().no_cache().order_by("team", "timestamp")
 
-    subscriber_notifications, member_notifications = _collect_notifications(audits)
+    subscriber_notifications, member_notifications = _collect_notifications(audits, context)
     if not subscriber_notifications and not member_notifications:
         log.debug("No new calendar change audits to notify about")
         log.debug("Stop scheduled task send_recent_calendar_change_notifications")
         return
 
+    messages = []
     subject = _generate_subject(window_start, window_end)
     for email, teams_notifications in subscriber_notifications.items():
         body = _generate_email_body(teams_notifications, window_start, window_end)
         if body:
-            send_email(subject, body, email)
+            messages.append((f"{ABSENCE_RECENT_CHANGES_NOTIFICATION}:{window_start.isoformat()}:{email}",
+                             EmailMessage(subject, body, email)))
 
     member_subject = _generate_member_subject(window_start, window_end)
     for email, teams_notifications in member_notifications.items():
         body = _generate_member_email_body(teams_notifications, window_start, window_end)
         if body:
-            send_email(member_subject, body, email)
+            messages.append((f"{MEMBER_CALENDAR_CHANGES_KEY}:{window_start.isoformat()}:{email}",
+                             EmailMessage(member_subject, body, email)))
+    enqueue_emails(messages)
 
     log.debug("Stop scheduled task send_recent_calendar_change_notifications")
@@ -0,0 +1,80 @@
+import datetime
+import functools
+import logging
+import os
+import socket
+import time
+from typing import Callable
+
+from mongoengine import NotUniqueError
+from prometheus_client import Histogram
+
+from ..model import JobLock, SchedulerRun
+
+log = logging.getLogger(__name__)
+
+HOURLY = datetime.timedelta(hours=1)
+DAILY = datetime.timedelta(days=1)
+
+# Identifies this process in locks and run records.
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+scheduled_job_seconds = Histogram("vacal_scheduled_job_seconds", "Duration of scheduled job runs.",
+                                  ["job", "outcome"])
+
+
+def acquire_lease(name: str, lease: datetime.timedelta, now: datetime.datetime | None = None,
+                  owner: str = OWNER) -> bool:
+    """Take the lock ``name`` for ``lease`` unless another process holds an unexpired lease."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    try:
+        JobLock(name=name, owner=owner, acquired_at=now, expires_at=now + lease).save(force_insert=True)
+        return True
+    except NotUniqueError:
+        # The lock exists; take it over only if its lease ran out and the TTL monitor
+        # has not removed it yet. The filter makes the takeover atomic.
+        return JobLock.objects(name=name, expires_at__lte=now).modify(
+            set__owner=owner, set__acquired_at=now, set__expires_at=now + lease) is not None
+
+
+def release_lease(name: str, owner: str = OWNER) -> None:
+    """Give up a lease early, e.g. after a failed run that should be retried."""
+    JobLock.objects(name=name, owner=owner).delete()
+
+
+def record_run(job: str, started_at: datetime.datetime, duration: float, error: Exception | None = None):
+    outcome = "failed" if error else "succeeded"
+    scheduled_job_seconds.labels(job, outcome).observe(duration)
+    try:
+        SchedulerRun(job=job, owner=OWNER, started_at=started_at, duration_seconds=duration, outcome=outcome,
+                     error=repr(error) if error else None).save()
+    except Exception as e:
+        log.error("Could not record run of %s", job, exc_info=e)
+
+
+def run_once(job: Callable, period: datetime.timedelta) -> Callable:
+    """Wrap a scheduled job so each of its runs executes on one process cluster-wide.
+
+    Every process schedules ``job`` at the same times; the first to take the lease runs it
+    and the others log and skip. The lease lasts half of ``period``, the interval between
+    runs, which absorbs clock skew between hosts and still frees the lock for the next run.
+    """
+    lease = period / 2
+
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        name = job.__name__
+        if not acquire_lease(name, lease):
+            log.info("Skipping %s: another process holds the lock", name)
+            return None
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        started = time.perf_counter()
+        try:
+            result = job(*args, **kwargs)
+        except Exception as e:
+            record_run(name, started_at, time.perf_counter() - started, e)
+            raise
+        record_run(name, started_at, time.perf_counter() - started)
+        return result
+
+    return wrapper
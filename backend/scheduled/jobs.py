@@ -0,0 +1,31 @@
+from apscheduler.schedulers.base import BaseScheduler
+
+from .activate_trials import activate_trials
+from .apply_due_separations import apply_due_separations
+from .day_audit_notifications import send_recent_calendar_change_notifications
+from .job_lock import DAILY, HOURLY, run_once
+from .outbox import run_outbox_dispatcher, OUTBOX_DISPATCH_INTERVAL_SECONDS
+from .report_jobs import run_report_jobs, REPORT_JOB_POLL_INTERVAL_SECONDS
+from .tenant_digests import send_tenant_digests
+from .update_max_team_members_numbers import run_update_max_team_members_numbers
+
+
+def add_scheduled_jobs(scheduler: BaseScheduler, multitenancy_enabled: bool) -> BaseScheduler:
+    """Register the scheduled jobs; shared by the API process and ``backend.worker``."""
+    # Jobs only enqueue emails; this one sends them, one batch per interval cluster-wide.
+    scheduler.add_job(run_outbox_dispatcher, 'interval', seconds=OUTBOX_DISPATCH_INTERVAL_SECONDS, max_instances=1)
+    # Report jobs are queued by the API and rendered here, one at a time per process;
+    # with SCHEDULER_ENABLED=False on the API they render on the worker only.
+    scheduler.add_job(run_report_jobs, 'interval', seconds=REPORT_JOB_POLL_INTERVAL_SECONDS, max_instances=1)
+    # Every process schedules the jobs below; run_once lets one of them run each slot.
+    scheduler.add_job(run_once(send_recent_calendar_change_notifications, HOURLY), 'cron', minute=0)
+    # Archived state is derived at read time, so digests built before this run in a
+    # tenant's local morning already leave out members who left yesterday.
+    scheduler.add_job(run_once(apply_due_separations, DAILY), 'cron', hour=0, minute=10)
+    # Daily digests go out in each tenant's local morning; every tenant digest takes its
+    # own lease, so the tick itself is not locked.
+    scheduler.add_job(send_tenant_digests, 'cron', minute='*/15')
+    if multitenancy_enabled:
+        scheduler.add_job(run_once(run_update_max_team_members_numbers, DAILY), 'cron', hour=1, minute=5)
+        scheduler.add_job(run_once(activate_trials, DAILY), 'cron', hour=2, minute=5)
+    return scheduler
@@ -0,0 +1,51 @@
+import logging
+from typing import Iterable
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from ..model import Team, User
+
+log = logging.getLogger(__name__)
+
+
+class NotificationContext:
+    """Subscribers of all teams a notification job looks at, loaded up front.
+
+    Resolving subscribers per team costs a user query per team (or per audit row). A job
+    builds one context when it starts and asks it for emails instead, so it runs a fixed
+    number of queries however many teams there are.
+    """
+
+    def __init__(self, users_by_id: dict[str, User]):
+        self.users_by_id = users_by_id
+
+    @classmethod
+    def for_teams(cls, teams: Iterable[Team]) -> "NotificationContext":
+        """Context for teams already in memory: one user query."""
+        return cls.for_subscriber_ids(
+            subscriber_id for team in teams if team is not None for subscriber_id in team.subscriber_ids())
+
+    @classmethod
+    def load(cls, **team_filters) -> "NotificationContext":
+        """Context for the teams matching ``team_filters``: one team projection and one user query."""
+        preferences = Team.objects(**team_filters).scalar("notification_preferences")
+        return cls.for_subscriber_ids(subscriber_id for team_preferences in preferences
+                                      for subscriber_id in (team_preferences or {}))
+
+    @classmethod
+    def for_subscriber_ids(cls, subscriber_ids: Iterable[str]) -> "NotificationContext":
+        object_ids = set()
+        for raw_id in subscriber_ids:
+            try:
+                object_ids.add(ObjectId(raw_id))
+            except (InvalidId, TypeError):
+                log.warning("Ignoring invalid subscriber id %s", raw_id)
+        if not object_ids:
+            return cls({})
+        users = User.objects(id__in=list(object_ids)).only("id", "email", "auth_details.google_email")
+        return cls({str(user.id): user for user in users})
+
+    def subscriber_emails(self, team: Team, notification_type: str | None = None,
+                          exclude_user_ids: Iterable[str] | None = None) -> list[str]:
+        return team.get_subscriber_emails(notification_type, exclude_user_ids, users_by_id=self.users_by_id)
@@ -0,0 +1,93 @@
+import datetime
+import logging
+import os
+from typing import Iterable
+
+from pymongo.errors import BulkWriteError
+
+from ..email_service import EmailMessage, send_email, send_emails
+from ..model import OutboxMessage
+from .job_lock import acquire_lease
+
+log = logging.getLogger(__name__)
+
+# Messages claimed per dispatcher run; with the run interval this caps the cluster's send rate.
+OUTBOX_DISPATCH_BATCH_SIZE = int(os.getenv("OUTBOX_DISPATCH_BATCH_SIZE", "200"))
+OUTBOX_DISPATCH_INTERVAL_SECONDS = int(os.getenv("OUTBOX_DISPATCH_INTERVAL_SECONDS", "30"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_DELAY = datetime.timedelta(minutes=5)
+# A claimed message that is neither sent nor failed after this long belongs to a
+# dispatcher that died; it becomes available again.
+OUTBOX_CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def enqueue_emails(messages: Iterable[tuple[str, EmailMessage]]) -> int:
+    """Store ``(idempotency_key, message)`` pairs for the dispatcher; return how many were new.
+
+    Keys already in the outbox are skipped, so a job that runs twice for the same period
+    enqueues every digest once.
+    """
+    documents = [
+        OutboxMessage(idempotency_key=key, subject=message.subject, body=message.body,
+                      to_address=message.to_address).to_mongo().to_dict()
+        for key, message in messages
+    ]
+    if not documents:
+        return 0
+    try:
+        return len(OutboxMessage._get_collection().insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+
+def claim_messages(limit: int, now: datetime.datetime) -> list[OutboxMessage]:
+    """Atomically take up to ``limit`` due messages, so concurrent dispatchers never share one."""
+    claimed = []
+    while len(claimed) < limit:
+        message = OutboxMessage.objects(status__in=["pending", "sending"], available_at__lte=now).order_by(
+            "available_at").modify(set__status="sending", set__available_at=now + OUTBOX_CLAIM_TIMEOUT,
+                                   inc__attempts=1, new=True)
+        if message is None:
+            break
+        claimed.append(message)
+    return claimed
+
+
+def dispatch_outbox(limit: int | None = None) -> int:
+    """Send due outbox messages; failed ones are retried later, up to OUTBOX_MAX_ATTEMPTS."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    claimed = {str(message.id): message for message in claim_messages(limit or OUTBOX_DISPATCH_BATCH_SIZE, now)}
+    if not claimed:
+        return 0
+
+    def record(email: EmailMessage, error: Exception | None):
+        message = claimed[email.reference]
+        finished_at = datetime.datetime.now(datetime.timezone.utc)
+        if error is None:
+            message.modify(set__status="sent", set__sent_at=finished_at, unset__last_error=True)
+        elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.modify(set__status="failed", set__last_error=str(error))
+        else:
+            message.modify(set__status="pending", set__last_error=str(error),
+                           set__available_at=finished_at + OUTBOX_RETRY_DELAY * message.attempts)
+
+    stats = send_emails([EmailMessage(message.subject, message.body, message.to_address, message_id)
+                         for message_id, message in claimed.items()], send_email, on_result=record)
+    log.info("Dispatched %d outbox messages: %s", len(claimed), stats)
+    return stats.sent
+
+
+def run_outbox_dispatcher(now: datetime.datetime | None = None) -> int:
+    """Scheduled entry point: dispatch one batch per interval cluster-wide.
+
+    Every process schedules this job. The lease is held for a whole interval and not
+    released, so only one process sends a batch in each interval and the batch size over
+    the interval caps the send rate however many processes run the scheduler.
+    """
+    if not acquire_lease("dispatch_outbox", datetime.timedelta(seconds=OUTBOX_DISPATCH_INTERVAL_SECONDS), now):
+        return 0
+    return dispatch_outbox()
@@ -0,0 +1,28 @@
+import datetime
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+REPORT_JOB_POLL_INTERVAL_SECONDS = int(os.getenv("REPORT_JOB_POLL_INTERVAL_SECONDS", "5"))
+
+
+def run_report_jobs(limit: int | None = None) -> int:
+    """Render queued report jobs until none is left, or ``limit`` of them; return how many ran.
+
+    Jobs are claimed atomically, so any number of processes can run this at once.
+    """
+    # Deferred import: report rendering lives in the router, and scheduled modules
+    # otherwise only import from model/utils/email_service.
+    from ..routers.teams import claim_report_job, run_report_job
+
+    done = 0
+    while limit is None or done < limit:
+        job = claim_report_job(datetime.datetime.now(datetime.timezone.utc))
+        if job is None:
+            break
+        run_report_job(job)
+        done += 1
+    if done:
+        log.info("Ran %d report jobs", done)
+    return done
@@ -0,0 +1,58 @@
+import datetime
+import logging
+import os
+import time
+
+from ..model import Tenant
+from .absence_starts import send_absence_email_updates, send_upcoming_absence_email_updates
+from .birthdays import send_birthday_email_updates
+from .job_lock import DAILY, acquire_lease, record_run, release_lease
+
+log = logging.getLogger(__name__)
+
+# Local hour at which a tenant's daily digests are built.
+DIGEST_LOCAL_HOUR = int(os.getenv("DIGEST_LOCAL_HOUR", "6"))
+# A tenant whose digest hour was missed, e.g. during a deploy, still gets its digests
+# if the process is back within this many hours.
+DIGEST_CATCH_UP_HOURS = 6
+# In the order the global cron slots used to run them.
+TENANT_DIGESTS = (send_absence_email_updates, send_upcoming_absence_email_updates, send_birthday_email_updates)
+
+
+def local_digest_date(tenant: Tenant, now: datetime.datetime) -> datetime.date | None:
+    """The tenant's local date if it is digest time there, otherwise None."""
+    local_now = now.astimezone(tenant.zone())
+    if DIGEST_LOCAL_HOUR <= local_now.hour < DIGEST_LOCAL_HOUR + DIGEST_CATCH_UP_HOURS:
+        return local_now.date()
+    return None
+
+
+def send_tenant_digests(now: datetime.datetime | None = None) -> int:
+    """Run the daily digests of every tenant whose local morning has come; return how many ran.
+
+    Scheduled every few minutes, so tenants in different timezones are handled at
+    different times of the server's day instead of all at 06:00. Each tenant, digest and
+    local date takes its own lease, which makes a digest run once cluster-wide and lets
+    the next tick retry one that failed.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    ran = 0
+    for tenant in Tenant.objects().only("id", "timezone"):
+        today = local_digest_date(tenant, now)
+        if today is None:
+            continue
+        for job in TENANT_DIGESTS:
+            name = f"{job.__name__}:{tenant.id}:{today.isoformat()}"
+            if not acquire_lease(name, DAILY, now):
+                continue
+            started = time.perf_counter()
+            try:
+                job(tenant=tenant, today=today)
+            except Exception as e:
+                log.exception("Digest %s failed for tenant %s", job.__name__, tenant.id)
+                release_lease(name)
+                record_run(job.__name__, now, time.perf_counter() - started, e)
+                continue
+            record_run(job.__name__, now, time.perf_counter() - started)
+            ran += 1
+    return ran
@@ -8,6 +8,11 @@ os.environ.setdefault("TELEGRAM_BOT_USERNAME", "testbot")
 os.environ.setdefault("GOOGLE_CLIENT_ID", "test-google-client")
 
 import pytest
+from unittest.mock import patch
+
+from backend.tests.query_budget import QueryRecorder, register_command_listener
+
+register_command_listener()  # before the model module connects
 
 from backend.model import Tenant, User, UserInvite
 
@@ -25,8 +30,41 @@ def clean_user_collections():
         model.drop_collection()
 
 
+@pytest.fixture
+def queries():
+    """Record the database commands of a ``with queries:`` block, then assert a budget.
+
+        with queries:
+            client.get("/teams", headers=headers)
+        queries.assert_max_queries(12)
+        queries.assert_no_query_in_loop()
+    """
+    return QueryRecorder()
+
+
 @pytest.fixture
 def unique_suffix():
     """Provide a random suffix for test data that must be unique."""
 
     return uuid.uuid4().hex
+
+
+@pytest.fixture
+def dispatch_emails():
+    """Drain the email outbox with ``send_email`` mocked and return the mock.
+
+    Notification jobs only enqueue their emails; tests call this after a job to see what
+    would be sent.
+    """
+    from backend.model import OutboxMessage
+    from backend.scheduled.outbox import dispatch_outbox
+
+    OutboxMessage.drop_collection()
+
+    def dispatch():
+        with patch("backend.scheduled.outbox.send_email") as send_email:
+            dispatch_outbox(limit=10_000)
+        return send_email
+
+    yield dispatch
+    OutboxMessage.drop_collection()
@@ -0,0 +1,23 @@
+import importlib
+import os
+
+os.environ.setdefault("MONGO_MOCK", "1")
+
+from bson import ObjectId
+
+from backend.db_migrations import db_utils
+
+
+def test_add_day_type_bits_migration_fills_free_bits_in_creation_order():
+    coll = db_utils.db['day_type']
+    tenant_id = ObjectId()
+
+    first = coll.insert_one({'tenant': tenant_id, 'name': 'First', 'identifier': 'first'}).inserted_id
+    assigned = coll.insert_one({'tenant': tenant_id, 'name': 'Assigned', 'identifier': 'assigned', 'bit': 0}).inserted_id
+    last = coll.insert_one({'tenant': tenant_id, 'name': 'Last', 'identifier': 'last'}).inserted_id
+    other_tenant = coll.insert_one({'tenant': ObjectId(), 'name': 'Other', 'identifier': 'other'}).inserted_id
+
+    importlib.import_module('backend.db_migrations.m2026_10_19_004_add_day_type_bits')
+
+    assert [coll.find_one({'_id': day_type_id})['bit'] for day_type_id in (first, assigned, last)] == [1, 0, 2]
+    assert coll.find_one({'_id': other_tenant})['bit'] == 0
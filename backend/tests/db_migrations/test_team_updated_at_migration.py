@@ -0,0 +1,22 @@
+import importlib
+import os
+from datetime import datetime
+
+from bson import ObjectId
+
+os.environ.setdefault("MONGO_MOCK", "1")
+
+from backend.db_migrations import db_utils
+
+
+def test_add_team_updated_at_migration_keeps_existing_timestamps():
+    coll = db_utils.db['team']
+
+    earlier = datetime(2024, 5, 1, 12, 0)
+    without_field = coll.insert_one({'name': 'Legacy', 'tenant': ObjectId()}).inserted_id
+    with_field = coll.insert_one({'name': 'Already migrated', 'tenant': ObjectId(), 'updated_at': earlier}).inserted_id
+
+    importlib.import_module('backend.db_migrations.m2026_10_19_002_add_team_updated_at')
+
+    assert coll.find_one({'_id': without_field})['updated_at'] > earlier
+    assert coll.find_one({'_id': with_field})['updated_at'] == earlier
@@ -0,0 +1,21 @@
+import importlib
+import os
+
+from bson import ObjectId
+
+os.environ.setdefault("MONGO_MOCK", "1")
+
+from backend.db_migrations import db_utils
+
+
+def test_add_team_version_migration_backfills_zero():
+    coll = db_utils.db['team']
+
+    without_field = coll.insert_one({'name': 'Legacy', 'tenant': ObjectId()}).inserted_id
+    with_field = coll.insert_one({'name': 'Already migrated', 'tenant': ObjectId(), 'version': 7}).inserted_id
+
+    importlib.import_module('backend.db_migrations.m2026_10_19_001_add_team_version')
+
+    assert coll.find_one({'_id': without_field})['version'] == 0
+    # A version that already moved must not be reset.
+    assert coll.find_one({'_id': with_field})['version'] == 7
@@ -0,0 +1,19 @@
+import importlib
+import os
+
+os.environ.setdefault("MONGO_MOCK", "1")
+
+from backend.db_migrations import db_utils
+
+
+def test_add_tenant_timezone_migration_keeps_configured_zones():
+    coll = db_utils.db['tenant']
+
+    without_field = coll.insert_one({'name': 'Legacy', 'identifier': 'legacy-tz'}).inserted_id
+    with_field = coll.insert_one({'name': 'Configured', 'identifier': 'configured-tz',
+                                  'timezone': 'Europe/Stockholm'}).inserted_id
+
+    importlib.import_module('backend.db_migrations.m2026_10_19_003_add_tenant_timezone')
+
+    assert coll.find_one({'_id': without_field})['timezone'] == 'UTC'
+    assert coll.find_one({'_id': with_field})['timezone'] == 'Europe/Stockholm'
@@ -0,0 +1,163 @@
+"""Record the database commands a block of code issues, to hold it to a query budget.
+
+With a real MongoDB the commands come from a pymongo ``CommandListener``, which
+:func:`register_command_listener` must install before the client is created - the
+conftest does so before importing the model. With mongomock, which emits no command
+events, the equivalent ``Collection`` methods are wrapped for the duration of the block.
+
+Each command is recorded with the line of backend code that issued it, so besides
+counting, :meth:`QueryRecorder.assert_no_query_in_loop` can tell when one line issued
+the same command repeatedly - the N+1 pattern of a lookup per member or per team.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from typing import NamedTuple
+from unittest.mock import patch
+
+import mongomock
+from pymongo import monitoring
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Commands that read or write documents; handshakes, index builds and cursor
+# bookkeeping do not count towards a budget.
+QUERY_COMMANDS = {"find", "aggregate", "count", "distinct", "insert", "update", "delete", "findAndModify"}
+
+MONGOMOCK_COMMANDS = {
+    "find": "find", "find_one": "find",
+    "aggregate": "aggregate",
+    "count_documents": "count", "estimated_document_count": "count",
+    "distinct": "distinct",
+    "insert_one": "insert", "insert_many": "insert",
+    "update_one": "update", "update_many": "update", "replace_one": "update", "bulk_write": "update",
+    "delete_one": "delete", "delete_many": "delete",
+    "find_one_and_update": "findAndModify", "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+}
+
+
+class RecordedCommand(NamedTuple):
+    command: str
+    collection: str
+    site: str  # file:line of the backend code that issued it
+
+    def __str__(self):
+        return f"{self.command} {self.collection} at {self.site}"
+
+
+def _calling_site() -> str:
+    """The innermost frame in backend code outside the tests, e.g. ``routers/teams.py:512``."""
+    frame = sys._getframe(2)
+    while frame:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(BACKEND_DIR) and not filename.startswith(TESTS_DIR):
+            return f"{os.path.relpath(filename, BACKEND_DIR)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "<outside backend>"
+
+
+class QueryRecorder:
+    """Collects the commands issued while it is entered; reusable for several blocks."""
+
+    def __init__(self):
+        self.commands: list[RecordedCommand] = []
+        self._lock = threading.Lock()
+        self._active = False
+        self._patches: ExitStack | None = None
+        self._local = threading.local()
+
+    def record(self, command: str, collection: str):
+        if not self._active or command not in QUERY_COMMANDS:
+            return
+        with self._lock:
+            self.commands.append(RecordedCommand(command, collection, _calling_site()))
+
+    def __enter__(self) -> "QueryRecorder":
+        self.commands = []
+        if _uses_mongomock():
+            self._patches = ExitStack()
+            for method, command in MONGOMOCK_COMMANDS.items():
+                self._patches.enter_context(patch.object(mongomock.collection.Collection, method,
+                                                         self._wrap(method, command)))
+        self._active = True
+        _listener.recorders.add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._active = False
+        _listener.recorders.discard(self)
+        if self._patches:
+            self._patches.close()
+            self._patches = None
+
+    def _wrap(self, method: str, command: str):
+        original = getattr(mongomock.collection.Collection, method)
+        recorder = self
+
+        def wrapper(collection, *args, **kwargs):
+            # mongomock implements some methods with others, e.g. find_one with find.
+            if getattr(recorder._local, "depth", 0):
+                return original(collection, *args, **kwargs)
+            recorder.record(command, collection.name)
+            recorder._local.depth = 1
+            try:
+                return original(collection, *args, **kwargs)
+            finally:
+                recorder._local.depth = 0
+
+        return wrapper
+
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+
+    def report(self) -> str:
+        return "\n".join(f"  {command}" for command in self.commands)
+
+    def assert_max_queries(self, limit: int):
+        assert self.count <= limit, f"{self.count} queries, expected at most {limit}:\n{self.report()}"
+
+    def assert_no_query_in_loop(self, max_repeats: int = 1, allow: tuple[str, ...] = ()):
+        """Fail when one line of code issued the same command more than ``max_repeats`` times.
+
+        ``allow`` lists sites, as ``path:line`` or just ``path``, that loop by design,
+        such as a dispatcher claiming messages one by one.
+        """
+        repeats = Counter(self.commands)
+        looping = [(command, times) for command, times in repeats.items() if times > max_repeats and
+                   not any(command.site == site or command.site.startswith(site + ":") for site in allow)]
+        assert not looping, "Queries issued in a loop:\n" + "\n".join(
+            f"  {command} x{times}" for command, times in looping)
+
+
+class _Listener(monitoring.CommandListener):
+    def __init__(self):
+        self.recorders: set[QueryRecorder] = set()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        for recorder in list(self.recorders):
+            recorder.record(event.command_name, collection if isinstance(collection, str) else "")
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+_listener = _Listener()
+
+
+def register_command_listener():
+    """Install the listener for clients created from now on; call before connecting."""
+    monitoring.register(_listener)
+
+
+def _uses_mongomock() -> bool:
+    from backend.model import use_mock
+    return use_mock
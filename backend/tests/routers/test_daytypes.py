@@ -1,5 +1,7 @@
 import os
 import uuid
+from unittest.mock import patch
+
 import pytest
 
 os.environ.setdefault("MONGO_MOCK", "1")
@@ -8,6 +10,8 @@ os.environ.setdefault("AUTHENTICATION_SECRET_KEY", "test_secret")
 from fastapi.testclient import TestClient
 
 from backend.main import app
+from mongoengine import NotUniqueError
+
 from backend.model import DayType, Tenant, User, AuthDetails, Team, TeamMember, DayEntry
 from backend.dependencies import get_current_active_user_check_tenant, get_tenant
 
@@ -90,3 +94,50 @@ def test_delete_unused_day_type():
     assert response.status_code == 200
     assert response.json()["message"] == "DayType deleted successfully"
     app.dependency_overrides = {}
+
+
+def test_day_types_keep_their_bits_and_masks_follow_changes():
+    tenant, user, custom = setup_custom_day_type()
+    vacation = DayType.objects.get(tenant=tenant, identifier="vacation")
+    assert (vacation.bit, custom.bit) == (0, 4)
+
+    masks = DayType.get_masks(tenant)
+    assert masks.vacation == 1 and masks.bits.mask([custom.id]) == 1 << 4
+    assert masks.absence == 0b11
+
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
+    app.dependency_overrides[get_tenant] = lambda: tenant
+    response = client.put(f"/daytypes/{custom.id}", headers={"Tenant-ID": tenant.identifier}, json={
+        "name": "Custom", "identifier": custom.identifier, "color": custom.color, "is_absence": True})
+    assert response.status_code == 200
+    response = client.post("/daytypes", headers={"Tenant-ID": tenant.identifier}, json={
+        "name": "Training", "identifier": "training", "color": "#000000"})
+    assert response.status_code == 200
+    app.dependency_overrides = {}
+
+    # Another process holding an older masks cache sees the change through the version.
+    masks = DayType.get_masks(Tenant.objects.get(id=tenant.id))
+    assert masks.absence == 0b10011
+    assert DayType.objects.get(tenant=tenant, identifier="training").bit == 5
+    assert DayType.objects.get(tenant=tenant, identifier=custom.identifier).bit == 4
+
+
+def test_day_type_created_concurrently_with_the_same_free_bit_takes_the_next():
+    tenant, _, _ = setup_custom_day_type()
+    # Both creates read bit 5 as free; the other one inserted first.
+    DayType(tenant=tenant, name="Other", identifier="other", color="#000000").save()
+    stale_then_fresh = [5, DayType.free_bit(tenant)]
+
+    with patch.object(DayType, "free_bit", side_effect=stale_then_fresh):
+        training = DayType(tenant=tenant, name="Training", identifier="training", color="#000000").save()
+
+    assert training.bit == 6
+
+
+def test_day_type_with_a_duplicate_name_is_not_retried():
+    tenant, _, _ = setup_custom_day_type()
+
+    with patch.object(DayType, "free_bit", wraps=DayType.free_bit) as free_bit, pytest.raises(NotUniqueError):
+        DayType(tenant=tenant, name="Custom", identifier="custom-again", color="#000000").save()
+
+    assert free_bit.call_count == 2
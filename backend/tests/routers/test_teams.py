@@ -1,6 +1,7 @@
 import datetime
 import os
 import uuid
+from unittest.mock import patch
 
 os.environ.setdefault("MONGO_MOCK", "1")
 os.environ.setdefault("AUTHENTICATION_SECRET_KEY", "test_secret")
@@ -278,6 +279,37 @@ def test_team_member_birthday_added_once_per_year():
         app.dependency_overrides = {}
 
 
+def test_birthday_day_type_is_looked_up_once_per_tenant(queries):
+    unique_suffix = str(uuid.uuid4())
+    tenant = Tenant(name=f"Tenant-{unique_suffix}", identifier=f"tenant-{unique_suffix}").save()
+    DayType.init_day_types(tenant)
+    members = [TeamMember(name=f"Member {i}", country="Sweden", birthday="05-12") for i in range(5)]
+    Team(tenant=tenant, name="Team Birthdays", team_members=members).save()
+    user = User(
+        name="Manager",
+        role="manager",
+        tenants=[tenant],
+        auth_details=AuthDetails(username=f"manager-{unique_suffix}"),
+    ).save()
+
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
+    app.dependency_overrides[get_tenant] = lambda: tenant
+
+    try:
+        with patch("backend.model.DayType.objects", wraps=DayType.objects) as day_types:
+            first = client.get("/teams", headers={"Tenant-ID": tenant.identifier})
+            with queries:
+                second = client.get("/teams", headers={"Tenant-ID": tenant.identifier})
+    finally:
+        app.dependency_overrides = {}
+
+    assert first.status_code == second.status_code == 200
+    queries.assert_max_queries(4)
+    queries.assert_no_query_in_loop()
+    birthday_lookups = [c for c in day_types.call_args_list if c.kwargs.get("identifier") == "birthday"]
+    assert len(birthday_lookups) == 1
+
+
 def test_add_team_member_success():
     unique_suffix = str(uuid.uuid4())
     tenant = Tenant(name=f"Tenant-{unique_suffix}", identifier=f"tenant-{unique_suffix}").save()
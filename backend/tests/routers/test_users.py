@@ -173,6 +173,38 @@ def test_employee_cannot_promote_user():
     assert response.json() == {"detail": "Only managers can update other users."}
 
 
+def test_manager_sets_tenant_timezone(unique_suffix):
+    tenant = Tenant(name=f"Timezone Tenant {unique_suffix}", identifier=f"timezone-tenant-{unique_suffix}")
+    tenant.save()
+    user = User(
+        name="Manager",
+        email=f"manager-{unique_suffix}@example.com",
+        auth_details=AuthDetails(username=f"manager-{unique_suffix}"),
+        tenants=[tenant],
+        disabled=False,
+        role="manager"
+    )
+    user.save()
+    assert tenant.timezone == "UTC"
+
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
+    app.dependency_overrides[get_tenant] = lambda: tenant
+
+    try:
+        headers = {"Tenant-ID": tenant.identifier}
+        unknown = client.put("/users/tenant/timezone", headers=headers, json={"timezone": "Mars/Olympus"})
+        response = client.put("/users/tenant/timezone", headers=headers, json={"timezone": "Europe/Stockholm"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert unknown.status_code == 422
+    assert response.status_code == 200
+    tenant.reload()
+    assert tenant.timezone == "Europe/Stockholm"
+
+
 def test_remove_tenant(mock_user, mock_tenant):
     other_tenant = Tenant(
         id=ObjectId(),
@@ -150,3 +150,25 @@ def test_returns_zero_when_there_is_nothing_to_do():
     apply_due_separations(today=TODAY)
     team = Team.objects(tenant=tenant).first()
     assert team.get_member(member.uid).is_deleted is False
+
+
+def test_updates_only_the_due_member_in_place():
+    tenant = make_tenant()
+    staying = TeamMember(name="Bob", country="Sweden", email="bob@example.com")
+    leaving = TeamMember(name="Alice", country="Sweden", phone="123",
+                         last_working_day=TODAY - datetime.timedelta(days=1))
+    team = Team(tenant=tenant, name=f"Team-{uuid.uuid4()}", team_members=[staying, leaving]).save()
+    untouched = Team(tenant=tenant, name=f"Other-{uuid.uuid4()}",
+                     team_members=[TeamMember(name="Carol", country="Sweden")]).save()
+    version, untouched_version = team.version, untouched.version
+
+    apply_due_separations(today=TODAY)
+
+    team.reload()
+    untouched.reload()
+    assert [m.is_deleted for m in team.team_members] == [False, True]
+    # The sweep reads a projection; the update must not drop the fields it did not read.
+    assert team.team_members[0].email == "bob@example.com"
+    assert team.team_members[1].phone == "123"
+    assert team.version == version + 1
+    assert untouched.version == untouched_version
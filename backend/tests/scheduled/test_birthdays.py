@@ -0,0 +1,33 @@
+import datetime
+import uuid
+
+from backend.model import AuthDetails, Team, TeamMember, Tenant, User
+from backend.notification_types import BIRTHDAY_DAILY_NOTIFICATION
+from backend.scheduled.birthdays import send_birthday_email_updates, teams_with_birthdays
+
+TODAY = datetime.date(2025, 5, 12)
+
+
+def test_only_teams_with_a_celebrant_are_loaded(dispatch_emails):
+    tenant = Tenant(name=f"Tenant-{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    subscriber = User(tenants=[tenant], name="Subscriber", email=f"sub{uuid.uuid4()}@example.com",
+                      auth_details=AuthDetails(username=str(uuid.uuid4()))).save()
+    preferences = {str(subscriber.id): [BIRTHDAY_DAILY_NOTIFICATION]}
+    celebrating = Team(tenant=tenant, name="Celebrating", notification_preferences=preferences, team_members=[
+        TeamMember(name="Alice", country="Sweden", birthday="05-12"),
+        TeamMember(name="Bob", country="Sweden", birthday="05-13"),
+    ]).save()
+    Team(tenant=tenant, name="Quiet", notification_preferences=preferences, team_members=[
+        TeamMember(name="Carol", country="Sweden", birthday="12-05"),
+    ]).save()
+
+    assert [team.id for team in teams_with_birthdays(TODAY, tenant=tenant)] == [celebrating.id]
+
+    send_birthday_email_updates(tenant=tenant, today=TODAY)
+
+    send_email = dispatch_emails()
+    send_email.assert_called_once()
+    subject, body, to_address = send_email.call_args.args
+    assert subject == "Birthdays Today - Celebrating - May 12"
+    assert "Alice" in body and "Bob" not in body
+    assert to_address == subscriber.email
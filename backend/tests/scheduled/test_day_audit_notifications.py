@@ -42,7 +42,7 @@ def _create_user(name: str, tenant: Tenant) -> User:
     ).save()
 
 
-def test_send_recent_calendar_change_notifications_dispatch_and_content():
+def test_send_recent_calendar_change_notifications_dispatch_and_content(dispatch_emails):
     now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -131,9 +131,9 @@ def test_send_recent_calendar_change_notifications_dispatch_and_content():
         "Vacation Calendar"
     )
 
-    with patch("backend.scheduled.day_audit_notifications.send_email") as mock_send_email, \
-         patch("backend.scheduled.day_audit_notifications.cors_origin", "https://example.com"):
+    with patch("backend.scheduled.day_audit_notifications.cors_origin", "https://example.com"):
         send_recent_calendar_change_notifications(now=now)
+        mock_send_email = dispatch_emails()
 
     assert mock_send_email.call_count == 4
     calls_by_recipient = {
@@ -178,7 +178,7 @@ def test_send_recent_calendar_change_notifications_dispatch_and_content():
         assert body == expected_member_body
 
 
-def test_send_recent_calendar_change_notifications_skips_acting_subscriber():
+def test_send_recent_calendar_change_notifications_skips_acting_subscriber(dispatch_emails):
     now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -214,8 +214,8 @@ def test_send_recent_calendar_change_notifications_skips_acting_subscriber():
         action="created",
     ).save()
 
-    with patch("backend.scheduled.day_audit_notifications.send_email") as mock_send_email:
-        send_recent_calendar_change_notifications(now=now)
+    send_recent_calendar_change_notifications(now=now)
+    mock_send_email = dispatch_emails()
 
     assert mock_send_email.call_count == 1
     args, _ = mock_send_email.call_args
@@ -223,7 +223,7 @@ def test_send_recent_calendar_change_notifications_skips_acting_subscriber():
     assert args[2] == "eve@example.com"
 
 
-def test_send_recent_calendar_change_notifications_ignores_non_matching_audits():
+def test_send_recent_calendar_change_notifications_ignores_non_matching_audits(dispatch_emails):
     now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -276,13 +276,13 @@ def test_send_recent_calendar_change_notifications_ignores_non_matching_audits()
         action="updated",
     ).save()
 
-    with patch("backend.scheduled.day_audit_notifications.send_email") as mock_send_email:
-        send_recent_calendar_change_notifications(now=now)
+    send_recent_calendar_change_notifications(now=now)
+    mock_send_email = dispatch_emails()
 
     mock_send_email.assert_not_called()
 
 
-def test_send_recent_calendar_change_notifications_skips_removed_absences():
+def test_send_recent_calendar_change_notifications_skips_removed_absences(dispatch_emails):
     now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -335,13 +335,13 @@ def test_send_recent_calendar_change_notifications_skips_removed_absences():
         action="deleted",
     ).save()
 
-    with patch("backend.scheduled.day_audit_notifications.send_email") as mock_send_email:
-        send_recent_calendar_change_notifications(now=now)
+    send_recent_calendar_change_notifications(now=now)
+    mock_send_email = dispatch_emails()
 
     mock_send_email.assert_not_called()
 
 
-def test_send_recent_calendar_change_notifications_skips_member_when_emails_match():
+def test_send_recent_calendar_change_notifications_skips_member_when_emails_match(dispatch_emails):
     now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -380,13 +380,13 @@ def test_send_recent_calendar_change_notifications_skips_member_when_emails_matc
         action="created",
     ).save()
 
-    with patch("backend.scheduled.day_audit_notifications.send_email") as mock_send_email:
-        send_recent_calendar_change_notifications(now=now)
+    send_recent_calendar_change_notifications(now=now)
+    mock_send_email = dispatch_emails()
 
     mock_send_email.assert_not_called()
 
 
-def test_send_recent_calendar_change_notifications_aggregates_member_entries():
+def test_send_recent_calendar_change_notifications_aggregates_member_entries(dispatch_emails):
     now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -438,8 +438,8 @@ def test_send_recent_calendar_change_notifications_aggregates_member_entries():
         action="created",
     ).save()
 
-    with patch("backend.scheduled.day_audit_notifications.send_email") as mock_send_email:
-        send_recent_calendar_change_notifications(now=now)
+    send_recent_calendar_change_notifications(now=now)
+    mock_send_email = dispatch_emails()
 
     mock_send_email.assert_called_once()
     args, _ = mock_send_email.call_args
@@ -455,3 +455,45 @@ def test_send_recent_calendar_change_notifications_aggregates_member_entries():
         "Best regards,\n"
         "Vacation Calendar"
     )
+
+
+def test_send_recent_calendar_change_notifications_loads_each_team_once(dispatch_emails):
+    now = datetime.datetime(2025, 5, 10, 12, 0, tzinfo=datetime.timezone.utc)
+    window_start = datetime.datetime(2025, 5, 10, 10, 0, tzinfo=datetime.timezone.utc)
+    tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    subscriber = _create_user("Subscriber", tenant)
+    manager = _create_user("Manager Example", tenant)
+
+    teams = []
+    for team_index in range(3):
+        members = [TeamMember(name=f"Member {team_index}-{index}", country="Sweden",
+                              days={f"2025-05-{12 + index:02d}": DayEntry(day_types=[vacation])})
+                   for index in range(4)]
+        team = Team(tenant=tenant, name=f"Team {team_index}", team_members=members,
+                    notification_preferences={str(subscriber.id): [ABSENCE_RECENT_CHANGES_NOTIFICATION]}).save()
+        teams.append(team)
+    # Interleaved in time, so grouping by team cannot rely on insertion order.
+    for index in range(4):
+        for team in teams:
+            DayAudit(tenant=tenant, team=team, member_uid=str(team.team_members[index].uid),
+                     date=datetime.date(2025, 5, 12 + index), user=manager,
+                     timestamp=window_start + datetime.timedelta(minutes=index), old_day_types=[],
+                     new_day_types=[vacation], action="created").save()
+
+    with patch.object(Team, "objects_with_deleted", wraps=Team.objects_with_deleted) as team_loads, \
+            patch.object(User, "objects", wraps=User.objects) as user_queries, \
+            patch.object(DayType, "objects", wraps=DayType.objects) as day_type_queries:
+        send_recent_calendar_change_notifications(now=now)
+        mock_send_email = dispatch_emails()
+
+    assert team_loads.call_count == 3
+    # Subscribers once for the run, actors once (the same manager for every team).
+    assert user_queries.call_count == 2
+    assert day_type_queries.call_count == 1
+    body = next(args[1] for args, _ in mock_send_email.call_args_list if args[2] == subscriber.email)
+    for team_index in range(3):
+        for index in range(4):
+            assert (f"- Member {team_index}-{index} was assigned Vacation on 2025-05-{12 + index:02d}. "
+                    f"Added by Manager Example.") in body
@@ -0,0 +1,52 @@
+import datetime
+from unittest.mock import Mock
+
+import pytest
+
+from backend.model import JobLock, SchedulerRun
+from backend.scheduled.job_lock import DAILY, acquire_lease, run_once
+
+
+@pytest.fixture(autouse=True)
+def clear_locks():
+    JobLock.drop_collection()
+    SchedulerRun.drop_collection()
+    yield
+    JobLock.drop_collection()
+    SchedulerRun.drop_collection()
+
+
+def test_lease_is_exclusive_until_it_expires():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    lease = datetime.timedelta(hours=12)
+
+    assert acquire_lease("job", lease, now, owner="pod-a")
+    assert not acquire_lease("job", lease, now + datetime.timedelta(seconds=1), owner="pod-b")
+    assert acquire_lease("other-job", lease, now, owner="pod-b")
+
+    assert acquire_lease("job", lease, now + DAILY, owner="pod-b")
+    assert JobLock.objects.get(name="job").owner == "pod-b"
+
+
+def test_each_run_executes_on_one_process_and_is_recorded():
+    job = Mock(__name__="nightly_job", return_value=3)
+    first_process, second_process = run_once(job, DAILY), run_once(job, DAILY)
+
+    assert first_process() == 3
+    assert second_process() is None
+
+    job.assert_called_once()
+    run = SchedulerRun.objects.get(job="nightly_job")
+    assert run.outcome == "succeeded"
+    assert run.duration_seconds >= 0
+
+
+def test_failed_run_is_recorded_and_raised():
+    job = Mock(__name__="broken_job", side_effect=RuntimeError("boom"))
+
+    with pytest.raises(RuntimeError):
+        run_once(job, DAILY)()
+
+    run = SchedulerRun.objects.get(job="broken_job")
+    assert run.outcome == "failed"
+    assert "boom" in run.error
@@ -0,0 +1,23 @@
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from backend.scheduled.jobs import add_scheduled_jobs
+
+
+def job_names(scheduler):
+    return sorted(job.func.__name__ for job in scheduler.get_jobs())
+
+
+def test_api_and_worker_schedule_the_same_jobs():
+    assert job_names(add_scheduled_jobs(BackgroundScheduler(), False)) == [
+        "apply_due_separations",
+        "run_outbox_dispatcher",
+        "run_report_jobs",
+        "send_recent_calendar_change_notifications",
+        "send_tenant_digests",
+    ]
+
+
+def test_multitenancy_adds_tenant_jobs():
+    names = job_names(add_scheduled_jobs(BackgroundScheduler(), True))
+    assert "activate_trials" in names
+    assert "run_update_max_team_members_numbers" in names
@@ -0,0 +1,77 @@
+import datetime
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from backend.model import AuthDetails, DayEntry, DayType, Team, TeamMember, Tenant, User
+from backend.notification_types import (
+    ABSENCE_DAILY_NOTIFICATION,
+    BIRTHDAY_DAILY_NOTIFICATION,
+    list_notification_type_ids,
+)
+from backend.scheduled.absence_starts import send_absence_email_updates
+from backend.scheduled.birthdays import send_birthday_email_updates
+from backend.scheduled.notification_context import NotificationContext
+
+
+@pytest.fixture(autouse=True)
+def clear_collections():
+    for model in (Team, Tenant, DayType, User):
+        model.drop_collection()
+    yield
+    for model in (Team, Tenant, DayType, User):
+        model.drop_collection()
+
+
+def _create_user(tenant, email=None, google_email=None):
+    return User(tenants=[tenant], name="Subscriber", email=email,
+                auth_details=AuthDetails(username=str(uuid.uuid4()), google_email=google_email)).save()
+
+
+def test_context_resolves_emails_like_the_team_does():
+    tenant = Tenant(name="Tenant", identifier=str(uuid.uuid4())).save()
+    first = _create_user(tenant, email="first@example.com")
+    google_only = _create_user(tenant, google_email="google@example.com")
+    birthdays_only = _create_user(tenant, email="birthdays@example.com")
+    team = Team(tenant=tenant, name="Team", notification_preferences={
+        str(first.id): [],
+        "not-an-object-id": [],
+        str(google_only.id): [ABSENCE_DAILY_NOTIFICATION],
+        str(birthdays_only.id): [BIRTHDAY_DAILY_NOTIFICATION],
+    }).save()
+    team.notification_preferences[str(first.id)] = [ABSENCE_DAILY_NOTIFICATION, BIRTHDAY_DAILY_NOTIFICATION]
+
+    notification_types = (None, ABSENCE_DAILY_NOTIFICATION, BIRTHDAY_DAILY_NOTIFICATION)
+    expected = [team.get_subscriber_emails(notification_type) for notification_type in notification_types]
+    context = NotificationContext.for_teams([team])
+
+    with patch.object(User, "objects") as user_objects:
+        assert [context.subscriber_emails(team, notification_type)
+                for notification_type in notification_types] == expected
+        assert context.subscriber_emails(team, exclude_user_ids=[str(first.id)]) == [
+            "google@example.com", "birthdays@example.com"]
+        user_objects.assert_not_called()
+
+
+def test_notification_jobs_query_users_once_however_many_teams(dispatch_emails, queries):
+    tenant = Tenant(name="Tenant", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    today = datetime.date.today()
+    for index in range(5):
+        subscriber = _create_user(tenant, email=f"sub{index}@example.com")
+        member = TeamMember(name=f"Member {index}", country="Sweden", birthday=today.strftime("%m-%d"),
+                            days={str(today): DayEntry(day_types=[vacation])})
+        Team(tenant=tenant, name=f"Team {index}", team_members=[member],
+             notification_preferences={str(subscriber.id): list_notification_type_ids()}).save()
+
+    for job in (send_absence_email_updates, send_birthday_email_updates):
+        with patch.object(User, "objects", wraps=User.objects) as user_objects, queries:
+            job()
+        assert user_objects.call_count == 1
+        assert dispatch_emails().call_count == 5
+        # Up to four of them fill a cold holiday cache, one year at a time, and two read
+        # the tenant's day type masks.
+        queries.assert_max_queries(10)
+        queries.assert_no_query_in_loop(allow=("holiday_cache.py",))
@@ -0,0 +1,108 @@
+import datetime
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from backend.email_service import EmailMessage
+from backend.model import AuthDetails, DayEntry, DayType, JobLock, OutboxMessage, Team, TeamMember, Tenant, User
+from backend.notification_types import ABSENCE_DAILY_NOTIFICATION
+from backend.scheduled import outbox
+from backend.scheduled.absence_starts import send_absence_email_updates
+from backend.scheduled.outbox import claim_messages, dispatch_outbox, enqueue_emails, run_outbox_dispatcher
+
+
+@pytest.fixture(autouse=True)
+def clear_outbox():
+    OutboxMessage.drop_collection()
+    JobLock.drop_collection()
+    yield
+    OutboxMessage.drop_collection()
+    JobLock.drop_collection()
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def as_utc(value):
+    return value.replace(tzinfo=datetime.timezone.utc)
+
+
+def test_enqueue_skips_keys_already_in_the_outbox():
+    assert enqueue_emails([("a", EmailMessage("Subject", "Body", "a@example.com")),
+                           ("b", EmailMessage("Subject", "Body", "b@example.com"))]) == 2
+    assert enqueue_emails([("a", EmailMessage("Changed", "Body", "a@example.com")),
+                           ("c", EmailMessage("Subject", "Body", "c@example.com"))]) == 1
+
+    assert sorted(OutboxMessage.objects.scalar("idempotency_key")) == ["a", "b", "c"]
+    assert OutboxMessage.objects.get(idempotency_key="a").subject == "Subject"
+
+
+def test_rerunning_a_job_sends_each_digest_once(dispatch_emails):
+    tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    subscriber = User(tenants=[tenant], name="Subscriber", email=f"sub{uuid.uuid4()}@example.com",
+                      auth_details=AuthDetails(username=str(uuid.uuid4()))).save()
+    member = TeamMember(name="Alice", country="Sweden", days={str(datetime.date.today()): DayEntry(day_types=[vacation])})
+    Team(tenant=tenant, name="Team", team_members=[member],
+         notification_preferences={str(subscriber.id): [ABSENCE_DAILY_NOTIFICATION]}).save()
+
+    # Two API workers running the same job, or a rerun after a restart.
+    send_absence_email_updates()
+    send_absence_email_updates()
+
+    send_email = dispatch_emails()
+    assert [c.args[2] for c in send_email.call_args_list] == [subscriber.email]
+    assert dispatch_emails().call_count == 0
+
+
+def test_failed_delivery_is_retried_later_and_then_given_up(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    enqueue_emails([("a", EmailMessage("Subject", "Body", "a@example.com"))])
+
+    with patch("backend.scheduled.outbox.send_email", side_effect=RuntimeError("SES down")):
+        assert dispatch_outbox() == 0
+    message = OutboxMessage.objects.get(idempotency_key="a")
+    assert (message.status, message.attempts, message.last_error) == ("pending", 1, "SES down")
+    assert as_utc(message.available_at) > utcnow()
+
+    # Not due yet, so nothing is claimed.
+    with patch("backend.scheduled.outbox.send_email") as send_email:
+        dispatch_outbox()
+    send_email.assert_not_called()
+
+    message.update(set__available_at=utcnow() - datetime.timedelta(seconds=1))
+    with patch("backend.scheduled.outbox.send_email", side_effect=RuntimeError("SES down")):
+        dispatch_outbox()
+    assert OutboxMessage.objects.get(idempotency_key="a").status == "failed"
+
+
+def test_claims_are_exclusive_and_expire():
+    enqueue_emails([(str(i), EmailMessage("Subject", "Body", f"{i}@example.com")) for i in range(5)])
+    now = utcnow()
+
+    first = claim_messages(3, now)
+    second = claim_messages(3, now)
+    assert len(first) == 3 and len(second) == 2
+    assert not {m.id for m in first} & {m.id for m in second}
+    assert claim_messages(3, now) == []
+
+    # A dispatcher that died keeps its claim only until the timeout.
+    reclaimed = claim_messages(10, now + outbox.OUTBOX_CLAIM_TIMEOUT + datetime.timedelta(seconds=1))
+    assert len(reclaimed) == 5
+    assert {m.attempts for m in reclaimed} == {2}
+
+
+def test_processes_share_one_dispatch_batch_per_interval(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_DISPATCH_BATCH_SIZE", 2)
+    enqueue_emails([(str(i), EmailMessage("Subject", "Body", f"{i}@example.com")) for i in range(5)])
+    now = utcnow()
+    interval = datetime.timedelta(seconds=outbox.OUTBOX_DISPATCH_INTERVAL_SECONDS)
+
+    # Every process ticks at the same time; only one of them sends a batch.
+    with patch("backend.scheduled.outbox.send_email") as send_email:
+        assert [run_outbox_dispatcher(now) for _ in range(3)] == [2, 0, 0]
+        assert run_outbox_dispatcher(now + interval) == 2
+    assert send_email.call_count == 4
@@ -33,7 +33,7 @@ def clear_collections():
     User.drop_collection()
 
 
-def test_send_absence_email_updates_dispatch_and_content():
+def test_send_absence_email_updates_dispatch_and_content(dispatch_emails):
     tenant = Tenant(
         name=f"Tenant{uuid.uuid4()}",
         identifier=str(uuid.uuid4()),
@@ -74,21 +74,21 @@ def test_send_absence_email_updates_dispatch_and_content():
         "Best regards,\nVacation Calendar"
     )
     real_date = datetime.date
-    with patch("backend.scheduled.absence_starts.send_email") as mock_send_email, \
-         patch("backend.scheduled.absence_starts.datetime.date") as mock_date, \
+    with patch("backend.scheduled.absence_starts.datetime.date") as mock_date, \
          patch("backend.scheduled.absence_starts.get_country_holidays", return_value={}), \
          patch("backend.scheduled.absence_starts.cors_origin", "https://example.com"):
         mock_date.today.return_value = today
         mock_date.side_effect = lambda *args, **kwargs: real_date(*args, **kwargs)
 
         send_absence_email_updates()
+        mock_send_email = dispatch_emails()
 
         mock_send_email.assert_called_once_with(
             expected_subject, expected_body, subscriber_email
         )
 
 
-def test_send_absence_email_updates_skips_subscribers_without_addresses():
+def test_send_absence_email_updates_skips_subscribers_without_addresses(dispatch_emails):
     tenant = Tenant(
         name=f"Tenant{uuid.uuid4()}",
         identifier=str(uuid.uuid4()),
@@ -142,21 +142,21 @@ def test_send_absence_email_updates_skips_subscribers_without_addresses():
         "Best regards,\nVacation Calendar"
     )
     real_date = datetime.date
-    with patch("backend.scheduled.absence_starts.send_email") as mock_send_email, \
-         patch("backend.scheduled.absence_starts.datetime.date") as mock_date, \
+    with patch("backend.scheduled.absence_starts.datetime.date") as mock_date, \
          patch("backend.scheduled.absence_starts.get_country_holidays", return_value={}), \
          patch("backend.scheduled.absence_starts.cors_origin", "https://example.com"):
         mock_date.today.return_value = today
         mock_date.side_effect = lambda *args, **kwargs: real_date(*args, **kwargs)
 
         send_absence_email_updates()
+        mock_send_email = dispatch_emails()
 
     mock_send_email.assert_called_once_with(
         expected_subject, expected_body, google_only_email
     )
 
 
-def test_send_absence_email_updates_respects_notification_preferences():
+def test_send_absence_email_updates_respects_notification_preferences(dispatch_emails):
     tenant = Tenant(
         name=f"Tenant{uuid.uuid4()}",
         identifier=str(uuid.uuid4()),
@@ -190,13 +190,13 @@ def test_send_absence_email_updates_respects_notification_preferences():
 
     today = datetime.date(2024, 7, 1)
     real_date = datetime.date
-    with patch("backend.scheduled.absence_starts.send_email") as mock_send_email, \
-         patch("backend.scheduled.absence_starts.datetime.date") as mock_date, \
+    with patch("backend.scheduled.absence_starts.datetime.date") as mock_date, \
          patch("backend.scheduled.absence_starts.get_country_holidays", return_value={}), \
          patch("backend.scheduled.absence_starts.cors_origin", "https://example.com"):
         mock_date.today.return_value = today
         mock_date.side_effect = lambda *args, **kwargs: real_date(*args, **kwargs)
 
         send_absence_email_updates()
+        mock_send_email = dispatch_emails()
 
         mock_send_email.assert_not_called()
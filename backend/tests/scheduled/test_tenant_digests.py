@@ -0,0 +1,80 @@
+import datetime
+import uuid
+from unittest.mock import Mock
+
+import pytest
+
+from backend.model import JobLock, Tenant
+from backend.scheduled import tenant_digests
+from backend.scheduled.tenant_digests import local_digest_date, send_tenant_digests
+
+
+@pytest.fixture(autouse=True)
+def clear_locks():
+    JobLock.drop_collection()
+    yield
+    JobLock.drop_collection()
+
+
+@pytest.fixture
+def digests(monkeypatch):
+    jobs = (Mock(__name__="absences"), Mock(__name__="birthdays"))
+    monkeypatch.setattr(tenant_digests, "TENANT_DIGESTS", jobs)
+    return jobs
+
+
+def make_tenant(timezone):
+    suffix = uuid.uuid4()
+    return Tenant(name=f"Tenant-{suffix}", identifier=f"tenant-{suffix}", timezone=timezone).save()
+
+
+def calls_for(job, tenant):
+    return [call.kwargs["today"] for call in job.call_args_list if call.kwargs["tenant"].id == tenant.id]
+
+
+def at_utc_hour(hour, minute=0):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def test_digest_date_follows_the_tenant_morning():
+    tokyo, stockholm = Tenant(timezone="Asia/Tokyo"), Tenant(timezone="Europe/Stockholm")
+    now = datetime.datetime(2025, 1, 1, 21, 30, tzinfo=datetime.timezone.utc)
+
+    assert local_digest_date(tokyo, now) == datetime.date(2025, 1, 2)
+    assert local_digest_date(stockholm, now) is None
+    assert local_digest_date(stockholm, now + datetime.timedelta(hours=8)) == datetime.date(2025, 1, 2)
+
+
+def test_each_tenant_gets_its_digests_once_in_its_morning(digests):
+    absences, birthdays = digests
+    tokyo, new_york = make_tenant("Asia/Tokyo"), make_tenant("America/New_York")
+    now = at_utc_hour(22)
+
+    send_tenant_digests(now)
+    send_tenant_digests(now + datetime.timedelta(minutes=15))
+
+    tokyo_date = now.astimezone(tokyo.zone()).date()
+    assert calls_for(absences, tokyo) == [tokyo_date]
+    assert calls_for(birthdays, tokyo) == [tokyo_date]
+    assert calls_for(absences, new_york) == []
+
+
+def test_failed_digest_is_retried_on_the_next_tick(digests):
+    absences, birthdays = digests
+    tenant = make_tenant("UTC")
+    failures = [RuntimeError("boom")]
+
+    def fail_once_for_tenant(**kwargs):
+        # Tenants left by other tests run too; only this one fails.
+        if kwargs["tenant"].id == tenant.id and failures:
+            raise failures.pop()
+    absences.side_effect = fail_once_for_tenant
+    now = at_utc_hour(6)
+
+    send_tenant_digests(now)
+    send_tenant_digests(now + datetime.timedelta(minutes=15))
+    send_tenant_digests(now + datetime.timedelta(minutes=30))
+
+    assert len(calls_for(absences, tenant)) == 2
+    assert len(calls_for(birthdays, tenant)) == 1
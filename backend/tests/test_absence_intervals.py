@@ -0,0 +1,44 @@
+import datetime
+import uuid
+
+from backend.absence_intervals import AbsenceIntervals, get_team_absence_index
+from backend.model import DayEntry, DayType, Team, TeamMember, Tenant
+
+
+def d(day):
+    return datetime.date(2025, 3, day)
+
+
+def test_adjacent_days_merge_into_one_interval():
+    intervals = AbsenceIntervals((d(day).toordinal(), d(day).toordinal()) for day in (7, 3, 4, 5, 10))
+
+    assert len(intervals) == 3
+    assert intervals.interval_at(d(4)) == (d(3), d(5))
+    assert intervals.interval_at(d(6)) is None
+    assert intervals.starts_on(d(3)) and not intervals.starts_on(d(4))
+    assert intervals.contains(d(10)) and not intervals.contains(d(11))
+    assert intervals.overlaps(d(6), d(7))
+    assert not intervals.overlaps(d(8), d(9))
+
+
+def test_team_index_follows_the_team_version():
+    tenant = Tenant(name=f"Tenant-{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    birthday = DayType.objects(tenant=tenant, identifier="birthday").first()
+    alice = TeamMember(name="Alice", country="Sweden", days={
+        "2025-03-03": DayEntry(day_types=[vacation]),
+        "2025-03-04": DayEntry(day_types=[vacation]),
+    })
+    bob = TeamMember(name="Bob", country="Sweden", days={"2025-03-04": DayEntry(day_types=[birthday])})
+    team = Team(tenant=tenant, name="Team", team_members=[alice, bob]).save()
+    masks = DayType.get_masks(tenant)
+
+    index = get_team_absence_index(team, masks)
+    assert index.is_absent(alice, d(4)) and not index.is_absent(bob, d(4))
+    assert index.absent_between(d(1), d(3)) == [str(alice.uid)]
+    assert get_team_absence_index(Team.objects.get(id=team.id), masks) is index
+
+    bob.days["2025-03-05"] = DayEntry(day_types=[vacation])
+    team.save()
+    assert get_team_absence_index(team, masks).is_absent(bob, d(5))
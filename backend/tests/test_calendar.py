@@ -1,15 +1,33 @@
 from datetime import date, timedelta
+from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
 from icalendar import Calendar
 import uuid
 
 from backend.main import app
 from backend.model import Tenant, DayType, Team, TeamMember, DayEntry, User, AuthDetails
+from backend.routers.teams import (
+    FixedWindowRateLimiter,
+    calendar_feed_rate_limiter,
+    coalesce_member_days,
+    get_cached_multi_team_feed,
+    get_cached_team_events,
+    get_cached_team_feed,
+    iter_team_events,
+)
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def reset_calendar_rate_limiter():
+    calendar_feed_rate_limiter.reset()
+    yield
+    calendar_feed_rate_limiter.reset()
+
+
 def setup_team():
     tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
     DayType.init_day_types(tenant)
@@ -103,3 +121,300 @@ def test_calendar_feed_keeps_leaving_member_and_drops_departed_one():
         f"/teams/calendar/{departed_team.id}?user_api_key={departed_user.auth_details.api_key}")
     assert resp.status_code == 200
     assert "BEGIN:VEVENT" not in resp.text
+
+
+def test_calendar_feed_answers_conditional_requests():
+    team, user = setup_team()
+    url = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    by_etag = client.get(url, headers={"If-None-Match": etag})
+    assert by_etag.status_code == 304
+    assert by_etag.headers["ETag"] == etag
+    assert by_etag.content == b""
+
+    by_date = client.get(url, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert by_date.status_code == 304
+
+    stale = client.get(url, headers={"If-None-Match": '"something-else"'})
+    assert stale.status_code == 200
+    assert stale.text == first.text
+
+
+def test_calendar_feed_is_served_from_cache_until_the_team_changes():
+    team, user = setup_team()
+    url = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+    with patch("backend.routers.teams.iter_team_events", wraps=iter_team_events) as build:
+        first = client.get(url)
+        client.get(url)
+        assert build.call_count == 1
+
+        team.team_members[0].name = "Alicia"
+        team.save()
+        changed = client.get(url)
+        assert build.call_count == 2
+
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert "Alicia - Vacation" in changed.text
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_calendar_feed_window_limits_events():
+    team, user = setup_team()
+    vacation = team.team_members[0].days["2025-01-01"].day_types[0]
+    recent = date.today() - timedelta(days=10)
+    upcoming = date.today() + timedelta(days=30)
+    team.team_members[0].days[str(recent)] = DayEntry(day_types=[vacation])
+    team.team_members[0].days[str(upcoming)] = DayEntry(day_types=[vacation])
+    team.save()
+
+    base = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+    everything = Calendar.from_ical(client.get(base).text)
+    windowed = Calendar.from_ical(client.get(f"{base}&past_days=90&future_days=7").text)
+
+    def event_dates(calendar):
+        return sorted(event.decoded("DTSTART") for event in calendar.walk() if event.name == "VEVENT")
+
+    assert event_dates(everything) == [date(2025, 1, 1), recent, upcoming]
+    assert event_dates(windowed) == [recent]
+    assert client.get(f"{base}&past_days=-1").status_code == 422
+
+
+def events_of(ics_text):
+    return [event for event in Calendar.from_ical(ics_text).walk() if event.name == "VEVENT"]
+
+
+def test_calendar_feed_coalesces_consecutive_days():
+    team, user = setup_team()
+    member = team.team_members[0]
+    vacation = member.days["2025-01-01"].day_types[0]
+    # Wednesday 2025-01-01 is already stored; Thursday and Friday continue the run.
+    member.days["2025-01-02"] = DayEntry(day_types=[vacation], comment="Out of office")
+    member.days["2025-01-03"] = DayEntry(day_types=[vacation], comment="Skiing")
+    # Monday after the weekend.
+    member.days["2025-01-06"] = DayEntry(day_types=[vacation])
+    team.save()
+    base = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+
+    daily = events_of(client.get(base).text)
+    assert len(daily) == 4
+
+    coalesced = events_of(client.get(f"{base}&coalesce=true").text)
+    assert [(e.decoded("DTSTART"), e.decoded("DTEND")) for e in coalesced] == [
+        (date(2025, 1, 1), date(2025, 1, 4)),
+        (date(2025, 1, 6), date(2025, 1, 7)),
+    ]
+    assert str(coalesced[0]["DESCRIPTION"]) == "Out of office\nSkiing"
+    # The first day's UID is kept, so a one-day event has the same UID in both modes.
+    assert str(coalesced[0]["UID"]) == str(daily[0]["UID"])
+    assert str(coalesced[1]["UID"]) == str(daily[3]["UID"])
+
+    bridged = events_of(client.get(f"{base}&coalesce=true&bridge_non_working_days=true").text)
+    assert [(e.decoded("DTSTART"), e.decoded("DTEND")) for e in bridged] == [
+        (date(2025, 1, 1), date(2025, 1, 7)),
+    ]
+
+
+def test_coalesce_bridges_country_holidays_but_not_working_days():
+    team, _ = setup_team()
+    member = team.team_members[0]
+    vacation = member.days["2025-01-01"].day_types[0]
+    member.days = {
+        # Friday 3 January, then Tuesday 7 January: Monday 6 January is Epiphany in Sweden.
+        "2025-01-03": DayEntry(day_types=[vacation]),
+        "2025-01-07": DayEntry(day_types=[vacation]),
+        # Wednesday 8 January is a working day, so Thursday starts a new range.
+        "2025-01-09": DayEntry(day_types=[vacation]),
+    }
+
+    ranges = coalesce_member_days(member, bridge_non_working_days=True)
+
+    assert [(start, end) for start, end, _, _ in ranges] == [
+        (date(2025, 1, 3), date(2025, 1, 8)),
+        (date(2025, 1, 9), date(2025, 1, 10)),
+    ]
+
+
+def test_coalesce_keeps_day_types_apart():
+    team, _ = setup_team()
+    member = team.team_members[0]
+    vacation = member.days["2025-01-01"].day_types[0]
+    leave = DayType.objects(tenant=team.tenant, identifier="compensatory_leave").first()
+    member.days["2025-01-02"] = DayEntry(day_types=[leave])
+    member.days["2025-01-03"] = DayEntry(day_types=[vacation, leave])
+
+    ranges = coalesce_member_days(member)
+
+    assert [(start, end, day_type.identifier) for start, end, day_type, _ in ranges] == [
+        (date(2025, 1, 1), date(2025, 1, 2), "vacation"),
+        (date(2025, 1, 2), date(2025, 1, 4), "compensatory_leave"),
+        (date(2025, 1, 3), date(2025, 1, 4), "vacation"),
+    ]
+
+
+def test_coalesced_range_crossing_the_window_start_keeps_its_start():
+    team, _ = setup_team()
+    member = team.team_members[0]
+    vacation = member.days["2025-01-01"].day_types[0]
+    member.days = {f"2025-01-{day:02d}": DayEntry(day_types=[vacation]) for day in range(6, 11)}
+    member.days["2025-01-20"] = DayEntry(day_types=[vacation])
+
+    # A relative window moving on by a day, as with past_days.
+    for window_start in (date(2025, 1, 7), date(2025, 1, 8)):
+        ranges = coalesce_member_days(member, (window_start, date(2025, 1, 15)))
+        assert [(start, end) for start, end, _, _ in ranges] == [(date(2025, 1, 6), date(2025, 1, 11))]
+
+
+def test_calendar_feed_checks_api_key_before_loading_team():
+    team, _ = setup_team()
+    with patch("backend.routers.teams.Team.objects", wraps=Team.objects) as team_objects:
+        resp = client.get(f"/teams/calendar/{team.id}?user_api_key=guessed-{uuid.uuid4()}")
+    assert resp.status_code == 404
+    team_objects.assert_not_called()
+
+
+def test_calendar_names_follow_a_tenant_rename():
+    team, user = setup_team()
+    key = user.auth_details.api_key
+    client.get(f"/teams/calendar/{team.id}?user_api_key={key}")
+    client.get(f"/teams/calendar?user_api_key={key}")
+
+    team.tenant.name = f"Renamed{uuid.uuid4()}"
+    team.tenant.save()
+    feed = client.get(f"/teams/calendar/{team.id}?user_api_key={key}")
+    multi = client.get(f"/teams/calendar?user_api_key={key}")
+    assert str(Calendar.from_ical(feed.text)["X-WR-CALNAME"]) == f"{team.name} - {team.tenant.name} - Vacal"
+    assert str(Calendar.from_ical(multi.text)["X-WR-CALNAME"]) == f"{team.tenant.name} - Vacal"
+
+
+def test_team_deleted_after_its_version_was_read_renders_no_feed():
+    team, _ = setup_team()
+    # Deleted between the endpoint's lookup and the cache miss.
+    Team.objects(id=team.id).delete()
+    assert get_cached_team_feed("Name", str(team.id), team.version, date.today()) is None
+    multi = get_cached_multi_team_feed("Name", ((str(team.id), team.version),), None, date.today())
+    assert events_of(multi.payload.decode()) == []
+
+
+def test_calendar_principal_lookup_is_cached_and_follows_user_changes():
+    team, user = setup_team()
+    url = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+    with patch("backend.routers.teams.User.objects", wraps=User.objects) as user_objects:
+        assert client.get(url).status_code == 200
+        assert client.get(url).status_code == 200
+        assert user_objects.call_count == 1
+
+    user.disabled = True
+    user.save()
+    assert client.get(url).status_code == 404
+
+
+def test_calendar_feed_is_rate_limited_per_api_key():
+    team, user = setup_team()
+    _, other_user = setup_team()
+    url = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+    with patch.object(calendar_feed_rate_limiter, "limit", 2):
+        assert client.get(url).status_code == 200
+        assert client.get(url).status_code == 200
+        limited = client.get(url)
+        # Same client address, another subscription.
+        other = client.get(f"/teams/calendar?user_api_key={other_user.auth_details.api_key}")
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "60"
+    assert other.status_code == 200
+
+
+def test_calendar_feed_rate_limit_is_off_by_default():
+    team, user = setup_team()
+    url = f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}"
+    assert calendar_feed_rate_limiter.limit == 0
+    assert all(client.get(url).status_code == 200 for _ in range(5))
+
+
+def test_fixed_window_rate_limiter_starts_over_in_next_window():
+    limiter = FixedWindowRateLimiter(limit=1, window_seconds=60)
+    assert limiter.allow("a", now=0)
+    assert not limiter.allow("a", now=59)
+    assert limiter.allow("b", now=59)
+    assert limiter.allow("a", now=60)
+    assert all(FixedWindowRateLimiter(limit=0, window_seconds=60).allow("a", now=0) for _ in range(3))
+
+
+def test_calendar_feed_metrics_are_exposed():
+    team, user = setup_team()
+    client.get(f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}")
+    metrics = client.get("/metrics").text
+    assert 'vacal_calendar_feed_requests_total{outcome="ok"}' in metrics
+    assert "vacal_calendar_feed_build_seconds_count" in metrics
+
+
+def add_team(tenant, name, member_name, day_type, subscriber=None):
+    member = TeamMember(name=member_name, country="Sweden",
+                        days={"2025-02-03": DayEntry(day_types=[day_type])})
+    preferences = {str(subscriber.id): []} if subscriber else {}
+    return Team(tenant=tenant, name=name, team_members=[member], notification_preferences=preferences).save()
+
+
+def test_multi_team_calendar_feed_combines_selected_teams():
+    team, user = setup_team()
+    tenant = team.tenant
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    leave = DayType.objects(tenant=tenant, identifier="compensatory_leave").first()
+    second = add_team(tenant, "Second", "Bob", leave, subscriber=user)
+    add_team(tenant, "Third", "Carol", vacation)
+    base = f"/teams/calendar?user_api_key={user.auth_details.api_key}"
+
+    everything = client.get(base)
+    assert everything.status_code == 200
+    assert str(Calendar.from_ical(everything.text)["X-WR-CALNAME"]) == f"{tenant.name} - Vacal"
+    assert sorted(str(e["SUMMARY"]) for e in events_of(everything.text)) == [
+        "Alice - Vacation", "Bob - Compensatory leave", "Carol - Vacation"]
+
+    selected = client.get(f"{base}&team_ids={team.id}&team_ids={second.id}")
+    assert sorted(str(e["SUMMARY"]) for e in events_of(selected.text)) == [
+        "Alice - Vacation", "Bob - Compensatory leave"]
+
+    subscribed = client.get(f"{base}&subscribed=true")
+    assert [str(e["SUMMARY"]) for e in events_of(subscribed.text)] == ["Bob - Compensatory leave"]
+
+    vacations = client.get(f"{base}&day_type_ids={vacation.id}")
+    assert sorted(str(e["SUMMARY"]) for e in events_of(vacations.text)) == [
+        "Alice - Vacation", "Carol - Vacation"]
+
+    assert client.get(base, headers={"If-None-Match": everything.headers["ETag"]}).status_code == 304
+
+
+def test_multi_team_calendar_feed_shares_team_renders():
+    team, user = setup_team()
+    other_user = User(tenants=[team.tenant], name="Other", email=f"sub{uuid.uuid4()}@example.com",
+                      auth_details=AuthDetails(username=str(uuid.uuid4()))).save()
+    vacation = DayType.objects(tenant=team.tenant, identifier="vacation").first()
+    add_team(team.tenant, "Second", "Bob", vacation)
+    get_cached_team_events.cache_clear()
+
+    with patch("backend.routers.teams.iter_team_events", wraps=iter_team_events) as build:
+        client.get(f"/teams/calendar?user_api_key={user.auth_details.api_key}")
+        client.get(f"/teams/calendar?user_api_key={other_user.auth_details.api_key}&day_type_ids={vacation.id}")
+        client.get(f"/teams/calendar/{team.id}?user_api_key={user.auth_details.api_key}")
+    assert build.call_count == 2
+
+
+def test_multi_team_calendar_feed_stays_within_the_users_tenants():
+    team, user = setup_team()
+    other_team, _ = setup_team()
+
+    resp = client.get(f"/teams/calendar?user_api_key={user.auth_details.api_key}&tenant={other_team.tenant.identifier}")
+    assert resp.status_code == 404
+
+    foreign = client.get(f"/teams/calendar?user_api_key={user.auth_details.api_key}&team_ids={other_team.id}")
+    assert foreign.status_code == 200
+    assert events_of(foreign.text) == []
+
+    user.tenants.append(other_team.tenant)
+    user.save()
+    assert client.get(f"/teams/calendar?user_api_key={user.auth_details.api_key}").status_code == 400
+    chosen = client.get(f"/teams/calendar?user_api_key={user.auth_details.api_key}&tenant={other_team.tenant.identifier}")
+    assert str(Calendar.from_ical(chosen.text)["X-WR-CALNAME"]) == f"{other_team.tenant.name} - Vacal"
+    assert client.get("/teams/calendar?user_api_key=unknown").status_code == 404
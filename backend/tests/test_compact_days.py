@@ -0,0 +1,54 @@
+import datetime
+
+from bson import ObjectId
+
+from backend.compact_days import CompactDays, DayTypeBits
+from backend.model import DayEntry, DayType
+
+VACATION, SICK, REMOTE = ObjectId(), ObjectId(), ObjectId()
+
+
+def make_days():
+    return {
+        "2025-01-03": DayEntry(day_types=[DayType(id=VACATION)], comment="Skiing"),
+        "2025-01-01": DayEntry(day_types=[DayType(id=VACATION)]),
+        "2025-01-02": DayEntry(day_types=[DayType(id=VACATION), DayType(id=REMOTE)]),
+        "2025-01-06": DayEntry(day_types=[DayType(id=SICK)]),
+        "2025-01-07": DayEntry(day_types=[DayType(id=REMOTE)]),
+    }
+
+
+def test_days_are_packed_by_date_with_their_bits():
+    bits = DayTypeBits()
+    vacation, sick = bits.add([VACATION]), bits.add([SICK])
+    absence = bits.add([VACATION, SICK])
+
+    days = CompactDays.from_days(make_days(), bits)
+
+    assert len(days) == 4  # the remote-only day has no bit
+    assert list(days.days_with(vacation)) == [datetime.date(2025, 1, day) for day in (1, 2, 3)]
+    assert days.count(absence, datetime.date(2025, 1, 2), datetime.date(2025, 1, 6)) == 3
+    assert days.count(sick, end=datetime.date(2025, 1, 5)) == 0
+    assert [(datetime.date.fromordinal(first).day, datetime.date.fromordinal(last).day)
+            for first, last in days.runs(absence)] == [(1, 3), (6, 6)]
+    assert days.comment(datetime.date(2025, 1, 3)) == "Skiing"
+    assert days.comment(datetime.date(2025, 1, 1)) is None
+    assert days.nbytes == 4 * (days.ordinals.itemsize + days.masks.itemsize)
+
+
+def test_raw_documents_and_hydrated_days_pack_alike():
+    bits = DayTypeBits([VACATION, SICK, REMOTE])
+    raw = {date_str: entry.to_mongo().to_dict() for date_str, entry in make_days().items()}
+
+    hydrated, packed = CompactDays.from_days(make_days(), bits), CompactDays.from_days(raw, bits)
+
+    assert (hydrated.ordinals, hydrated.masks, hydrated.comments) == (packed.ordinals, packed.masks, packed.comments)
+
+
+def test_masks_past_64_bits_fall_back_to_a_list():
+    bits = DayTypeBits.from_positions({VACATION: 0, SICK: 64})
+
+    days = CompactDays.from_days(make_days(), bits)
+
+    assert days.masks == [1, 1, 1, 1 << 64]
+    assert days.count(1 << 64) == 1
@@ -0,0 +1,138 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from backend import email_service
+from backend.email_service import EmailMessage, send_emails
+
+
+class FakeSES:
+    """Records calls like SES would receive them; fails the first ``throttle`` calls."""
+
+    def __init__(self, throttle: int = 0, rejected: set | None = None):
+        self.throttle = throttle
+        self.rejected = rejected or set()
+        self.sent = []
+        self.bulk_calls = []
+        self._lock = threading.Lock()
+
+    def _maybe_throttle(self, operation):
+        with self._lock:
+            if self.throttle:
+                self.throttle -= 1
+                raise ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, operation)
+
+    def send_email(self, Source, Destination, Message):
+        self._maybe_throttle("SendEmail")
+        with self._lock:
+            self.sent.append((Destination["ToAddresses"], Message["Subject"]["Data"], Message["Body"]["Text"]["Data"]))
+        return {"MessageId": str(len(self.sent))}
+
+    def send_bulk_templated_email(self, Source, Template, DefaultTemplateData, Destinations):
+        self._maybe_throttle("SendBulkTemplatedEmail")
+        with self._lock:
+            self.bulk_calls.append((Template, Destinations))
+        return {"Status": [
+            {"Status": "MessageRejected", "Error": "Address blacklisted"}
+            if destination["Destination"]["ToAddresses"][0] in self.rejected else {"Status": "Success"}
+            for destination in Destinations
+        ]}
+
+
+@pytest.fixture(autouse=True)
+def ses_environment(monkeypatch):
+    monkeypatch.setenv("SES_SOURCE_EMAIL", "noreply@example.com")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.delenv("SES_BULK_TEMPLATE_NAME", raising=False)
+    monkeypatch.setattr(email_service, "EMAIL_RETRY_BASE_DELAY_SECONDS", 0)
+    email_service.get_ses_client.cache_clear()
+    yield
+    email_service.get_ses_client.cache_clear()
+
+
+def messages(count):
+    return [EmailMessage(f"Subject {i}", f"Body {i}", f"user{i}@example.com") for i in range(count)]
+
+
+def test_ses_client_is_created_once_and_honours_endpoint(monkeypatch):
+    monkeypatch.setenv("SES_ENDPOINT_URL", "http://localhost:4566")
+    with patch("backend.email_service.boto3.client") as client_factory:
+        assert email_service.get_ses_client() is email_service.get_ses_client()
+    client_factory.assert_called_once()
+    assert client_factory.call_args.kwargs["endpoint_url"] == "http://localhost:4566"
+
+
+def test_send_email_reuses_client_and_retries_throttling():
+    fake = FakeSES(throttle=2)
+    with patch("backend.email_service.get_ses_client", return_value=fake):
+        email_service.send_email("Hello", "Body", "user@example.com")
+        email_service.send_email("Hello again", "Body", ["other@example.com"])
+    assert fake.sent == [(["user@example.com"], "Hello", "Body"), (["other@example.com"], "Hello again", "Body")]
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    calls = []
+
+    def reject():
+        calls.append(1)
+        raise ClientError({"Error": {"Code": "MessageRejected", "Message": "no"}}, "SendEmail")
+
+    with pytest.raises(ClientError):
+        email_service.call_with_retries(reject)
+    assert len(calls) == 1
+
+
+def test_send_emails_delivers_all_and_counts_failures():
+    delivered = []
+
+    def send(subject, body, to_address):
+        if to_address == "user3@example.com":
+            raise RuntimeError("boom")
+        delivered.append(to_address)
+
+    stats = send_emails(messages(20), send, max_workers=4)
+
+    assert sorted(delivered) == sorted(f"user{i}@example.com" for i in range(20) if i != 3)
+    assert (stats.sent, stats.failed, stats.requests) == (19, 1, 20)
+    assert stats.seconds > 0
+
+
+def test_send_emails_batches_with_bulk_template(monkeypatch):
+    monkeypatch.setenv("SES_BULK_TEMPLATE_NAME", "vacal-plain")
+    fake = FakeSES(throttle=1, rejected={"user7@example.com"})
+
+    stats = send_emails(messages(120), client=fake)
+
+    assert sorted(len(destinations) for _, destinations in fake.bulk_calls) == [20, 50, 50]
+    assert {template for template, _ in fake.bulk_calls} == {"vacal-plain"}
+    first = next(d for _, destinations in fake.bulk_calls for d in destinations
+                 if d["Destination"]["ToAddresses"] == ["user0@example.com"])
+    assert json.loads(first["ReplacementTemplateData"]) == {"subject": "Subject 0", "body": "Body 0"}
+    assert (stats.sent, stats.failed, stats.retries, stats.requests) == (119, 1, 1, 3)
+
+
+def test_bulk_template_does_not_bypass_a_custom_sender(monkeypatch):
+    monkeypatch.setenv("SES_BULK_TEMPLATE_NAME", "vacal-plain")
+    delivered = []
+    stats = send_emails(messages(3), lambda subject, body, to: delivered.append(to))
+    assert len(delivered) == 3
+    assert stats.sent == 3
+
+
+def test_failing_result_callback_does_not_stop_delivery():
+    recorded = []
+
+    def on_result(message, error):
+        if message.to_address == "user1@example.com":
+            raise RuntimeError("database down")
+        recorded.append(message.to_address)
+
+    stats = send_emails(messages(5), lambda subject, body, to: None, max_workers=2, on_result=on_result)
+
+    assert len(recorded) == 4
+    assert stats.sent == 5
+    assert stats.seconds > 0
@@ -1,13 +1,22 @@
 import datetime
 import uuid
+from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
 from openpyxl import load_workbook
 
 from backend.dependencies import get_current_active_user_check_tenant, get_tenant
 from backend.main import app
-from backend.model import DayEntry, DayType, Team, TeamMember, Tenant, User
-from backend.routers.teams import get_holidays, get_working_days
+from backend.model import AuthDetails, DayEntry, DayType, ReportJob, Team, TeamMember, Tenant, User
+from backend.routers.teams import (
+    REPORT_JOB_MAX_ATTEMPTS,
+    get_holidays,
+    get_report_headers,
+    get_working_days,
+    iter_report_body_rows,
+)
+from backend.scheduled.report_jobs import run_report_jobs
 
 client = TestClient(app)
 
@@ -246,3 +255,333 @@ def test_export_excludes_deleted_member_before_period():
     rows = list(worksheet.iter_rows(values_only=True))
 
     assert all(r[1] != "Dana" for r in rows[1:])
+
+
+def test_export_column_widths_follow_longest_value():
+    team1, _ = setup_teams()
+    team1.team_members[0].name = "Alice With A Considerably Longer Name"
+    team1.save()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: User(tenants=[team1.tenant])
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    response = client.get(
+        f"/teams/export-absences?start_date=2025-01-01&end_date=2025-12-31&team_ids={team1.id}"
+    )
+    app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    from io import BytesIO
+
+    worksheet = load_workbook(BytesIO(response.content)).active
+    assert worksheet.auto_filter.ref.startswith("A1:")
+    assert worksheet.column_dimensions["A"].width == len("Team1")
+    assert worksheet.column_dimensions["B"].width == len("Alice With A Considerably Longer Name")
+    assert worksheet.column_dimensions["D"].width == len("Absence Days")
+
+
+def test_export_csv_matches_report_rows(queries):
+    team1, _ = setup_teams()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: User(tenants=[team1.tenant])
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    with queries:
+        response = client.get(
+            f"/teams/export-absences?start_date=2025-01-01&end_date=2025-12-31&team_ids={team1.id}&format=csv"
+        )
+    app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    queries.assert_max_queries(9)
+    # Up to four of them fill a cold holiday cache, one year at a time.
+    queries.assert_no_query_in_loop(allow=("holiday_cache.py",))
+    assert response.headers["content-type"].startswith("text/csv")
+    assert (
+        response.headers["Content-Disposition"]
+        == "attachment; filename=absences_2025-01-01_2025-12-31.csv"
+    )
+    import csv
+
+    rows = list(csv.reader(response.text.splitlines()))
+    headers = rows[0]
+    assert headers[:4] == ["Team", "Team Member Name", "Country", "Absence Days"]
+    assert len(rows) == 2
+    team1_row = dict(zip(headers, rows[1]))
+    assert team1_row["Team"] == "Team1"
+    assert team1_row["Absence Days"] == "2"
+    assert team1_row["Vacation"] == "1"
+
+
+def test_export_parquet_matches_report_rows():
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    team1, _ = setup_teams()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: User(tenants=[team1.tenant])
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    response = client.get(
+        f"/teams/export-absences?start_date=2025-01-01&end_date=2025-12-31&team_ids={team1.id}&format=parquet"
+    )
+    app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    from io import BytesIO
+
+    table = pyarrow_parquet.read_table(BytesIO(response.content))
+    rows = table.to_pylist()
+    assert len(rows) == 1
+    assert rows[0]["Team"] == "Team1"
+    assert rows[0]["Absence Days"] == 2
+    assert rows[0]["Compensatory leave"] == 1
+
+
+def test_export_parquet_without_pyarrow_is_rejected():
+    team1, _ = setup_teams()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: User(tenants=[team1.tenant])
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    with patch("backend.routers.teams.pyarrow", None):
+        response = client.get(
+            "/teams/export-absences?start_date=2025-01-01&end_date=2025-12-31&format=parquet"
+        )
+    app.dependency_overrides = {}
+
+    assert response.status_code == 501
+
+
+def iter_report_body_rows_in_python(tenant, start_date, end_date, day_type_names, team_ids=None):
+    """Reference implementation of :func:`iter_report_body_rows` over hydrated teams.
+
+    The specification the aggregation pipeline is checked against: it walks the same
+    lifecycle rules through ``Team.members``/``archived_members`` directly.
+    """
+    country_holidays = get_holidays(tenant)
+    working_hours_in_a_day = 8
+    teams_qs = Team.objects(tenant=tenant).order_by("name", "id")
+    if team_ids:
+        teams_qs = teams_qs.filter(id__in=team_ids)
+    for team in teams_qs:
+        members_in_scope = list(team.members())
+        for archived_member in team.archived_members:
+            last_working_day = getattr(archived_member, "last_working_day", None)
+            if last_working_day and last_working_day >= start_date:
+                members_in_scope.append(archived_member)
+
+        for member in members_in_scope:
+            member_last_day = getattr(member, "last_working_day", None)
+            effective_end_date = min(end_date, member_last_day) if member_last_day else end_date
+            if effective_end_date < start_date:
+                continue
+            day_type_counts = {}
+            member_holidays = country_holidays.get(member.country, [])
+            absence_days_count = 0
+            for date_str, day_entry in member.days.items():
+                date = datetime.date.fromisoformat(date_str)
+                if start_date <= date <= effective_end_date:
+                    is_absence_day = False
+                    for day_type in day_entry.day_types:
+                        if day_type.is_absence:
+                            is_absence_day = True
+                        day_type_counts[day_type.name] = day_type_counts.get(day_type.name, 0) + 1
+                    if is_absence_day:
+                        absence_days_count += 1
+            working_days = get_working_days(start_date, effective_end_date, member_holidays)
+            yield ([team.name, member.name, member.country, absence_days_count, working_days,
+                    working_days - absence_days_count,
+                    (working_days - absence_days_count) * working_hours_in_a_day] +
+                   [day_type_counts.get(n, 0) for n in day_type_names])
+
+
+def test_aggregated_report_rows_match_python_reference():
+    """Golden test: the aggregation pipeline must reproduce the hydrated Python walk
+    row for row, across the lifecycle cases the fixtures above cover."""
+    team1, team2 = setup_teams()
+    tenant = team1.tenant
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    override = DayType.objects(tenant=tenant, identifier="override").first()
+    team1.team_members.extend([
+        TeamMember(name="Charlie", country="Sweden", is_deleted=True,
+                   last_working_day=datetime.date(2025, 1, 15),
+                   days={"2025-01-10": DayEntry(day_types=[vacation]),
+                         "2025-01-20": DayEntry(day_types=[vacation])}),
+        TeamMember(name="Dana", country="Sweden", is_deleted=True,
+                   last_working_day=datetime.date(2024, 12, 31),
+                   days={"2024-12-15": DayEntry(day_types=[vacation])}),
+        TeamMember(name="Erin", country="Germany",
+                   last_working_day=datetime.date.today() + datetime.timedelta(days=90),
+                   days={"2025-01-10": DayEntry(day_types=[vacation, override], comment="Trip"),
+                         "2025-01-11": DayEntry(comment="Only a comment")}),
+        TeamMember(name="Finn", country="Sweden", is_deleted=True),
+        TeamMember(name="Gus", country="Sweden",
+                   last_working_day=datetime.date(2025, 2, 1),
+                   days={"2025-01-31": DayEntry(day_types=[override])}),
+    ])
+    team1.save()
+    Team(tenant=tenant, name="Empty").save()
+    Team(tenant=tenant, name="Archived team", is_deleted=True,
+         team_members=[TeamMember(name="Hal", country="Sweden")]).save()
+
+    _, day_type_names = get_report_headers(tenant)
+    ranges = [
+        (datetime.date(2025, 1, 1), datetime.date(2025, 12, 31)),
+        (datetime.date(2025, 1, 1), datetime.date(2025, 1, 12)),
+        (datetime.date(2024, 12, 1), datetime.date(2025, 1, 31)),
+        (datetime.date(2025, 1, 20), datetime.date(2025, 1, 1)),
+    ]
+    for start_date, end_date in ranges:
+        for team_ids in (None, [str(team1.id)], [str(team2.id), str(team1.id)]):
+            expected = list(iter_report_body_rows_in_python(tenant, start_date, end_date, day_type_names, team_ids))
+            actual = list(iter_report_body_rows(tenant, start_date, end_date, day_type_names, team_ids))
+            assert actual == expected, (start_date, end_date, team_ids)
+
+
+
+def test_report_rows_of_teams_sharing_a_name_stay_together():
+    """Names are unique per tenant, but data from before that index may repeat one."""
+    tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    Team._get_collection().drop_index("name_1_tenant_1")
+    try:
+        for prefix in ("A", "B"):
+            Team(tenant=tenant, name="Same", team_members=[
+                TeamMember(name=f"{prefix}1", country="Sweden"),
+                TeamMember(name=f"{prefix}2", country="Sweden"),
+            ]).save()
+
+        _, day_type_names = get_report_headers(tenant)
+        args = (tenant, datetime.date(2025, 1, 1), datetime.date(2025, 1, 31), day_type_names)
+        rows = list(iter_report_body_rows(*args))
+        expected = list(iter_report_body_rows_in_python(*args))
+    finally:
+        Team.objects_with_deleted(tenant=tenant).delete()
+        Team.ensure_indexes()
+
+    assert [row[1] for row in rows] == ["A1", "A2", "B1", "B2"]
+    assert rows == expected
+
+
+def saved_user(tenant):
+    return User(tenants=[tenant], name="Reporter",
+                auth_details=AuthDetails(username=str(uuid.uuid4()))).save()
+
+
+@pytest.fixture
+def report_jobs():
+    """An empty job queue, so ``run_report_jobs`` only renders the test's own jobs."""
+    ReportJob.drop_collection()
+    yield
+    ReportJob.drop_collection()
+
+
+def test_report_job_runs_and_serves_download(report_jobs):
+    team1, _ = setup_teams()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: saved_user(team1.tenant)
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    submitted = client.post(
+        f"/teams/export-absences/jobs?start_date=2025-01-01&end_date=2025-12-31&team_ids={team1.id}"
+    )
+    assert submitted.status_code == 200
+    assert submitted.json()["status"] == "pending"
+    job_id = submitted.json()["id"]
+
+    assert run_report_jobs() == 1
+    status_response = client.get(f"/teams/export-absences/jobs/{job_id}")
+    download = client.get(f"/teams/export-absences/jobs/{job_id}/download")
+    app.dependency_overrides = {}
+
+    assert status_response.json()["status"] == "done"
+    assert status_response.json()["progress"] == 100
+    assert download.status_code == 200
+    assert (
+        download.headers["Content-Disposition"]
+        == "attachment; filename=absences_2025-01-01_2025-12-31.xlsx"
+    )
+    from io import BytesIO
+
+    rows = list(load_workbook(BytesIO(download.content)).active.iter_rows(values_only=True))
+    assert [r[1] for r in rows[1:]] == ["Alice"]
+
+
+def test_report_job_result_is_reused_until_the_data_changes(report_jobs):
+    team1, _ = setup_teams()
+    tenant = team1.tenant
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: saved_user(tenant)
+    app.dependency_overrides[get_tenant] = lambda: tenant
+    url = "/teams/export-absences/jobs?start_date=2025-01-01&end_date=2025-12-31&format=csv"
+
+    first = client.post(url).json()
+    queued = client.post(url).json()
+    run_report_jobs()
+    repeated = client.post(url).json()
+    assert queued["id"] == repeated["id"] == first["id"]
+    assert ReportJob.objects(tenant=tenant).count() == 1
+
+    team1.team_members[0].name = "Alice Renamed"
+    team1.save()
+    after_write = client.post(url).json()
+    run_report_jobs()
+    download = client.get(f"/teams/export-absences/jobs/{after_write['id']}/download")
+    app.dependency_overrides = {}
+
+    assert after_write["id"] != first["id"]
+    assert ReportJob.objects(tenant=tenant).count() == 2
+    assert "Alice Renamed" in download.text
+
+
+def test_report_job_with_invalid_team_ids_matches_the_synchronous_export(report_jobs):
+    team1, _ = setup_teams()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: saved_user(team1.tenant)
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    query = f"start_date=2025-01-01&end_date=2025-12-31&format=csv&team_ids=bogus&team_ids={team1.id}"
+    synchronous = client.get(f"/teams/export-absences?{query}")
+    submitted = client.post(f"/teams/export-absences/jobs?{query}")
+    only_invalid = client.post("/teams/export-absences/jobs?start_date=2025-01-01&end_date=2025-12-31&team_ids=bogus")
+    run_report_jobs()
+    download = client.get(f"/teams/export-absences/jobs/{submitted.json()['id']}/download")
+    only_invalid_status = client.get(f"/teams/export-absences/jobs/{only_invalid.json()['id']}")
+    app.dependency_overrides = {}
+
+    assert submitted.status_code == 200
+    assert download.status_code == 200
+    assert download.text == synchronous.text
+    assert only_invalid.status_code == 200
+    assert only_invalid_status.json()["status"] == "done"
+
+
+def test_report_job_is_scoped_to_its_tenant(report_jobs):
+    team1, _ = setup_teams()
+    other_tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: saved_user(team1.tenant)
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    job_id = client.post("/teams/export-absences/jobs?start_date=2025-01-01&end_date=2025-01-31").json()["id"]
+
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: saved_user(other_tenant)
+    app.dependency_overrides[get_tenant] = lambda: other_tenant
+    foreign = client.get(f"/teams/export-absences/jobs/{job_id}")
+    invalid = client.get("/teams/export-absences/jobs/not-an-id")
+    app.dependency_overrides = {}
+
+    assert foreign.status_code == 404
+    assert invalid.status_code == 404
+
+
+def test_pending_report_job_cannot_be_downloaded(report_jobs):
+    team1, _ = setup_teams()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: saved_user(team1.tenant)
+    app.dependency_overrides[get_tenant] = lambda: team1.tenant
+    job_id = client.post("/teams/export-absences/jobs?start_date=2025-01-01&end_date=2025-01-31").json()["id"]
+    download = client.get(f"/teams/export-absences/jobs/{job_id}/download")
+    app.dependency_overrides = {}
+
+    assert download.status_code == 409
+
+
+def test_report_job_lost_with_its_worker_is_claimed_again(report_jobs):
+    team1, _ = setup_teams()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    job_fields = {"tenant": team1.tenant, "cache_key": "lost", "start_date": datetime.date(2025, 1, 1),
+                  "end_date": datetime.date(2025, 1, 31), "report_format": "csv", "status": "running"}
+    # Claimed by a worker that restarted mid-render, and by one that is still rendering.
+    lost = ReportJob(**job_fields, attempts=1, claimed_until=now - datetime.timedelta(minutes=1)).save()
+    rendering = ReportJob(**job_fields, attempts=1, claimed_until=now + datetime.timedelta(minutes=5)).save()
+    given_up = ReportJob(**job_fields, attempts=REPORT_JOB_MAX_ATTEMPTS, claimed_until=now).save()
+
+    assert run_report_jobs() == 2
+
+    assert ReportJob.objects.get(id=lost.id).status == "done"
+    assert ReportJob.objects.get(id=rendering.id).status == "running"
+    assert ReportJob.objects.get(id=given_up.id).status == "failed"
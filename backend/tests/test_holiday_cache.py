@@ -0,0 +1,80 @@
+import datetime
+from unittest.mock import patch
+
+import holidays
+import pytest
+
+from backend.holiday_cache import LIBRARY_VERSION, clear_holiday_cache, get_holiday_calendars, load_holiday_cache
+from backend.model import HolidayCalendar
+from backend.utils import get_country_holidays
+
+
+@pytest.fixture(autouse=True)
+def empty_holiday_cache():
+    def clear():
+        HolidayCalendar.drop_collection()
+        clear_holiday_cache()
+        get_country_holidays.cache_clear()
+
+    clear()
+    yield
+    clear()
+
+
+def test_calendars_are_computed_once_and_shared_through_mongo():
+    with patch("backend.holiday_cache.holidays.country_holidays", wraps=holidays.country_holidays) as compute:
+        sweden = get_country_holidays("Sweden", 2025)
+        assert compute.call_count == 3
+        assert HolidayCalendar.objects(country="SE", library_version=LIBRARY_VERSION).count() == 3
+
+        clear_holiday_cache()  # a freshly started process
+        get_country_holidays.cache_clear()
+        assert get_country_holidays("Sweden", 2025) == sweden
+        assert get_country_holidays("Sweden", 2026)[datetime.date(2027, 1, 1)] == "Nyårsdagen"
+        assert compute.call_count == 4  # only 2027 was new
+
+    assert sweden[datetime.date(2025, 12, 25)] == "Juldagen"
+    assert datetime.date(2024, 1, 1) in sweden and datetime.date(2026, 1, 1) in sweden
+
+
+def test_years_outside_the_loaded_ones_are_added_on_lookup():
+    sweden = get_country_holidays("Sweden", 2025)
+    christmas = datetime.date(2030, 12, 25)
+
+    assert christmas not in dict(sweden)
+    assert christmas in sweden and not sweden.is_working_day(christmas)
+    assert sweden.get(datetime.date(2031, 1, 1)) == "Nyårsdagen"
+    assert HolidayCalendar.objects(country="SE", year__in=[2030, 2031]).count() == 2
+    # The calendars cached per year are not widened along with the returned copy.
+    assert christmas not in dict(get_holiday_calendars("SE", [2025]))
+
+
+def test_startup_load_needs_no_computation_or_queries():
+    stored = get_holiday_calendars("FI", [2025])
+    clear_holiday_cache()
+
+    assert stored == dict(holidays.country_holidays("FI", years=2025))
+    assert load_holiday_cache() == 1
+    with patch("backend.holiday_cache.holidays.country_holidays") as compute, \
+            patch.object(HolidayCalendar, "objects") as objects:
+        assert get_holiday_calendars("FI", [2025]) == stored
+    compute.assert_not_called()
+    objects.assert_not_called()
+
+
+def test_calendars_of_other_library_versions_are_ignored():
+    HolidayCalendar(country="FI", year=2025, library_version="0.1", holidays={"2025-03-03": "Stale"}).save()
+
+    assert load_holiday_cache() == 0
+    assert datetime.date(2025, 3, 3) not in get_holiday_calendars("FI", [2025])
+
+
+def test_working_days_match_the_holidays_library():
+    # Russia moves working days onto weekends around its holidays.
+    expected = holidays.country_holidays("RU", years=2024)
+    cached = get_holiday_calendars("RU", [2024])
+
+    day = datetime.date(2024, 1, 1)
+    while day.year == 2024:
+        assert cached.is_working_day(day) == expected.is_working_day(day), day
+        day += datetime.timedelta(days=1)
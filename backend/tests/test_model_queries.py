@@ -94,3 +94,28 @@ def test_team_member_soft_delete_and_restore() -> None:
     assert restored_member is not None and not restored_member.is_deleted
     assert len(team.members()) == 1
 
+
+
+def test_overlapping_team_saves_get_distinct_versions() -> None:
+    team = Team(tenant=_create_tenant(), name="Team").save()
+    first, second = Team.objects.get(id=team.id), Team.objects.get(id=team.id)
+
+    first.name = "First"
+    first.save()
+    second.team_members.append(TeamMember(name="Bob", country="Spain"))
+    second.save()
+
+    stored = Team.objects.get(id=team.id)
+    assert (team.version, first.version, second.version, stored.version) == (1, 2, 3, 3)
+    assert stored.name == "First" and [member.name for member in stored.team_members] == ["Bob"]
+
+
+def test_team_without_a_stored_version_saves() -> None:
+    team = Team(tenant=_create_tenant(), name="Team").save()
+    Team._get_collection().update_one({"_id": team.id}, {"$unset": {"version": ""}})
+
+    loaded = Team.objects.get(id=team.id)
+    loaded.name = "Renamed"
+    loaded.save()
+
+    assert Team.objects.get(id=team.id).version == 1
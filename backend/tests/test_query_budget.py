@@ -0,0 +1,25 @@
+import uuid
+
+import pytest
+
+from backend.model import Tenant
+
+
+def test_recorder_counts_queries_and_flags_a_lookup_per_item(queries):
+    identifiers = [str(uuid.uuid4()) for _ in range(3)]
+    for identifier in identifiers:
+        Tenant(name=identifier, identifier=identifier).save()
+
+    with queries:
+        list(Tenant.objects(identifier__in=identifiers))
+    queries.assert_max_queries(1)
+    queries.assert_no_query_in_loop()
+
+    with queries:
+        for identifier in identifiers:
+            Tenant.objects(identifier=identifier).first()
+    assert queries.count == 3
+    with pytest.raises(AssertionError, match="find tenant at .* x3"):
+        queries.assert_no_query_in_loop()
+    with pytest.raises(AssertionError, match="3 queries, expected at most 2"):
+        queries.assert_max_queries(2)
@@ -1,10 +1,11 @@
+import datetime
 import uuid
 
 from fastapi.testclient import TestClient
 
 from backend.dependencies import get_current_active_user_check_tenant
 from backend.main import app
-from backend.model import AuthDetails, DayType, Team, TeamMember, Tenant, User
+from backend.model import AuthDetails, DayEntry, DayType, Team, TeamMember, Tenant, User
 
 
 client = TestClient(app)
@@ -32,18 +33,21 @@ def _create_team_with_user(role: str = "employee"):
     return tenant, team, vacation, user
 
 
-def test_employee_can_set_absence_when_coworker_available():
+def test_employee_can_set_absence_when_coworker_available(queries):
     tenant, team, vacation, user = _create_team_with_user(role="employee")
     app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
     try:
-        response = client.put(
-            f"/teams/{team.id}/members/{team.team_members[0].uid}/days",
-            json={"2025-07-01": {"day_types": [str(vacation.id)], "comment": ""}},
-            headers={"Tenant-ID": tenant.identifier},
-        )
+        with queries:
+            response = client.put(
+                f"/teams/{team.id}/members/{team.team_members[0].uid}/days",
+                json={"2025-07-01": {"day_types": [str(vacation.id)], "comment": ""}},
+                headers={"Tenant-ID": tenant.identifier},
+            )
         assert response.status_code == 200
     finally:
         app.dependency_overrides = {}
+    queries.assert_max_queries(8)
+    queries.assert_no_query_in_loop()
 
 
 def test_employee_cannot_mark_last_coworker_absent():
@@ -87,3 +91,65 @@ def test_manager_can_mark_all_coworkers_absent():
         assert second_response.status_code == 200
     finally:
         app.dependency_overrides = {}
+
+
+def test_employee_bulk_edit_is_rejected_if_any_day_leaves_nobody_available():
+    tenant, team, vacation, user = _create_team_with_user(role="employee")
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
+    try:
+        alice, bob = team.team_members
+        response = client.put(
+            f"/teams/{team.id}/members/{alice.uid}/days",
+            json={"2025-10-15": {"day_types": [str(vacation.id)], "comment": ""}},
+            headers={"Tenant-ID": tenant.identifier},
+        )
+        assert response.status_code == 200
+
+        month = {f"2025-10-{day:02d}": {"day_types": [str(vacation.id)], "comment": ""} for day in range(1, 31)}
+        response = client.put(
+            f"/teams/{team.id}/members/{bob.uid}/days",
+            json=month,
+            headers={"Tenant-ID": tenant.identifier},
+        )
+        assert response.status_code == 400
+
+        del month["2025-10-15"]
+        response = client.put(
+            f"/teams/{team.id}/members/{bob.uid}/days",
+            json=month,
+            headers={"Tenant-ID": tenant.identifier},
+        )
+        assert response.status_code == 200
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_coverage_counts_members_and_absences_per_day():
+    tenant, team, vacation, user = _create_team_with_user(role="employee")
+    alice, bob = team.team_members
+    alice.days = {"2025-11-03": DayEntry(day_types=[vacation]), "2025-11-04": DayEntry(day_types=[vacation])}
+    bob.last_working_day = datetime.date(2025, 11, 3)
+    team.save()
+    app.dependency_overrides[get_current_active_user_check_tenant] = lambda: user
+    try:
+        response = client.get(
+            f"/teams/{team.id}/coverage",
+            params={"from": "2025-11-02", "to": "2025-11-05"},
+            headers={"Tenant-ID": tenant.identifier},
+        )
+        too_long = client.get(
+            f"/teams/{team.id}/coverage",
+            params={"from": "2025-01-01", "to": "2026-06-01"},
+            headers={"Tenant-ID": tenant.identifier},
+        )
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert [(day["date"], day["members"], day["absent"], day["available"]) for day in response.json()["days"]] == [
+        ("2025-11-02", 2, 0, 2),
+        ("2025-11-03", 2, 1, 1),
+        ("2025-11-04", 1, 1, 0),
+        ("2025-11-05", 1, 0, 1),
+    ]
+    assert too_long.status_code == 400
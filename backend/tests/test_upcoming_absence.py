@@ -38,14 +38,55 @@ def setup_team_with_ongoing_absence(today: datetime.date):
     return subscriber.email
 
 
-def test_upcoming_absence_excludes_ongoing_absence():
+def test_upcoming_absence_excludes_ongoing_absence(dispatch_emails):
     today = datetime.date(2025, 9, 5)
     setup_team_with_ongoing_absence(today)
 
-    with patch("backend.scheduled.absence_starts.send_email") as mock_send_email, \
-         patch("backend.scheduled.absence_starts.datetime") as mock_datetime:
+    with patch("backend.scheduled.absence_starts.datetime") as mock_datetime:
         mock_datetime.date.today.return_value = today
         mock_datetime.timedelta = datetime.timedelta
         send_upcoming_absence_email_updates()
+        mock_send_email = dispatch_emails()
         # No email should be sent because the absence already started
         mock_send_email.assert_not_called()
+
+
+def test_upcoming_absence_reports_each_member_once_with_few_queries(dispatch_emails):
+    # Friday: the next working day is Monday, 8 September.
+    today = datetime.date(2025, 9, 5)
+    tenant = Tenant(name=f"Tenant{uuid.uuid4()}", identifier=str(uuid.uuid4())).save()
+    DayType.init_day_types(tenant)
+    vacation = DayType.objects(tenant=tenant, identifier="vacation").first()
+    birthday = DayType.objects(tenant=tenant, identifier="birthday").first()
+    subscriber = User(tenants=[tenant], name="Subscriber", email=f"sub{uuid.uuid4()}@example.com",
+                      auth_details=AuthDetails(username=str(uuid.uuid4()))).save()
+    members = [
+        TeamMember(name="Starts Monday", country="Sweden", email="a@example.com",
+                   days={"2025-09-08": DayEntry(day_types=[vacation]),
+                         "2025-09-09": DayEntry(day_types=[vacation])}),
+        TeamMember(name="Not an absence", country="Sweden", email="b@example.com",
+                   days={"2025-09-08": DayEntry(day_types=[birthday])}),
+        TeamMember(name="Starts Tuesday", country="United States", email="c@example.com",
+                   days={"2025-09-09": DayEntry(day_types=[vacation])}),
+    ] + [TeamMember(name=f"Present {index}", country="Germany", email=f"p{index}@example.com")
+         for index in range(20)]
+    for name in ("Team A", "Team B"):
+        Team(tenant=tenant, name=name, team_members=members,
+             notification_preferences={str(subscriber.id): [ABSENCE_UPCOMING_NOTIFICATION]}).save()
+
+    with patch("backend.scheduled.absence_starts.datetime") as mock_datetime, \
+         patch("backend.scheduled.absence_starts.DayType.objects", wraps=DayType.objects) as day_types:
+        mock_datetime.date.today.return_value = today
+        mock_datetime.timedelta = datetime.timedelta
+        send_upcoming_absence_email_updates()
+        mock_send_email = dispatch_emails()
+
+    # One day type lookup per tenant, however many teams and members there are.
+    assert [c.kwargs["tenant"] for c in day_types.call_args_list].count(tenant.id) == 1
+    calls = [c for c in mock_send_email.call_args_list if c.args[2] == subscriber.email]
+    assert len(calls) == 1
+    body = calls[0].args[1]
+    for name in ("Team A", "Team B"):
+        assert f"{name}:\n- Starts Monday is absent from 2025-09-08 to 2025-09-09.\n\n" in body
+    assert "Starts Tuesday" not in body
+    assert "Not an absence" not in body
@@ -2,7 +2,6 @@ import datetime
 import logging
 from functools import lru_cache
 
-import holidays
 import pycountry
 
 log = logging.getLogger(__name__)
@@ -14,13 +13,14 @@ def get_today() -> datetime.date:
 
 
 @lru_cache(maxsize=768)
-def get_country_holidays(country_name, year) -> holidays.HolidayBase:
+def get_country_holidays(country_name, year) -> dict:
+    """Holidays of ``country_name``, loaded from the year before ``year`` to the year after.
+
+    Returns a :class:`~backend.holiday_cache.CachedHolidays`, which supports the mapping
+    and ``is_working_day`` parts of ``holidays.HolidayBase`` used by callers and, like it,
+    adds other years when a date of theirs is looked up.
+    """
+    # Deferred import: the holiday cache is stored through the model, which imports this module.
+    from .holiday_cache import get_holiday_calendars
     country_alpha_2 = pycountry.countries.get(name=country_name).alpha_2
-    country_holidays_obj = {}
-    try:
-        country_holidays_obj = holidays.country_holidays(
-            country_alpha_2, years=[year - 1, year, year + 1]
-        )
-    except NotImplementedError as e:  # there are no holidays for some countries, but it's fine
-        log.warning(e, exc_info=e)
-    return country_holidays_obj
+    return get_holiday_calendars(country_alpha_2, [year - 1, year, year + 1])
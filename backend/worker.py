@@ -0,0 +1,36 @@
+"""Runs the scheduled jobs without the API: ``python -m backend.worker``.
+
+Pair it with ``SCHEDULER_ENABLED=False`` on the API processes so job sweeps and queued
+report jobs no longer compete with requests for CPU, and API replicas and job capacity
+scale independently.
+"""
+import logging.config
+import os
+import signal
+
+import yaml
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from .holiday_cache import load_holiday_cache
+from .scheduled.jobs import add_scheduled_jobs
+
+MULTITENANCY_ENABLED = os.getenv("MULTITENANCY_ENABLED", False)
+LOG_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "log_conf.yml")
+
+log = logging.getLogger(__name__)
+
+
+def main():
+    with open(LOG_CONFIG_PATH) as f:
+        logging.config.dictConfig(yaml.safe_load(f))
+    logging.getLogger().setLevel(logging.INFO)
+    load_holiday_cache()
+    scheduler = add_scheduled_jobs(BlockingScheduler(), bool(MULTITENANCY_ENABLED))
+    # Let running jobs finish when the container is stopped.
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.shutdown())
+    log.info("Scheduler worker started with %d jobs", len(scheduler.get_jobs()))
+    scheduler.start()
+
+
+if __name__ == "__main__":
+    main()